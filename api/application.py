@@ -5,8 +5,15 @@ from flask_cors import CORS
 from api.auth import UserLogger
 from common.helper import standard_json_response
 from common.db_model import db, rbac
+from common.db_model.schema import upgrade_schema
+from common.db_model.query_logging import init_query_logging
+from common.db_model.sqlite_profile import init_sqlite_profile
+from common.db_model.replica import create_replica_router
 from api.config import get_config, ApiConfig
 from api.auth.token_manager import TokenManager
+from api.auth.revocation_store import TokenRevocationStore
+from api.auth.principal_cache import PrincipalCache
+from api.helper.response_cache import ResponseCache
 
 
 def create_app():
@@ -43,7 +50,25 @@ def create_app():
 
     rbac.init_app(app)
     db.init_app(app)
-    app.token_manager = TokenManager(config.USER_TOKEN_VALIDITY_SPAN)
+    with app.app_context():
+        init_sqlite_profile(db.engine, config.SQLITE_PRAGMAS)
+        # databases created by a former db_creation.sql are brought to the current schema version
+        for script in upgrade_schema(db.engine):
+            print(f"Database schema upgraded with {script}")
+        init_query_logging(db.engine, config.SQL_SLOW_QUERY_THRESHOLD, config.SQL_QUERY_SAMPLE_RATE)
+        app.replica_router = None
+        if config.DB_REPLICA_MODE:
+            app.replica_router = create_replica_router(config.DB_REPLICA_MODE, db.engine.url.database,
+                                                       config.DB_REPLICA_FILEPATH, config.DB_REPLICA_REFRESH_INTERVAL,
+                                                       config.SQLALCHEMY_ENGINE_OPTIONS, config.SQLITE_PRAGMAS)
+            init_query_logging(app.replica_router.engine, config.SQL_SLOW_QUERY_THRESHOLD,
+                               config.SQL_QUERY_SAMPLE_RATE)
+    app.token_manager = TokenManager(config.USER_TOKEN_VALIDITY_SPAN,
+                                     TokenRevocationStore(config.REVOKED_TOKENS_FILEPATH),
+                                     config.VERIFIED_TOKEN_CACHE_SIZE)
+    app.principal_cache = PrincipalCache(config.PRINCIPAL_CACHE_TTL, config.PRINCIPAL_CACHE_SIZE,
+                                         config.REVOKED_TOKENS_FILEPATH)
+    app.response_cache = ResponseCache(config.RESPONSE_CACHE_MAX_BYTES)
 
     # register blueprints
     from api.controllers.user_controller import user_api
@@ -67,6 +92,13 @@ def create_app():
 
     @app.after_request
     def after_request(response):
+        # reads of a user who has just written must not go to a stale replica
+        if app.replica_router is not None and g.get('wrote_primary', False) \
+                and g.get('current_user', None) is not None:
+            app.replica_router.record_write(g.current_user.id)
+        # cached responses of other workers are invalidated by the data version bumped with the write
+        if g.get('wrote_primary', False) and g.get('current_user', None) is not None:
+            app.response_cache.invalidate_organization(g.current_user.organization_id)
         g.current_user = None
         g.user_logger = __DEFAULT_LOGGER
         return response
@@ -11,6 +11,7 @@ from common.helper import standard_json_response
 from .helper import RequestAuthAnalyzer
 from .user_logger import UserLogger
 from .custom_http_token_auth import CustomHTTPTokenAuth
+from .principal_cache import Principal
 
 # dictionary storing several http response codes and messages for authentication/rbac fails use cases
 __FAIL_RESPONSES = {
@@ -67,7 +68,9 @@ def __token_auth_error_handler():
 @token_auth.verify_token
 def __token_auth_verify_token(token: str) -> bool:
     """returns a boolean indicating if provided bearer token token is a valid JWT token for a valid user.
-    If true also set g.current_user and user_logger for further use in controllers"""
+    If true also set g.current_user and user_logger for further use in controllers.
+    The identity of the user is cached by token so that g.current_user is built without any db query,
+    it is a transient user only carrying id, email, organization_id and roles"""
 
     # since rbac is called before if user is already set we just return it
     if g.get('current_user', None):
@@ -85,15 +88,18 @@ def __token_auth_verify_token(token: str) -> bool:
     user_id = data['user_id']
     user_email = data['user_email']
 
-    m_user = User.get_by_email(user_email)
-    if not m_user:
-        return False
-
-    # print(m_user)
-    # print(m_user.get_roles())
+    principal = current_app.principal_cache.get(user_id, token)
+    if principal is None:
+        m_user = User.get_by_email(user_email)
+        if not m_user:
+            return False
+        principal = Principal(m_user.id, m_user.email, m_user.organization_id,
+                              tuple(map(lambda x: x.name, m_user.roles)))
+        current_app.principal_cache.put(user_id, token, principal)
 
     # if test is ok we update current_user and user_logger
-    g.current_user = m_user
+    g.current_user = User.create_authenticated(principal.id, principal.email, principal.organization_id,
+                                               principal.role_names)
     g.user_logger = UserLogger(g.current_user.email)
     return True
 
@@ -0,0 +1,143 @@
+"""cache of authenticated principals by bearer token.
+Invalidations of a user are written in a sqlite file shared by all server workers (the revoked tokens file), each
+process applies the invalidations written by other processes when the file changed (PRAGMA data_version), so that an
+identity change is seen by every worker on its next request"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from .revocation_store import connect_shared_file
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS principal_invalidation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    invalidated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS principal_invalidation_invalidated_at ON principal_invalidation(invalidated_at);
+"""
+
+
+class Principal(NamedTuple):
+    """immutable identity of an authenticated user, enough for authorization checks"""
+    id: int
+    email: str
+    organization_id: int
+    role_names: Tuple[str, ...]
+
+
+class PrincipalCache:
+    """bounded cache of authenticated principals keyed by (user id, bearer token)
+    entries expire after a time to live so that changes made outside of the api (roles in db) are eventually seen,
+    least recently used entries are evicted when the cache is full.
+    With filepath None invalidations are only known by the current process"""
+    _time_to_live: float
+    _max_size: int
+    _entries: OrderedDict
+    _tokens_by_user_id: Dict[int, Set[str]]
+    _filepath: Optional[str]
+
+    def __init__(self, time_to_live: int = 60, max_size: int = 10000, filepath: Optional[str] = None):
+        self._time_to_live = time_to_live
+        self._max_size = max_size
+        # (user_id, token) => (expiry timestamp, principal), ordered from least to most recently used
+        self._entries = OrderedDict()
+        # tokens cached for each user, allowing invalidation of all entries of a user
+        self._tokens_by_user_id = {}
+        self._lock = threading.Lock()
+        self._filepath = filepath
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        # last principal_invalidation id and data version read by this process
+        self._last_id = 0
+        self._data_version = None
+
+    def get(self, user_id: int, token: str) -> Optional[Principal]:
+        """returns the cached principal of this user and token, None if absent, expired or invalidated"""
+        key = (user_id, token)
+        with self._lock:
+            self._synchronize()
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, user_id: int, token: str, principal: Principal):
+        """caches principal of this user and token"""
+        key = (user_id, token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._time_to_live, principal)
+            self._entries.move_to_end(key)
+            self._tokens_by_user_id.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self._max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """removes all cached principals of a user in every server worker, must be called when its identity or roles
+        change"""
+        with self._lock:
+            self._invalidate_user(user_id)
+            connection = self._get_connection()
+            if connection is not None:
+                now = time.time()
+                with connection:
+                    # entries cached before an invalidation older than the time to live have expired anyway
+                    connection.execute("DELETE FROM principal_invalidation WHERE invalidated_at <= ?",
+                                       (now - self._time_to_live,))
+                    connection.execute("INSERT INTO principal_invalidation(user_id, invalidated_at) VALUES (?, ?)",
+                                       (user_id, now))
+                # reads the new row along with rows of other processes, so that they are not read again
+                self._synchronize(force=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user_id.clear()
+
+    def _invalidate_user(self, user_id: int):
+        for token in list(self._tokens_by_user_id.get(user_id, ())):
+            self._remove((user_id, token))
+
+    def _remove(self, key: Tuple[int, str]):
+        self._entries.pop(key, None)
+        tokens = self._tokens_by_user_id.get(key[0], None)
+        if tokens is not None:
+            tokens.discard(key[1])
+            if not tokens:
+                del self._tokens_by_user_id[key[0]]
+
+    def _synchronize(self, force: bool = False):
+        """applies invalidations written by other processes since the last call,
+        the data version only changes with commits of other connections so writes of this process need force"""
+        connection = self._get_connection()
+        if connection is None:
+            return
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version and not force:
+            return
+        self._data_version = data_version
+        rows = connection.execute("SELECT id, user_id FROM principal_invalidation WHERE id > ? ORDER BY id",
+                                  (self._last_id,))
+        for _id, user_id in rows:
+            self._invalidate_user(user_id)
+            self._last_id = _id
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        """returns the connection to the shared file, opened once per process since connections must not be
+        used across a fork. Invalidations written before are ignored since the cache of a new process is empty"""
+        if self._filepath is None:
+            return None
+        if self._connection_pid != os.getpid():
+            self._connection = connect_shared_file(self._filepath, _CREATE_TABLE)
+            self._connection_pid = os.getpid()
+            self._data_version = None
+            self._last_id = self._connection.execute(
+                "SELECT coalesce(max(id), 0) FROM principal_invalidation").fetchone()[0]
+        return self._connection
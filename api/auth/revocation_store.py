@@ -0,0 +1,124 @@
+"""revoked bearer tokens : a token revoked at logout stays refused until its own expiry, then it is forgotten.
+Revocations are written in a sqlite file shared by all server workers, each process keeps an in-memory copy
+refreshed when another process has written to the file (PRAGMA data_version), so checking a token is a dict lookup"""
+import hashlib
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS revoked_token (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token_hash BLOB NOT NULL UNIQUE,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_token_expires_at ON revoked_token(expires_at);
+"""
+
+
+def connect_shared_file(filepath: str, create_script: str) -> sqlite3.Connection:
+    """opens a connection to a sqlite file shared by all server workers and creates its tables if needed"""
+    connection = sqlite3.connect(filepath, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("PRAGMA busy_timeout = 5000")
+    connection.executescript(create_script)
+    connection.isolation_level = 'DEFERRED'
+    return connection
+
+
+class TokenRevocationStore:
+    """set of revoked tokens whose entries expire with the token exp claim.
+    Tokens are stored as sha256 digests, expired entries are pruned in expiry order with a heap.
+    With filepath None revocations are only known by the current process"""
+    _filepath: Optional[str]
+    _expiries: Dict[bytes, float]
+    _heap: List[Tuple[float, bytes]]
+
+    def __init__(self, filepath: Optional[str] = None):
+        self._filepath = filepath
+        # token digest => expiry timestamp of the token
+        self._expiries = {}
+        # (expiry timestamp, token digest) of revoked tokens, the next one to expire first
+        self._heap = []
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        # last revoked_token id and data version read by this process
+        self._last_id = 0
+        self._data_version = None
+
+    def revoke(self, token: str, expires_at: float):
+        """refuses token until expires_at (unix timestamp)"""
+        digest = self._digest(token)
+        now = time.time()
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._add(digest, expires_at)
+            connection = self._get_connection()
+            if connection is not None:
+                with connection:
+                    connection.execute("DELETE FROM revoked_token WHERE expires_at <= ?", (now,))
+                    connection.execute("INSERT OR IGNORE INTO revoked_token(token_hash, expires_at) VALUES (?, ?)",
+                                       (digest, expires_at))
+                # reads the new row along with rows of other processes, so that they are not read again
+                self._synchronize(force=True)
+
+    def is_revoked(self, token: str) -> bool:
+        """returns True if token has been revoked by any process and has not expired yet"""
+        digest = self._digest(token)
+        with self._lock:
+            self._synchronize()
+            self._prune(time.time())
+            return digest in self._expiries
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._prune(time.time())
+            return len(self._expiries)
+
+    def _add(self, digest: bytes, expires_at: float):
+        if digest not in self._expiries:
+            self._expiries[digest] = expires_at
+            heapq.heappush(self._heap, (expires_at, digest))
+
+    def _prune(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            _, digest = heapq.heappop(self._heap)
+            self._expiries.pop(digest, None)
+
+    def _synchronize(self, force: bool = False):
+        """reads revocations written by other processes since the last call,
+        the data version only changes with commits of other connections so writes of this process need force"""
+        connection = self._get_connection()
+        if connection is None:
+            return
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version and not force:
+            return
+        self._data_version = data_version
+        # expired rows are pruned afterwards, filtering them here would make sqlite scan the expires_at index
+        rows = connection.execute("SELECT id, token_hash, expires_at FROM revoked_token WHERE id > ? ORDER BY id",
+                                  (self._last_id,))
+        for _id, digest, expires_at in rows:
+            self._add(digest, expires_at)
+            self._last_id = _id
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        """returns the connection to the shared file, opened once per process since connections must not be
+        used across a fork"""
+        if self._filepath is None:
+            return None
+        if self._connection_pid != os.getpid():
+            self._connection = connect_shared_file(self._filepath, _CREATE_TABLE)
+            self._connection_pid = os.getpid()
+            self._data_version = None
+        return self._connection
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
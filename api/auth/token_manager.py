@@ -1,32 +1,45 @@
-from typing import Dict, Set
+import threading
+import time
+from calendar import timegm
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import jwt
 
+from .revocation_store import TokenRevocationStore
+
 
 class TokenManager:
     """class for handling JsonWebTokens generation, caching, encoding and decoding"""
     _token_validity_span: timedelta
-    _buffered_tokens: Dict
-    _invalidated_tokens: Set
+    _buffered_tokens: Dict[int, Tuple[str, int]]
+    _revocation_store: TokenRevocationStore
+    _verified_tokens: OrderedDict
+    _verified_tokens_max_size: int
 
-    def __init__(self, token_validity_span: int = 3600):
+    def __init__(self, token_validity_span: int = 3600, revocation_store: Optional[TokenRevocationStore] = None,
+                 verified_tokens_max_size: int = 10000):
         self._token_validity_span = timedelta(seconds=token_validity_span)
-        # this Dict registers generated tokens to allow returning the same token for a given amount of time
+        # this Dict registers generated tokens with their expiry timestamp
+        # to allow returning the same token for a given amount of time
         self._buffered_tokens = {}
-        # this Set registers invalidated tokens to prevent their reuse, making logout effective
-        self._invalidated_tokens = set()
+        # revoked tokens are refused until they expire, making logout effective in all server workers
+        self._revocation_store = revocation_store if revocation_store is not None else TokenRevocationStore()
+        # token => (expiry timestamp, decoded data) of tokens whose signature has been verified,
+        # ordered from least to most recently used
+        self._verified_tokens = OrderedDict()
+        self._verified_tokens_max_size = verified_tokens_max_size
+        self._lock = threading.Lock()
 
     def generate_token(self, user_id: int, user_email: str) -> str:
         """returns a new token or a cached one if still valid"""
         # if a token has already been generated for this user and is non expired then returns it
+        # the token may have been revoked by another server worker
         if user_id in self._buffered_tokens.keys():
-            token = self._buffered_tokens[user_id]
-            try:
-                jwt.decode(token, 'SpaceArt', "HS256")
+            token, expires_at = self._buffered_tokens[user_id]
+            if time.time() < expires_at and not self._revocation_store.is_revoked(token):
                 return token
-            except jwt.ExpiredSignatureError:
-                pass
-        # if no token was previously buffered or the old one expired, we generate a new one
+        # if no token was previously buffered or the old one expired or was revoked, we generate a new one
         now = datetime.utcnow()
 
         payload = {
@@ -36,19 +49,25 @@ class TokenManager:
             'ref': user_email
         }
         token = jwt.encode(payload, 'SpaceArt', 'HS256')
-        self._buffered_tokens[user_id] = token
+        self._buffered_tokens[user_id] = (token, timegm(payload['exp'].utctimetuple()))
         return token
 
     def decode_token(self, token: str) -> Dict:
-        """decode a token and check its validity, returned Dict contains decoded data if token is valid"""
-        if token in self._invalidated_tokens:
+        """decode a token and check its validity, returned Dict contains decoded data if token is valid
+        the signature of a token is only verified on its first use, until the token expires or is evicted"""
+        if self._revocation_store.is_revoked(token):
             return {'error': 'Token expired, please login again.'}
+        data = self._get_verified_token(token)
+        if data is not None:
+            return data
         try:
             payload = jwt.decode(token, 'SpaceArt', "HS256")
-            return {
+            data = {
                 'user_id': payload['sub'],
                 'user_email': payload['ref']
             }
+            self._put_verified_token(token, payload['exp'], data)
+            return dict(data)
         except jwt.ExpiredSignatureError:
             return {'error': 'Token expired, please login again.'}
         except jwt.InvalidTokenError:
@@ -56,11 +75,35 @@ class TokenManager:
         except Exception as e:
             return {'error': f'Other exception while decoding token: {str(e)}'}
 
-    def invalidate_user_token(self, user_id: int):
-        """invalidate user cached token if any"""
+    def invalidate_user_token(self, user_id: int, token: Optional[str] = None):
+        """invalidate user cached token if any and given token, which may have been generated by another worker"""
+        tokens = {token} if token is not None else set()
         if user_id in self._buffered_tokens.keys():
-            self._invalidated_tokens.add(self._buffered_tokens.pop(user_id))
-
-
+            tokens.add(self._buffered_tokens.pop(user_id)[0])
+        for _token in tokens:
+            with self._lock:
+                self._verified_tokens.pop(_token, None)
+            try:
+                payload = jwt.decode(_token, 'SpaceArt', "HS256", options={'verify_exp': False})
+            except jwt.InvalidTokenError:
+                continue
+            self._revocation_store.revoke(_token, payload['exp'])
 
+    def _get_verified_token(self, token: str) -> Optional[Dict]:
+        """returns a copy of the decoded data of a verified token, None if unknown or expired"""
+        with self._lock:
+            entry = self._verified_tokens.get(token, None)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._verified_tokens[token]
+                return None
+            self._verified_tokens.move_to_end(token)
+            return dict(entry[1])
 
+    def _put_verified_token(self, token: str, expires_at: int, data: Dict):
+        with self._lock:
+            self._verified_tokens[token] = (expires_at, data)
+            self._verified_tokens.move_to_end(token)
+            while len(self._verified_tokens) > self._verified_tokens_max_size:
+                self._verified_tokens.popitem(last=False)
@@ -1,46 +1,93 @@
 import logging
 import os
+from collections import OrderedDict
 from logging.handlers import TimedRotatingFileHandler
 from typing import Optional
 
+from common.queued_logging import QueuedLogPipeline
+
 _LOG_DIRECTORY = f"{os.environ.get('LOG_FILEPATH', './logs')}/user/"
 if not os.path.exists(_LOG_DIRECTORY):
     os.mkdir(_LOG_DIRECTORY)
+# maximum number of user log files kept open at the same time
+_MAX_OPEN_FILES = int(os.environ.get('USER_LOG_MAX_OPEN_FILES', 256))
+_DEFAULT_USER_EMAIL = '000000-Default'
+
+
+class _UserFileHandlerPool(logging.Handler):
+    """handler writing each record into the log file of its user
+    file handlers are opened on demand and the least recently used one is closed when too many are open"""
+
+    def __init__(self, max_open_files: int):
+        super().__init__()
+        self._max_open_files = max_open_files
+        self._file_handlers = OrderedDict()
+
+    def emit(self, record: logging.LogRecord):
+        user_email = getattr(record, 'user_email', _DEFAULT_USER_EMAIL)
+        file_handler = self._file_handlers.get(user_email, None)
+        if file_handler is None:
+            file_handler = TimedRotatingFileHandler(f"{_LOG_DIRECTORY}/{user_email}.log",
+                                                    when='midnight',
+                                                    backupCount=7,
+                                                    utc=True)
+            file_handler.setFormatter(self.formatter)
+            self._file_handlers[user_email] = file_handler
+            while len(self._file_handlers) > self._max_open_files:
+                self._file_handlers.popitem(last=False)[1].close()
+        else:
+            self._file_handlers.move_to_end(user_email)
+        file_handler.handle(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            while self._file_handlers:
+                self._file_handlers.popitem()[1].close()
+        finally:
+            self.release()
+        super().close()
+
+
+class _UserLoggerAdapter(logging.LoggerAdapter):
+    """adds the user email to records of the shared user logger and applies the level of its UserLogger"""
+
+    def __init__(self, logger: logging.Logger, user_email: str, level: int):
+        super().__init__(logger, {'user_email': user_email})
+        self.level = level
+
+    def isEnabledFor(self, level: int) -> bool:
+        return level >= self.level and self.logger.isEnabledFor(level)
 
 
 class UserLogger:
     """this class will be used to store user activities in separated log files"""
-    __log_formatter = logging.Formatter('%(asctime)s %(name)s %(module)s  %(lineno)d %(levelname)s %(message)s')
+    log_formatter = logging.Formatter('%(asctime)s %(name)s %(module)s  %(lineno)d %(levelname)s %(message)s')
 
     def __init__(self, user_email: Optional[str] = None):
-        self.__user_email = user_email
         self.__debug_level = logging.DEBUG
-        # only one logger will be used and its file handler will be updated on demand
-        self.__file_logger = logging.getLogger("user-logger")
-        self.set_user_email(self.__user_email, self.__debug_level)
+        self.__file_logger: Optional[_UserLoggerAdapter] = None
+        self.set_user_email(user_email, self.__debug_level)
 
     def set_user_email(self, user_email: Optional[str], log_level: int = logging.DEBUG):
-        """set user email of the logger and change its file handler consequently"""
+        """set user email of the logger, its records will be written in the log file of this user"""
         if user_email is None:
-            user_email = '000000-Default'
-
-        # remove all handlers from the logger
-        for handler in self.__file_logger.handlers:
-            self.__file_logger.removeHandler(handler)
-        # create new handler and attach it to logger
-        log_handler = TimedRotatingFileHandler(f"{_LOG_DIRECTORY}/{user_email}.log",
-                                               when='midnight',
-                                               backupCount=7,
-                                               utc=True)
-        log_handler.setFormatter(UserLogger.__log_formatter)
-        self.__file_logger.addHandler(log_handler)
-
-        # set wanted log level
+            user_email = _DEFAULT_USER_EMAIL
+        _PIPELINE.ensure_started()
+        # records of all users go through the same logger, the user email is carried by each record
         self.__debug_level = log_level
-        self.__file_logger.setLevel(self.__debug_level)
+        self.__file_logger = _UserLoggerAdapter(_PIPELINE.logger, user_email, log_level)
 
     @property
-    def file_logger(self):
+    def file_logger(self) -> logging.LoggerAdapter:
         return self.__file_logger
 
 
+def _create_file_handler_pool() -> logging.Handler:
+    pool = _UserFileHandlerPool(_MAX_OPEN_FILES)
+    pool.setFormatter(UserLogger.log_formatter)
+    return pool
+
+
+# records of all users are written to their files by a listener thread, requests never wait for file I/O
+_PIPELINE = QueuedLogPipeline("user-logger", _create_file_handler_pool)
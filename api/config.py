@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool
 
 # load .env files if any
 load_dotenv()
@@ -13,12 +14,56 @@ class ApiConfig(object):
     CORS_SUPPORTS_CREDENTIALS = True
     RBAC_USE_WHITE = True
     USER_TOKEN_VALIDITY_SPAN = int(os.environ.get('USER_TOKEN_VALIDITY_SPAN', 3600))
+    # authenticated identities are cached by bearer token for PRINCIPAL_CACHE_TTL seconds, identity changes made by
+    # the api invalidate them in all server workers (through REVOKED_TOKENS_FILEPATH), changes made outside of it
+    # (roles in db) are seen once cached identities expire
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    # maximum number of bearer tokens whose signature is verified once, until they expire
+    VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('VERIFIED_TOKEN_CACHE_SIZE', 10000))
+    # responses of read endpoints are cached in each worker up to RESPONSE_CACHE_MAX_BYTES bytes (0 to disable)
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 67108864))
+    # sql statements lasting at least SQL_SLOW_QUERY_THRESHOLD milliseconds are logged,
+    # faster ones are logged with a SQL_QUERY_SAMPLE_RATE probability (0 to disable sampling)
+    SQL_SLOW_QUERY_THRESHOLD = float(os.environ.get('SQL_SLOW_QUERY_THRESHOLD', 100))
+    SQL_QUERY_SAMPLE_RATE = float(os.environ.get('SQL_QUERY_SAMPLE_RATE', 0.01))
     LOG_FILEPATH = os.environ.get('LOG_FILEPATH', './logs/')
     DATA_FILEPATH = os.environ.get('DATA_FILEPATH', './files/')
     DB_CURSORCLASS = 'DictCursor'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {'encoding': 'utf8'}
+    # sqlite pragmas executed on every new db connection, see common/db_model/sqlite_profile.py
+    # WAL journal lets readers go on while a whitelist is written, mmap_size is in bytes,
+    # a negative cache_size is in KiB and busy_timeout is in milliseconds
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -65536)),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'foreign_keys': os.environ.get('SQLITE_FOREIGN_KEYS', 'ON'),
+    }
+    # db connections are kept open in a pool shared by requests (green threads when served by eventlet),
+    # up to SQLITE_POOL_SIZE + SQLITE_POOL_MAX_OVERFLOW connections are open at the same time
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.environ.get('SQLITE_POOL_MAX_OVERFLOW', 20))
+    SQLALCHEMY_ENGINE_OPTIONS = {'encoding': 'utf8',
+                                 'poolclass': QueuePool,
+                                 'pool_size': SQLITE_POOL_SIZE,
+                                 'max_overflow': SQLITE_POOL_MAX_OVERFLOW,
+                                 # pooled connections are used by several threads, one at a time
+                                 'connect_args': {'check_same_thread': False}}
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATA_FILEPATH}/db.sqlite"
+    # reads of GET requests may go to a replica, see common/db_model/replica.py :
+    # '' to disable, 'readonly' for read-only connections to db.sqlite, or 'backup' for a copy of db.sqlite
+    # in DB_REPLICA_FILEPATH refreshed when older than DB_REPLICA_REFRESH_INTERVAL seconds
+    DB_REPLICA_MODE = os.environ.get('DB_REPLICA_MODE', '')
+    DB_REPLICA_FILEPATH = f"{DATA_FILEPATH}/db_replica.sqlite"
+    DB_REPLICA_REFRESH_INTERVAL = float(os.environ.get('DB_REPLICA_REFRESH_INTERVAL', 5))
+    # tokens revoked at logout and principal cache invalidations are shared by all server workers through this file
+    REVOKED_TOKENS_FILEPATH = f"{DATA_FILEPATH}/revoked_tokens.sqlite"
+    # asynchronous whitelist deletions delete members by transactions of at most this number of rows
+    WHITELIST_DELETION_CHUNK_SIZE = int(os.environ.get('WHITELIST_DELETION_CHUNK_SIZE', 10000))
 
     @classmethod
     def to_string(cls) -> str:
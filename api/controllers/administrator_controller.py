@@ -1,25 +1,29 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from functools import wraps
 from typing import Dict
 
 from flask import Blueprint, g, current_app, request, json, jsonify
-from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
-from sqlalchemy.sql.functions import count
 
 from api.helper.allowed_charge_points import allowed_charge_points
+from api.helper.export import export_response, NDJSON
 from common.helper import standard_json_response
-from common.db_model import rbac, db
-from common.db_model.charge_point import ChargePoint, ChargePointStatus
+from common.db_model import rbac
+from common.db_model.charge_point import ChargePointStatusCount, ChargePointStatusSnapshot, ChargePointCluster
 from common.db_model.user import Role, User
 from common.db_model.whitelist import WhitelistUser, Whitelist, WhitelistChargePoint
 
 from api.auth import token_auth
 from api.helper.user_info import get_user_info as helper_get_user_info
+from api.helper.etag import conditional_get
+from api.helper.response_cache import cached_response
 
 
 administrator_api = Blueprint('administrator', __name__)
 
+# maximum number of days of a charge point statistics history
+_MAX_STATISTICS_HISTORY_DAYS = 366
+
 
 def load_user_if_allowed(f):
     """this wrapper loads user as g.inspected_user if and only if it belongs to
@@ -42,13 +46,17 @@ def load_user_if_allowed(f):
 @administrator_api.route('/list-organization-employees', methods=['GET'])
 @rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.list_organization_employees")
 @token_auth.login_required
+@conditional_get
+@cached_response()
 def list_organization_employees():
     """Returns the list of employees belonging to this administrator organization"""
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'email')
-    order = request.args.get('order', 'asc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -56,22 +64,26 @@ def list_organization_employees():
     else:
         _filter = {}
 
-    _filter['organization_id'] = g.current_user.organization.id
+    _filter['organization_id'] = g.current_user.organization_id
     _filter['role'] = Role.EMPLOYEE
 
-    total = User.get_total_for_list(_filter=_filter)
-
-    m_users = User.get_all_for_list(
-        limit=limit,
-        offset=offset,
-        sort=sort,
-        order=order,
-        _filter=_filter
-    )
+    try:
+        m_users, total, next_cursor = User.get_page_for_list(
+            limit=limit,
+            offset=offset,
+            sort=sort,
+            order=order,
+            _filter=_filter,
+            cursor=cursor,
+            with_total=with_total
+        )
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
 
     data = {
         "total": total,
-        "rows": list(map(lambda x: x.to_list_dict(), m_users))
+        "rows": list(map(lambda x: x.to_list_dict(), m_users)),
+        "next_cursor": next_cursor
     }
 
     response = jsonify(data)
@@ -80,10 +92,39 @@ def list_organization_employees():
     return response
 
 
+@administrator_api.route('/export-organization-employees', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.export_organization_employees")
+@token_auth.login_required
+def export_organization_employees():
+    """Streams all employees of this administrator organization as NDJSON (format=ndjson) or CSV (format=csv)
+    accepts the sort, order and filter arguments of list-organization-employees"""
+
+    export_format = request.args.get('format', NDJSON)
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    _filter = request.args.get('filter', None)
+
+    if _filter:
+        _filter = json.loads(_filter)
+    else:
+        _filter = {}
+
+    _filter['organization_id'] = g.current_user.organization_id
+    _filter['role'] = Role.EMPLOYEE
+
+    try:
+        query = User.get_rows_for_export(sort=sort, order=order, _filter=_filter)
+        return export_response(query, export_format, 'employees')
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
+
+
 @administrator_api.route('/get-employee-info/<_email>', methods=['GET'])
 @rbac.allow(['administrator'], ['GET'], endpoint='administrator.get_employee_info')
 @token_auth.login_required
 @load_user_if_allowed
+@conditional_get
+@cached_response()
 def get_employee_info(_email: str):
     """allows for an administrator to retrieve data about on organization employee"""
     user_info = helper_get_user_info(g.inspected_user)
@@ -94,13 +135,17 @@ def get_employee_info(_email: str):
 @rbac.allow(['employee'], methods=['GET'], endpoint="administrator.list_employee_allowed_charge_points")
 @token_auth.login_required
 @load_user_if_allowed
+@conditional_get
+@cached_response()
 def list_employee_allowed_charge_points(_email: str):
     """Returns the list of charge points one employee has access to"""
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'reference')
-    order = request.args.get('order', 'asc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -111,7 +156,10 @@ def list_employee_allowed_charge_points(_email: str):
     _filter['user_id'] = g.inspected_user.id
     _filter['unexpired_at'] = datetime.utcnow().strftime('%Y-%m-%d')
 
-    data = allowed_charge_points(limit, offset, sort, order, _filter)
+    try:
+        data = allowed_charge_points(limit, offset, sort, order, _filter, cursor, with_total)
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
 
     response = jsonify(data)
     response.headers['Access-Control-Allow-Origin'] = '*'
@@ -122,13 +170,13 @@ def list_employee_allowed_charge_points(_email: str):
 @administrator_api.route('/get-charge-point-statistics', methods=['GET'])
 @rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.get_charge_point_statistics")
 @token_auth.login_required
+@conditional_get
+@cached_response()
 def get_charge_point_statistics():
     """Returns statistics about charge points of the organization"""
 
-    stats = db.session.query(ChargePointStatus.code, ChargePointStatus.label, count(ChargePoint.id)). \
-        filter(and_(ChargePointStatus.id == ChargePoint.status_id,
-                    ChargePoint.organization_id == g.current_user.organization_id)) \
-        .group_by(ChargePointStatus.code).all()
+    # counters are kept current by triggers on charge_point, see sql/upgrade/0005_charge_point_statistics.sql
+    stats = ChargePointStatusCount.get_for_organization(g.current_user.organization_id)
 
     stats = list(map(lambda _tuple: {'status_code': _tuple[0],
                                      'status_label': _tuple[1],
@@ -137,16 +185,71 @@ def get_charge_point_statistics():
     return standard_json_response(http_status_code=200, data=stats)
 
 
+@administrator_api.route('/get-charge-point-statistics-history', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.get_charge_point_statistics_history")
+@token_auth.login_required
+@conditional_get
+@cached_response()
+def get_charge_point_statistics_history():
+    """Returns the number of charge points of the organization by status for each day from start to end
+    (YYYY-MM-DD, end defaults to today and start to 30 days before end)"""
+
+    try:
+        end = datetime.strptime(request.args['end'], "%Y-%m-%d").date() if request.args.get('end') \
+            else datetime.utcnow().date()
+        start = datetime.strptime(request.args['start'], "%Y-%m-%d").date() if request.args.get('start') \
+            else end - timedelta(days=29)
+        if start > end or (end - start).days >= _MAX_STATISTICS_HISTORY_DAYS:
+            raise ValueError(f"start must be before end and at most {_MAX_STATISTICS_HISTORY_DAYS} days before it")
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
+
+    history = ChargePointStatusSnapshot.get_history(g.current_user.organization_id, start, end)
+
+    return standard_json_response(http_status_code=200, data=history)
+
+
+@administrator_api.route('/get-charge-point-clusters', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.get_charge_point_clusters")
+@token_auth.login_required
+@conditional_get
+@cached_response()
+def get_charge_point_clusters():
+    """Returns the clusters of charge points of the organization in the bounding box (min_lat, min_lon, max_lat,
+    max_lon) of a map at a zoom level, with their number of charge points, centroid and number by status"""
+
+    try:
+        min_latitude, min_longitude, max_latitude, max_longitude = \
+            (float(request.args[name]) for name in ('min_lat', 'min_lon', 'max_lat', 'max_lon'))
+        zoom = int(request.args['zoom'])
+        if not (-90 <= min_latitude <= max_latitude <= 90) or not (-180 <= min_longitude <= max_longitude <= 180):
+            raise ValueError("bounding box must be within -90, -180, 90, 180 and min values must not exceed max values")
+    except KeyError as err:
+        return standard_json_response(http_status_code=400, message=f"{err.args[0]} is required")
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
+
+    # clusters are kept current by triggers, see sql/upgrade/0009_charge_point_cluster.sql
+    clusters = ChargePointCluster.get_for_bounding_box(g.current_user.organization_id, zoom, min_latitude,
+                                                       min_longitude, max_latitude, max_longitude)
+
+    return standard_json_response(http_status_code=200, data=clusters)
+
+
 @administrator_api.route('/list-whitelists', methods=['GET'])
 @rbac.allow(['administrator'], methods=['GET'], endpoint="administrator.list_whitelists")
 @token_auth.login_required
+@conditional_get
+@cached_response()
 def list_whitelists():
     """Returns whitelists of the organization"""
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'created_at')
-    order = request.args.get('order', 'desc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -154,21 +257,25 @@ def list_whitelists():
     else:
         _filter = {}
 
-    _filter['organization_id'] = g.current_user.organization.id
-
-    total = Whitelist.get_total_for_list(_filter=_filter)
-
-    m_whitelists = Whitelist.get_all_for_list(
-        limit=limit,
-        offset=offset,
-        sort=sort,
-        order=order,
-        _filter=_filter
-    )
+    _filter['organization_id'] = g.current_user.organization_id
+
+    try:
+        m_whitelists, total, next_cursor = Whitelist.get_page_for_list(
+            limit=limit,
+            offset=offset,
+            sort=sort,
+            order=order,
+            _filter=_filter,
+            cursor=cursor,
+            with_total=with_total
+        )
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
 
     data = {
         "total": total,
-        "rows": list(map(lambda x: x.to_list_dict(), m_whitelists))
+        "rows": list(map(lambda x: x.to_list_dict(), m_whitelists)),
+        "next_cursor": next_cursor
     }
 
     response = jsonify(data)
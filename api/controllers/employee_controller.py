@@ -3,9 +3,12 @@ from datetime import datetime
 from flask import Blueprint, g, request, json, jsonify
 
 from common.db_model import rbac
+from common.helper import standard_json_response
 
 from api.helper.allowed_charge_points import allowed_charge_points
 from api.auth import token_auth
+from api.helper.etag import conditional_get
+from api.helper.response_cache import cached_response
 
 employee_api = Blueprint('employee', __name__)
 
@@ -13,13 +16,18 @@ employee_api = Blueprint('employee', __name__)
 @employee_api.route('/list-allowed-charge-points', methods=['GET'])
 @rbac.allow(['employee'], methods=['GET'], endpoint="employee.list_allowed_charge_points")
 @token_auth.login_required
+@conditional_get
+@cached_response(per_user=True)
 def list_allowed_charge_points():
-    """Returns the list of charge points this employee has access to"""
+    """Returns the list of charge points this employee has access to
+    given lat, lon and radius (km) only charge points within radius are listed, sorted by distance by default"""
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'reference')
-    order = request.args.get('order', 'asc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -30,7 +38,17 @@ def list_allowed_charge_points():
     _filter['user_id'] = g.current_user.id
     _filter['unexpired_at'] = datetime.utcnow().strftime('%Y-%m-%d')
 
-    data = allowed_charge_points(limit, offset, sort, order, _filter)
+    location = [request.args.get(name, None) for name in ('lat', 'lon', 'radius')]
+    if any(location):
+        if not all(location):
+            return standard_json_response(http_status_code=400, message="lat, lon and radius must be given together")
+        _filter['near'] = location
+        sort = sort or 'distance'
+
+    try:
+        data = allowed_charge_points(limit, offset, sort, order, _filter, cursor, with_total)
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
 
     response = jsonify(data)
     response.headers['Access-Control-Allow-Origin'] = '*'
@@ -9,6 +9,8 @@ from common.helper import standard_json_response
 
 from api.auth import basic_auth, token_auth
 from api.helper.user_info import get_user_info as helper_get_user_info
+from api.helper.etag import conditional_get
+from api.helper.response_cache import cached_response
 
 user_api = Blueprint('user', __name__)
 
@@ -28,7 +30,8 @@ def login():
 @token_auth.login_required
 def logout():
     """logout the user, all front using its token will need to login again"""
-    current_app.token_manager.invalidate_user_token(g.current_user.id)
+    current_app.token_manager.invalidate_user_token(g.current_user.id, token_auth.get_auth().get('token'))
+    current_app.principal_cache.invalidate_user(g.current_user.id)
     return standard_json_response(http_status_code=200, message="You have been successfully logged out.")
 
 
@@ -36,6 +39,8 @@ def logout():
 @user_api.route('/get-info/<groups>', methods=['GET'])
 @rbac.allow(['employee', 'administrator'], ['GET'], endpoint='user.get_info')
 @token_auth.login_required
+@conditional_get
+@cached_response(per_user=True)
 def get_info(groups: Optional[str] = None):
     """
     :param groups a string of values & separated that can be specified to return only what you need,
@@ -45,7 +50,8 @@ def get_info(groups: Optional[str] = None):
     """
     if groups is not None:
         groups = groups.split('&')
-    user_info = helper_get_user_info(g.current_user, groups)
+    m_user: User = User.get_by_id(g.current_user.id)
+    user_info = helper_get_user_info(m_user, groups)
     return standard_json_response(http_status_code=200, data=user_info)
 
 
@@ -54,7 +60,7 @@ def get_info(groups: Optional[str] = None):
 @token_auth.login_required
 def update_info():
     """update user infos"""
-    m_user: User = g.current_user
+    m_user: User = User.get_by_id(g.current_user.id)
     req_data: Dict = request.get_json() or request.json or {}
 
     m_user.firstname = req_data.get("firstname", None) or m_user.firstname
@@ -62,6 +68,7 @@ def update_info():
     m_user.phone = req_data.get("phone", None) or m_user.phone
 
     db.session.commit()
+    current_app.principal_cache.invalidate_user(m_user.id)
 
     user_info = helper_get_user_info(m_user, ['info'])
     return standard_json_response(http_status_code=200, data=user_info)
@@ -72,7 +79,7 @@ def update_info():
 @token_auth.login_required
 def update_password():
     """update user password, a check is done on current password too"""
-    m_user: User = g.current_user
+    m_user: User = User.get_by_id(g.current_user.id)
     req_data: Dict = request.get_json() or request.json or {}
     req_keys = req_data.keys()
 
@@ -87,5 +94,6 @@ def update_password():
 
     m_user.password = req_data["new_password"]
     db.session.commit()
+    current_app.principal_cache.invalidate_user(m_user.id)
 
     return standard_json_response(http_status_code=200, message="Password succesfully updated.")
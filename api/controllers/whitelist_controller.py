@@ -1,18 +1,22 @@
 from datetime import date, datetime
 from functools import wraps
-from typing import Dict, Optional
+from typing import Dict
 
 from flask import Blueprint, g, current_app, request, json, jsonify
-from sqlalchemy import and_
-from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.functions import count
 
 from common.db_model import rbac, db
 from common.db_model.charge_point import ChargePoint, ChargePointStatus
 from common.db_model.user import Role, User
 from common.db_model.whitelist import WhitelistUser, Whitelist, WhitelistChargePoint
+from common.db_model.effective_access import EffectiveAccess
+from common.db_model.whitelist_deletion import WhitelistDeletion, delete_whitelist
 
 from api.auth import token_auth
+from api.helper.export import export_response, NDJSON
+from api.helper.whitelist_deletion import start_deletion
+from api.helper.etag import conditional_get
+from api.helper.response_cache import cached_response
 from common.helper import standard_json_response
 
 whitelist_api = Blueprint('whitelist', __name__)
@@ -40,6 +44,8 @@ def load_whitelist_if_allowed(f):
 @rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.get_info")
 @token_auth.login_required
 @load_whitelist_if_allowed
+@conditional_get
+@cached_response()
 def get_info(_id: int):
     """Returns general information about a whitelist"""
     return standard_json_response(http_status_code=200, data=g.current_whitelist.to_list_dict())
@@ -70,6 +76,7 @@ def update_info(_id: int):
                                                                     f" whitelist named "
                                                                     f"'{req_data['label']}'")
 
+    former_access = (m_whitelist.expires_at, m_whitelist.paid_by_organization)
     m_whitelist.label = req_data.get("label", None) or m_whitelist.label
     m_whitelist.paid_by_organization = bool(req_data.get("paid_by_organization", None)
                                             or m_whitelist.paid_by_organization)
@@ -77,6 +84,9 @@ def update_info(_id: int):
         m_whitelist.expires_at = datetime.strptime(req_data.get("expires_at"), "%Y-%m-%d").date() \
             if req_data.get("expires_at") else None
 
+    # access rows only depend on expires_at and paid_by_organization, a label change leaves them untouched
+    if (m_whitelist.expires_at, m_whitelist.paid_by_organization) != former_access:
+        EffectiveAccess.update_whitelist_info(m_whitelist.id, m_whitelist.expires_at, m_whitelist.paid_by_organization)
     db.session.commit()
 
     return standard_json_response(http_status_code=200, data=m_whitelist.to_list_dict())
@@ -105,7 +115,7 @@ def create():
                                                                     f"'{req_data['label']}'")
 
     m_whitelist = Whitelist()
-    m_whitelist.organization = g.current_user.organization
+    m_whitelist.organization_id = g.current_user.organization_id
     m_whitelist.created_at = datetime.utcnow().date()
 
     m_whitelist.label = req_data["label"]
@@ -124,27 +134,46 @@ def create():
 @token_auth.login_required
 @load_whitelist_if_allowed
 def delete(_id: int):
-    """Delete a whitelist"""
+    """Delete a whitelist with its members in a single transaction
+    with async=true, members are deleted by chunks in background and the deletion is returned with status 202,
+    its progress is available with get-deletion"""
 
     m_whitelist: Whitelist = g.current_whitelist
 
-    for m_whitelist_user in m_whitelist.user_links:
-        db.session.delete(m_whitelist_user)
-        db.session.commit()
-    for m_whitelist_charge_point in m_whitelist.charge_point_links:
-        db.session.delete(m_whitelist_charge_point)
-        db.session.commit()
-
-    db.session.delete(m_whitelist)
+    if request.args.get('async', 'false').lower() == 'true':
+        m_deletion = WhitelistDeletion.get_pending(m_whitelist.id)
+        if not m_deletion:
+            m_deletion = WhitelistDeletion.create(m_whitelist)
+            db.session.commit()
+        # a pending deletion is only started again if its thread stalled, e.g. after a server restart
+        start_deletion(m_deletion)
+        return standard_json_response(http_status_code=202, data=m_deletion.to_dict(),
+                                      message=f"Whitelist '{m_whitelist.label}' deletion started")
+
+    delete_whitelist(m_whitelist.id)
     db.session.commit()
 
     return standard_json_response(http_status_code=200, message=f"Whitelist '{m_whitelist.label}' successfully deleted")
 
 
+@whitelist_api.route('/get-deletion/<_id>', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.get_deletion")
+@token_auth.login_required
+def get_deletion(_id: int):
+    """Returns the status of an asynchronous whitelist deletion"""
+
+    m_deletion = WhitelistDeletion.get_by_id(_id)
+    if not m_deletion or m_deletion.organization_id != g.current_user.organization_id:
+        return standard_json_response(http_status_code=404, message=f"Unknown whitelist deletion with id {_id}")
+    return standard_json_response(http_status_code=200, data=m_deletion.to_dict())
+
+
 @whitelist_api.route('/list-users/<_id>/<_in>', methods=['GET'])
 @rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.list_users")
 @token_auth.login_required
 @load_whitelist_if_allowed
+@conditional_get
+@cached_response()
 def list_users(_id: int, _in: str):
     """
     :param _id: id of the whitelist
@@ -159,8 +188,10 @@ def list_users(_id: int, _in: str):
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'created_at')
-    order = request.args.get('order', 'desc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -172,14 +203,18 @@ def list_users(_id: int, _in: str):
 
     if _in == 'in':
         _filter['whitelist_id'] = m_whitelist.id
-        total = WhitelistUser.get_total_for_list_for_whitelist(_filter=_filter)
-        m_tuples = WhitelistUser.get_all_for_list_for_whitelist(
-            limit=limit,
-            offset=offset,
-            sort=sort,
-            order=order,
-            _filter=_filter
-        )
+        try:
+            m_tuples, total, next_cursor = WhitelistUser.get_page_for_list_for_whitelist(
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                order=order,
+                _filter=_filter,
+                cursor=cursor,
+                with_total=with_total
+            )
+        except ValueError as err:
+            return standard_json_response(http_status_code=400, message=str(err))
         for m_whitelist_user, m_user, m_whitelist in m_tuples:
             m_user: User
             m_user_dict = m_user.to_list_dict()
@@ -192,14 +227,18 @@ def list_users(_id: int, _in: str):
         _filter['organization_id'] = m_whitelist.organization_id
         _filter['excluded_whitelist_id'] = m_whitelist.id
 
-        total = WhitelistUser.get_total_for_list_not_in_whitelist(_filter=_filter)
-        m_tuples = WhitelistUser.get_all_for_list_not_in_whitelist(
-            limit=limit,
-            offset=offset,
-            sort=sort,
-            order=order,
-            _filter=_filter
-        )
+        try:
+            m_tuples, total, next_cursor = WhitelistUser.get_page_for_list_not_in_whitelist(
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                order=order,
+                _filter=_filter,
+                cursor=cursor,
+                with_total=with_total
+            )
+        except ValueError as err:
+            return standard_json_response(http_status_code=400, message=str(err))
         for m_user in m_tuples:
             m_user: User
             m_user_dict = m_user.to_list_dict()
@@ -207,7 +246,8 @@ def list_users(_id: int, _in: str):
 
     data = {
         "total": total,
-        "rows": list(users)
+        "rows": list(users),
+        "next_cursor": next_cursor
     }
 
     response = jsonify(data)
@@ -220,6 +260,8 @@ def list_users(_id: int, _in: str):
 @rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.list_charge_points")
 @token_auth.login_required
 @load_whitelist_if_allowed
+@conditional_get
+@cached_response()
 def list_charge_points(_id: int, _in: str):
     """
     :param _id: id of the whitelist
@@ -234,8 +276,10 @@ def list_charge_points(_id: int, _in: str):
 
     limit = int(request.args.get('limit', 10))
     offset = int(request.args.get('offset', 0))
-    sort = request.args.get('sort', 'reference')
-    order = request.args.get('order', 'asc')
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    cursor = request.args.get('cursor', None)
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
     _filter = request.args.get('filter', None)
 
     if _filter:
@@ -247,14 +291,18 @@ def list_charge_points(_id: int, _in: str):
 
     if _in == 'in':
         _filter['whitelist_id'] = m_whitelist.id
-        total = WhitelistChargePoint.get_total_for_list_for_whitelist(_filter=_filter)
-        m_tuples = WhitelistChargePoint.get_all_for_list_for_whitelist(
-            limit=limit,
-            offset=offset,
-            sort=sort,
-            order=order,
-            _filter=_filter
-        )
+        try:
+            m_tuples, total, next_cursor = WhitelistChargePoint.get_page_for_list_for_whitelist(
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                order=order,
+                _filter=_filter,
+                cursor=cursor,
+                with_total=with_total
+            )
+        except ValueError as err:
+            return standard_json_response(http_status_code=400, message=str(err))
         for m_charge_point, m_charge_point_status, m_whitelist_charge_point, m_address, m_zip_code, m_city in m_tuples:
             m_charge_point: ChargePoint
             cp_dict = m_charge_point.to_list_dict()
@@ -263,14 +311,18 @@ def list_charge_points(_id: int, _in: str):
     else:
         _filter['organization_id'] = m_whitelist.organization_id
         _filter['excluded_whitelist_id'] = m_whitelist.id
-        total = WhitelistChargePoint.get_total_for_list_not_in_whitelist(_filter=_filter)
-        m_tuples = WhitelistChargePoint.get_all_for_list_not_in_whitelist(
-            limit=limit,
-            offset=offset,
-            sort=sort,
-            order=order,
-            _filter=_filter
-        )
+        try:
+            m_tuples, total, next_cursor = WhitelistChargePoint.get_page_for_list_not_in_whitelist(
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                order=order,
+                _filter=_filter,
+                cursor=cursor,
+                with_total=with_total
+            )
+        except ValueError as err:
+            return standard_json_response(http_status_code=400, message=str(err))
         for m_charge_point, m_charge_point_status, m_address, m_zip_code, m_city in m_tuples:
             m_charge_point: ChargePoint
             cp_dict = m_charge_point.to_list_dict()
@@ -278,7 +330,8 @@ def list_charge_points(_id: int, _in: str):
 
     data = {
         "total": total,
-        "rows": list(charge_points)
+        "rows": list(charge_points),
+        "next_cursor": next_cursor
     }
 
     response = jsonify(data)
@@ -287,6 +340,89 @@ def list_charge_points(_id: int, _in: str):
     return response
 
 
+@whitelist_api.route('/export-users/<_id>/<_in>', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.export_users")
+@token_auth.login_required
+@load_whitelist_if_allowed
+def export_users(_id: int, _in: str):
+    """
+    Streams users as NDJSON (format=ndjson) or CSV (format=csv), accepts the sort, order and filter arguments
+    of list-users
+    :param _id: id of the whitelist
+    :param _in: must be either in or out : if in users of the whitelist will be included,
+    if out users of the organization outside the whitelist
+    :return:
+    """
+    if _in not in ['in', 'out']:
+        return standard_json_response(http_status_code=400, message=f"Parameter in must be either in or out.")
+
+    m_whitelist: Whitelist = g.current_whitelist
+
+    export_format = request.args.get('format', NDJSON)
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    _filter = request.args.get('filter', None)
+
+    if _filter:
+        _filter = json.loads(_filter)
+    else:
+        _filter = {}
+
+    try:
+        if _in == 'in':
+            _filter['whitelist_id'] = m_whitelist.id
+            query = WhitelistUser.get_rows_for_export_for_whitelist(sort=sort, order=order, _filter=_filter)
+        else:
+            _filter['organization_id'] = m_whitelist.organization_id
+            _filter['excluded_whitelist_id'] = m_whitelist.id
+            query = WhitelistUser.get_rows_for_export_not_in_whitelist(sort=sort, order=order, _filter=_filter)
+        return export_response(query, export_format, f"whitelist-{m_whitelist.id}-users-{_in}")
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
+
+
+@whitelist_api.route('/export-charge-points/<_id>/<_in>', methods=['GET'])
+@rbac.allow(['administrator'], methods=['GET'], endpoint="whitelist.export_charge_points")
+@token_auth.login_required
+@load_whitelist_if_allowed
+def export_charge_points(_id: int, _in: str):
+    """
+    Streams charge points as NDJSON (format=ndjson) or CSV (format=csv), accepts the sort, order and filter
+    arguments of list-charge-points
+    :param _id: id of the whitelist
+    :param _in: must be either in or out : if in charge_points of the whitelist will be included,
+    if out charge_points of the organization outside the whitelist
+    :return:
+    """
+    if _in not in ['in', 'out']:
+        return standard_json_response(http_status_code=400, message=f"Parameter in must be either in or out.")
+
+    m_whitelist: Whitelist = g.current_whitelist
+
+    export_format = request.args.get('format', NDJSON)
+    sort = request.args.get('sort', None)
+    order = request.args.get('order', None)
+    _filter = request.args.get('filter', None)
+
+    if _filter:
+        _filter = json.loads(_filter)
+    else:
+        _filter = {}
+
+    try:
+        if _in == 'in':
+            _filter['whitelist_id'] = m_whitelist.id
+            query = WhitelistChargePoint.get_rows_for_export_for_whitelist(sort=sort, order=order, _filter=_filter)
+        else:
+            _filter['organization_id'] = m_whitelist.organization_id
+            _filter['excluded_whitelist_id'] = m_whitelist.id
+            query = WhitelistChargePoint.get_rows_for_export_not_in_whitelist(sort=sort, order=order,
+                                                                              _filter=_filter)
+        return export_response(query, export_format, f"whitelist-{m_whitelist.id}-charge-points-{_in}")
+    except ValueError as err:
+        return standard_json_response(http_status_code=400, message=str(err))
+
+
 @whitelist_api.route('/update-users/<_id>/<_in>', methods=['POST'])
 @rbac.allow(['administrator'], methods=['POST'], endpoint="whitelist.update_users")
 @token_auth.login_required
@@ -320,46 +456,19 @@ def update_users(_id: int, _in: str):
                                           message=f"Missing key or wrong value 'expires_at' (mandatory when in) : "
                                                   f"must be null or a date formatted like YYYY-MM-dd")
 
-        m_users = User.query.options(joinedload(User.whitelist_links)). \
-            filter(and_(User.email.in_(user_emails),
-                        User.organization_id == m_whitelist.organization_id)).all()
-
-        results = {}
-
-        for m_user in m_users:
-            m_user: User
-            existing_link: Optional[WhitelistUser] = None
-            for m_link in filter(lambda x: x.whitelist_id == m_whitelist.id, m_user.whitelist_links):
-                existing_link = m_link
-            if existing_link:
-                existing_link.expires_at = expires_at
-                results[m_user.email] = "UPDATED"
-            else:
-                new_link = WhitelistUser()
-                new_link.created_at = datetime.utcnow().date()
-                new_link.whitelist = m_whitelist
-                new_link.user = m_user
-                new_link.expires_at = expires_at
-                db.session.add(new_link)
-                results[m_user.email] = "ADDED"
+        results, user_ids = WhitelistUser.add_users(m_whitelist, user_emails,
+                                                    expires_at.date() if expires_at is not None else None)
 
+        EffectiveAccess.refresh(m_whitelist.id, user_ids=user_ids)
         db.session.commit()
         return standard_json_response(http_status_code=200,
                                       data=results,
                                       message=f"{len(results.keys())} users successfully added/updated into the whitelist.")
     else:
         # out case
-        m_users = User.query.options(joinedload(User.whitelist_links)). \
-            filter(and_(User.email.in_(user_emails),
-                        User.organization_id == m_whitelist.organization_id)).all()
-
-        results = {}
-
-        for m_user in m_users:
-            for m_link in filter(lambda x: x.whitelist_id == m_whitelist.id, m_user.whitelist_links):
-                db.session.delete(m_link)
-                results[m_user.email] = "REMOVED"
+        results, user_ids = WhitelistUser.remove_users(m_whitelist, user_emails)
 
+        EffectiveAccess.refresh(m_whitelist.id, user_ids=user_ids)
         db.session.commit()
         return standard_json_response(http_status_code=200,
                                       data=results,
@@ -392,43 +501,19 @@ def update_charge_points(_id: int, _in: str):
 
     if _in == 'in':
 
-        m_charge_points = ChargePoint.query.options(joinedload(ChargePoint.whitelist_links)). \
-            filter(and_(ChargePoint.reference.in_(references),
-                        ChargePoint.organization_id == m_whitelist.organization_id)).all()
-
-        results = {}
-
-        for m_charge_point in m_charge_points:
-            m_charge_point: ChargePoint
-            existing_link: Optional[WhitelistChargePoint] = None
-            for m_link in filter(lambda x: x.whitelist_id == m_whitelist.id, m_charge_point.whitelist_links):
-                existing_link = m_link
-            if not existing_link:
-                new_link = WhitelistChargePoint()
-                new_link.created_at = datetime.utcnow().date()
-                new_link.whitelist = m_whitelist
-                new_link.charge_point = m_charge_point
-                db.session.add(new_link)
-                results[m_charge_point.reference] = "ADDED"
+        results, charge_point_ids = WhitelistChargePoint.add_charge_points(m_whitelist, references)
 
+        EffectiveAccess.refresh(m_whitelist.id, charge_point_ids=charge_point_ids)
         db.session.commit()
         return standard_json_response(http_status_code=200,
                                       data=results,
                                       message=f"{len(results.keys())} charge points successfully added into the whitelist.")
     else:
         # out case
-        m_charge_points = ChargePoint.query.options(joinedload(ChargePoint.whitelist_links)). \
-            filter(and_(ChargePoint.reference.in_(references),
-                        ChargePoint.organization_id == m_whitelist.organization_id)).all()
-
-        results = {}
-
-        for m_charge_point in m_charge_points:
-            for m_link in filter(lambda x: x.whitelist_id == m_whitelist.id, m_charge_point.whitelist_links):
-                db.session.delete(m_link)
-                results[m_charge_point.reference] = "REMOVED"
+        results, charge_point_ids = WhitelistChargePoint.remove_charge_points(m_whitelist, references)
 
+        EffectiveAccess.refresh(m_whitelist.id, charge_point_ids=charge_point_ids)
         db.session.commit()
         return standard_json_response(http_status_code=200,
                                       data=results,
-                                      message=f"{len(results.keys())} charge points successfully removed from the whitelist.")
\ No newline at end of file
+                                      message=f"{len(results.keys())} charge points successfully removed from the whitelist.")
@@ -0,0 +1,50 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, g, make_response, request
+
+from common.db_model.data_version import get_data_version
+
+
+def current_data_version() -> int:
+    """data version of the organization of the authenticated user, read once per request"""
+    if 'data_version' not in g:
+        g.data_version = get_data_version(g.current_user.organization_id)
+    return g.data_version
+
+
+def _compute_etag() -> str:
+    """strong ETag of the response of the current request, derived from the data version of the organization of the
+    authenticated user, the user, the requested url and the current day (lists depend on expiry dates)"""
+    key = f"{g.current_user.organization_id}:{current_data_version()}:" \
+          f"{g.current_user.id}:{datetime.utcnow().date().isoformat()}:{request.full_path}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def _set_cache_headers(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    # responses are specific to the authenticated user and must be revalidated each time they are used
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def conditional_get(f):
+    """this wrapper answers 304 Not Modified, before running the view, to requests whose If-None-Match header holds
+    the ETag of the current data version, and sets the ETag of successful responses of the view
+    it must be applied after authentication (g.current_user)
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        etag = _compute_etag()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.headers['Access-Control-Allow-Origin'] = '*'
+            return _set_cache_headers(response, etag)
+
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            _set_cache_headers(response, etag)
+        return response
+
+    return decorated
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterable, Iterator, List
+
+from flask import Response, stream_with_context
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+EXPORT_FORMATS = {NDJSON: 'application/x-ndjson', CSV: 'text/csv'}
+
+# number of serialized rows sent in each chunk of the response body
+_CHUNK_ROWS = 200
+
+
+def _to_json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _serialize_ndjson(columns: List[str], rows: Iterable) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_to_json_value, row))), ensure_ascii=False) + '\n'
+
+
+def _serialize_csv(columns: List[str], rows: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(map(_to_json_value, row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_response(query, export_format: str, filename: str) -> Response:
+    """returns a response streaming rows of query serialized one by one as NDJSON (one object per line) or as CSV.
+    The query is executed before returning so that sql errors are raised by the view,
+    rows are then fetched by batches while the body is sent : memory does not depend on the number of rows.
+    raises ValueError if export_format is not supported"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{export_format}', must be one of {', '.join(EXPORT_FORMATS.keys())}")
+    columns = [description['name'] for description in query.column_descriptions]
+    rows = iter(query)
+    serialize = _serialize_ndjson if export_format == NDJSON else _serialize_csv
+
+    def generate():
+        chunk = []
+        for line in serialize(columns, rows):
+            chunk.append(line)
+            if len(chunk) == _CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk.clear()
+        if chunk:
+            yield ''.join(chunk)
+
+    response = Response(stream_with_context(generate()),
+                        content_type=f"{EXPORT_FORMATS[export_format]}; charset=utf-8")
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
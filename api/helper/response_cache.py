@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+from flask import Response, current_app, g, make_response, request
+
+from api.helper.etag import current_data_version
+
+# bytes accounted for each entry in addition to its body (key, headers, bookkeeping)
+_ENTRY_OVERHEAD = 512
+
+
+class CachedResponse(NamedTuple):
+    """immutable copy of a successful response of a read endpoint"""
+    data_version: int
+    body: bytes
+    headers: List[Tuple[str, str]]
+    mimetype: str
+
+
+class ResponseCache:
+    """in-process cache of responses of read endpoints, keyed by organization, endpoint, arguments and user when
+    responses depend on the user.
+    an entry is served only while the data version of its organization is unchanged, so that writes made by other
+    workers are seen, writes of this worker invalidate the entries of their organization right away.
+    requests reading a data version older than the latest one seen for their organization (from a lagging replica
+    while others read their writes from the primary) are neither served nor cached, and invalidate nothing.
+    least recently used entries are evicted when the size of cached bodies exceeds max_bytes"""
+    _max_bytes: int
+    _size: int
+    _entries: OrderedDict
+    _keys_by_organization_id: Dict[int, Set[Hashable]]
+    _data_version_by_organization_id: Dict[int, int]
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._size = 0
+        # key => cached response, ordered from least to most recently used, key[0] is the organization id
+        self._entries = OrderedDict()
+        self._keys_by_organization_id = {}
+        # latest data version seen by organization, entries of an organization are all cached at this version
+        self._data_version_by_organization_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    def get(self, key: Tuple, data_version: int) -> Optional[CachedResponse]:
+        """returns the cached response of key if it was cached at data_version, None otherwise
+        entries of the organization cached at a former version are removed, a data version older than the latest
+        one seen for the organization is a miss which leaves entries untouched"""
+        with self._lock:
+            latest_data_version = self._data_version_by_organization_id.get(key[0], data_version)
+            if data_version > latest_data_version:
+                self._invalidate_organization(key[0])
+            if data_version >= latest_data_version:
+                self._data_version_by_organization_id[key[0]] = data_version
+            entry: Optional[CachedResponse] = self._entries.get(key, None)
+            if entry is not None and entry.data_version != data_version:
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, response: CachedResponse):
+        """caches response, responses larger than a sixteenth of the cache or read at a data version older than the
+        latest one seen for the organization are not cached"""
+        size = len(response.body) + _ENTRY_OVERHEAD
+        if size > self._max_bytes // 16:
+            return
+        with self._lock:
+            if response.data_version < self._data_version_by_organization_id.get(key[0], response.data_version):
+                return
+            self._remove(key)
+            self._entries[key] = response
+            self._keys_by_organization_id.setdefault(key[0], set()).add(key)
+            self._size += size
+            while self._size > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_organization(self, organization_id: int):
+        """removes all cached responses of an organization, must be called when its data change"""
+        with self._lock:
+            self._invalidate_organization(organization_id)
+
+    def statistics(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self._max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'invalidations': self.invalidations}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_organization_id.clear()
+            self._data_version_by_organization_id.clear()
+            self._size = 0
+
+    def _invalidate_organization(self, organization_id: int):
+        keys = self._keys_by_organization_id.get(organization_id, None)
+        if keys:
+            self.invalidations += 1
+            for key in list(keys):
+                self._remove(key)
+
+    def _remove(self, key: Tuple):
+        entry: Optional[CachedResponse] = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= len(entry.body) + _ENTRY_OVERHEAD
+        keys = self._keys_by_organization_id[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_organization_id[key[0]]
+
+
+def _cache_key(per_user: bool) -> Tuple:
+    """(organization id, endpoint, current day, view arguments, sorted query arguments, user id or None)
+    lists depend on the current day through expiry dates"""
+    return (g.current_user.organization_id,
+            request.endpoint,
+            datetime.utcnow().date(),
+            tuple(sorted(request.view_args.items())) if request.view_args else (),
+            tuple(sorted(request.args.items(multi=True))),
+            g.current_user.id if per_user else None)
+
+
+def cached_response(per_user: bool = False):
+    """this wrapper serves successful responses of a read endpoint from the response cache of the application
+    while the data of the organization of the authenticated user are unchanged
+    per_user must be True when the response depends on the authenticated user and not only on its organization
+    it must be applied after authentication (g.current_user), a X-Cache header tells whether the response was cached
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            cache: ResponseCache = current_app.response_cache
+            if not cache.enabled:
+                return f(*args, **kwargs)
+
+            key = _cache_key(per_user)
+            data_version = current_data_version()
+            cached = cache.get(key, data_version)
+            if cached is not None:
+                response = Response(cached.body, status=200, headers=cached.headers, mimetype=cached.mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.put(key, CachedResponse(data_version, response.get_data(),
+                                              [(name, value) for name, value in response.headers
+                                               if name not in ('Content-Type', 'Content-Length')],
+                                              response.mimetype))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated
+
+    return decorator
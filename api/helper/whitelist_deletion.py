@@ -0,0 +1,71 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Set
+
+from flask import Flask, current_app
+from sqlalchemy import update
+
+from common.db_model import db
+from common.db_model.data_version import bump_data_version
+from common.db_model.whitelist_deletion import WhitelistDeletion, delete_whitelist, delete_whitelist_members_chunk
+
+# a pending deletion whose thread made no progress within this delay is considered interrupted (server restart)
+_STALLED_AFTER = timedelta(seconds=60)
+
+# ids of the deletions run by a thread of this process
+_running_deletion_ids: Set[int] = set()
+_running_deletion_ids_lock = threading.Lock()
+
+
+def _run_deletion(application: Flask, deletion_id: int, whitelist_id: int, organization_id: int):
+    with application.app_context():
+        chunk_size = current_app.config['WHITELIST_DELETION_CHUNK_SIZE']
+        try:
+            while delete_whitelist_members_chunk(whitelist_id, chunk_size):
+                bump_data_version(organization_id)
+                WhitelistDeletion.beat(deletion_id)
+                db.session.commit()
+                # lets requests waiting for the writer lock (or other green threads) run between chunks
+                time.sleep(0)
+            delete_whitelist(whitelist_id)
+            bump_data_version(organization_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception(f"Deletion {deletion_id} of whitelist {whitelist_id} failed")
+            # the deletion may have been completed meanwhile by a synchronous deletion of the whitelist
+            db.session.execute(update(WhitelistDeletion.__table__).
+                               where(WhitelistDeletion.__table__.c.id == deletion_id,
+                                     WhitelistDeletion.__table__.c.status == WhitelistDeletion.PENDING).
+                               values(status=WhitelistDeletion.FAILED))
+            db.session.commit()
+        finally:
+            db.session.remove()
+            with _running_deletion_ids_lock:
+                _running_deletion_ids.discard(deletion_id)
+
+
+def start_deletion(deletion: WhitelistDeletion) -> bool:
+    """deletes the whitelist of a committed pending deletion in a background thread (a green thread when served by
+    eventlet). A deletion is run by a single thread : it is only started if no thread of this process runs it and
+    if no thread of any worker made progress on it for _STALLED_AFTER, so that a deletion interrupted by a server
+    restart is resumed by a later request. Returns True if a thread was started"""
+    with _running_deletion_ids_lock:
+        if deletion.id in _running_deletion_ids:
+            return False
+        _running_deletion_ids.add(deletion.id)
+
+    claimed = WhitelistDeletion.claim(deletion.id, _STALLED_AFTER)
+    db.session.commit()
+    if not claimed:
+        with _running_deletion_ids_lock:
+            _running_deletion_ids.discard(deletion.id)
+        return False
+
+    thread = threading.Thread(target=_run_deletion,
+                              args=(current_app._get_current_object(), deletion.id, deletion.whitelist_id,
+                                    deletion.organization_id),
+                              daemon=True)
+    thread.start()
+    return True
@@ -0,0 +1,115 @@
+"""production wsgi server : the api is served by eventlet green threads in pre-forked worker processes
+all accepting connections on the same listening socket.
+The application and its models are loaded by the master process before forking, so that their memory pages are
+shared copy-on-write between workers. eventlet.monkey_patch() must be called before importing this module"""
+import atexit
+import os
+import signal
+import time
+
+import eventlet
+import eventlet.greenthread
+import eventlet.hubs
+import eventlet.wsgi
+from flask import Flask
+
+from common.db_model import db
+
+
+class _GracefulHttpProtocol(eventlet.wsgi.HttpProtocol):
+    """marks connections as busy while a request is handled : when the server stops, eventlet shuts down idle
+    connections and waits for the other ones, but never marks any connection as busy by itself"""
+
+    def _read_request_line(self):
+        request_line = super()._read_request_line()
+        if request_line and self.conn_state[2] == eventlet.wsgi.STATE_IDLE:
+            self.conn_state[2] = eventlet.wsgi.STATE_REQUEST
+        return request_line
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.conn_state[2] == eventlet.wsgi.STATE_REQUEST:
+            self.conn_state[2] = eventlet.wsgi.STATE_IDLE
+
+
+def _serve_worker(application: Flask, sock, max_requests: int, max_connections: int):
+    """serves requests on sock until SIGTERM is received or max_requests requests have been handled (0 for no limit)
+    in-flight requests are completed before returning"""
+    stopping = False
+    handled_requests = 0
+
+    def counting_application(environ, start_response):
+        nonlocal handled_requests
+        handled_requests += 1
+        if handled_requests == max_requests:
+            _stop_server(server)
+        return application(environ, start_response)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    # ctrl-c is handled by the master which then stops its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = eventlet.spawn(eventlet.wsgi.server, sock, counting_application,
+                            max_size=max_connections, protocol=_GracefulHttpProtocol, log_output=False)
+    # signal handlers run while the hub polls without waking it up, the flag is checked periodically
+    while not stopping and not server.dead:
+        time.sleep(0.2)
+    _stop_server(server)
+    server.wait()
+
+
+def _stop_server(server: eventlet.greenthread.GreenThread):
+    """raised in the accept loop, SystemExit makes the server stop accepting connections
+    then wait for in-flight requests"""
+    if not server.dead:
+        server.kill(SystemExit)
+
+
+def serve(application: Flask, host: str, port: int, workers: int = 1, backlog: int = 1024,
+          max_requests: int = 0, max_connections: int = 1000):
+    """serves application with workers processes until SIGTERM or SIGINT is received by the master process.
+    A worker having handled max_requests requests (0 for no limit) is replaced by a new one.
+    This function returns once all workers are stopped"""
+    sock = eventlet.listen((host, port), backlog=backlog)
+    # connections opened while creating the application must not be shared by forked workers
+    with application.app_context():
+        db.engine.dispose()
+    if getattr(application, 'replica_router', None) is not None:
+        application.replica_router.engine.dispose()
+
+    worker_pids = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on http://{host}:{port} with {workers} worker(s)")
+    while not stopping:
+        while len(worker_pids) < workers:
+            pid = os.fork()
+            if pid == 0:
+                # the hub of the master process (and its epoll instance) must not be shared
+                eventlet.hubs.use_hub()
+                _serve_worker(application, sock, max_requests, max_connections)
+                # interpreter shutdown of a forked process may hang on green threads inherited from the master,
+                # exit functions (writing queued log records) are run before exiting right away
+                atexit._run_exitfuncs()
+                os._exit(0)
+            worker_pids.add(pid)
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            worker_pids.discard(pid)
+        else:
+            time.sleep(0.2)
+
+    for pid in worker_pids:
+        os.kill(pid, signal.SIGTERM)
+    for pid in worker_pids:
+        os.waitpid(pid, 0)
+    sock.close()
@@ -0,0 +1,85 @@
+"""benchmark of the charge point map clusters
+measures get-charge-point-clusters on bounding boxes of several zoom levels, on --size charge points located at
+distinct random addresses of metropolitan France, compares it with a statement grouping the charge points of
+the box by cell, then measures the cost of the cluster triggers on charge point inserts
+usage: python -m benchmarks.charge_point_clusters --size 100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_addresses, populate_charge_points, \
+    measure, ORGANIZATION_ID, DATABASE_FILEPATH
+import base64
+import json
+import sqlite3
+import time
+
+import click
+
+from api.helper.response_cache import ResponseCache
+
+# (label, zoom, min latitude, min longitude, max latitude, max longitude) of measured map views
+_VIEWS = [('France', 5, 41.0, -5.5, 51.5, 9.5),
+          ('Ile-de-France', 9, 48.1, 1.4, 49.3, 3.6),
+          ('Paris', 13, 48.8, 2.25, 48.92, 2.42)]
+
+# clustering on request : charge points of the box are grouped by cell by each request
+_SCAN_STATEMENT = """
+SELECT CAST((address.latitude + 90) * :cells / 360 AS INTEGER) AS cell_y,
+CAST((address.longitude + 180) * :cells / 360 AS INTEGER) AS cell_x, charge_point.status_id, count(*),
+sum(address.latitude), sum(address.longitude)
+FROM charge_point JOIN address ON address.id = charge_point.address_id
+WHERE charge_point.organization_id = :organization_id
+AND address.latitude BETWEEN :min_latitude AND :max_latitude
+AND address.longitude BETWEEN :min_longitude AND :max_longitude
+GROUP BY 1, 2, 3
+"""
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _insert_duration(connection: sqlite3.Connection, address_ids, prefix: str, count: int) -> float:
+    start = time.perf_counter()
+    populate_charge_points(connection, count, prefix, address_ids)
+    return (time.perf_counter() - start) * 1000
+
+
+@click.command()
+@click.option('--size', default=100000, help='Number of charge points of the organization')
+@click.option('--inserts', default=10000, help='Number of charge points inserted to measure trigger costs')
+def run(size: int, inserts: int):
+    """measures cluster lookups and their maintenance cost"""
+    connection = create_database()
+    address_ids = populate_addresses(connection, size)
+    populate_charge_points(connection, size, address_ids=address_ids)
+    connection.close()
+    application = create_application()
+    application.response_cache = ResponseCache(0)
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"{size} charge points at distinct addresses")
+
+    connection = sqlite3.connect(DATABASE_FILEPATH)
+    for label, zoom, min_latitude, min_longitude, max_latitude, max_longitude in _VIEWS:
+        url = f"/api/administrator/get-charge-point-clusters?zoom={zoom}&min_lat={min_latitude}" \
+              f"&min_lon={min_longitude}&max_lat={max_latitude}&max_lon={max_longitude}"
+        clusters = len(json.loads(client.get(url, headers=headers).data)['data'])
+        clustered, _ = measure(lambda: client.get(url, headers=headers))
+        parameters = {'cells': 1 << zoom, 'organization_id': ORGANIZATION_ID, 'min_latitude': min_latitude,
+                      'max_latitude': max_latitude, 'min_longitude': min_longitude, 'max_longitude': max_longitude}
+        scan, _ = measure(lambda: connection.execute(_SCAN_STATEMENT, parameters).fetchall())
+        click.echo(f"  {label:<14} zoom {zoom:2d}  {clusters:5d} clusters  endpoint {clustered:8.2f} ms  "
+                   f"grouped on request {scan:8.2f} ms")
+
+    with_triggers = _insert_duration(connection, address_ids, 'CLUSTERED', inserts)
+    for trigger in ('insert', 'delete', 'update', 'address_update'):
+        connection.execute(f"DROP TRIGGER charge_point_cluster_{trigger}")
+    without_triggers = _insert_duration(connection, address_ids, 'UNCLUSTERED', inserts)
+    connection.close()
+    click.echo(f"  insert of {inserts} charge points  with cluster triggers {with_triggers:8.2f} ms  "
+               f"without {without_triggers:8.2f} ms")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,69 @@
+"""benchmark of charge point statistics
+compares the former GROUP BY over charge_point with the counters read by get-charge-point-statistics for growing
+numbers of charge points, and measures the cost of the counter triggers on charge point writes
+usage: python -m benchmarks.charge_point_statistics --sizes 10000,100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_charge_points, measure, ORGANIZATION_ID
+import time
+
+import click
+from sqlalchemy import and_
+from sqlalchemy.sql.functions import count
+
+from common.db_model import db
+from common.db_model.charge_point import ChargePoint, ChargePointStatus, ChargePointStatusCount
+
+_COUNTER_TRIGGERS = ('charge_point_status_count_insert', 'charge_point_status_count_delete',
+                     'charge_point_status_count_update')
+
+
+def _former_statistics():
+    return db.session.query(ChargePointStatus.code, ChargePointStatus.label, count(ChargePoint.id)). \
+        filter(and_(ChargePointStatus.id == ChargePoint.status_id,
+                    ChargePoint.organization_id == ORGANIZATION_ID)) \
+        .group_by(ChargePointStatus.code).all()
+
+
+def _writes(connection, size: int) -> float:
+    """inserts size charge points, changes their status then deletes them, returns the duration in seconds"""
+    start = time.perf_counter()
+    populate_charge_points(connection, size, prefix='WRITE')
+    connection.execute("UPDATE charge_point SET status_id = 3 WHERE reference LIKE 'FR*WRITE*%'")
+    connection.execute("DELETE FROM charge_point WHERE reference LIKE 'FR*WRITE*%'")
+    connection.commit()
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000', help='Comma separated numbers of charge points')
+@click.option('--writes', default=10000, help='Number of charge points inserted, updated and deleted')
+def run(sizes: str, writes: int):
+    """measures statistics reads and charge point writes with counters"""
+    for size in map(int, sizes.split(',')):
+        connection = create_database()
+        populate_charge_points(connection, size)
+        connection.close()
+        application = create_application()
+        click.echo(f"{size} charge points")
+        with application.app_context():
+            assert sorted(_former_statistics()) == \
+                sorted(ChargePointStatusCount.get_for_organization(ORGANIZATION_ID))
+            median, worst = measure(_former_statistics)
+            click.echo(f"  {'former group by':<22} median {median:8.2f} ms  max {worst:8.2f} ms")
+            median, worst = measure(lambda: ChargePointStatusCount.get_for_organization(ORGANIZATION_ID))
+            click.echo(f"  {'counters':<22} median {median:8.2f} ms  max {worst:8.2f} ms")
+            db.session.remove()
+
+    connection = create_database()
+    duration = _writes(connection, writes)
+    click.echo(f"{writes} charge points inserted, updated and deleted")
+    click.echo(f"  {'with counters':<22} {duration:8.2f} s")
+    for trigger in _COUNTER_TRIGGERS:
+        connection.execute(f"DROP TRIGGER {trigger}")
+    duration = _writes(connection, writes)
+    click.echo(f"  {'without counters':<22} {duration:8.2f} s")
+    connection.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,49 @@
+"""benchmark of conditional GET requests
+measures polled list and info endpoints answered in full and answered 304 Not Modified to a request holding the
+ETag of the previous response, on a whitelist of --size users and charge points
+usage: python -m benchmarks.conditional_get --size 10000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, rebuild_effective_access, measure
+import base64
+import json
+
+import click
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+@click.command()
+@click.option('--size', default=10000, help='Number of users and of charge points of the whitelist')
+@click.option('--calls', default=100, help='Number of requests of each measure')
+def run(size: int, calls: int):
+    """measures full and not modified responses of polled endpoints"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    charge_point_ids = populate_charge_points(connection, size)
+    whitelist_id = create_whitelist(connection, 'bench', user_ids, charge_point_ids[:10])
+    rebuild_effective_access(connection)
+    connection.close()
+    application = create_application()
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"whitelist of {size} users, {size} charge points")
+
+    for url in ('/api/administrator/list-whitelists',
+                '/api/administrator/get-charge-point-statistics',
+                f"/api/whitelist/list-users/{whitelist_id}/in?limit=100",
+                f"/api/whitelist/list-charge-points/{whitelist_id}/out?limit=100",
+                '/api/administrator/list-organization-employees?limit=100'):
+        etag = client.get(url, headers=headers).headers['ETag']
+        full, _ = measure(lambda: [client.get(url, headers=headers) for _ in range(calls)])
+        not_modified, _ = measure(lambda: [client.get(url, headers={**headers, 'If-None-Match': etag})
+                                           for _ in range(calls)])
+        click.echo(f"  {url.split('?')[0]:<48} 200 {full / calls:7.2f} ms  304 {not_modified / calls:7.2f} ms")
+
+
+if __name__ == '__main__':
+    run()
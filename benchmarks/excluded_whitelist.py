@@ -0,0 +1,80 @@
+"""benchmark of /list-users/<_id>/out and /list-charge-points/<_id>/out repository calls
+compares the correlated NOT EXISTS anti-join against the former materialized NOT IN id list
+usage: python -m benchmarks.excluded_whitelist --sizes 10000,100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, measure, ORGANIZATION_ID
+import click
+from sqlalchemy import not_
+from sqlalchemy.exc import OperationalError
+
+from common.db_model import db
+from common.db_model.user import User
+from common.db_model.charge_point import ChargePoint
+from common.db_model.whitelist import WhitelistUser, WhitelistChargePoint
+
+
+def _legacy_users_not_in_whitelist(whitelist_id: int):
+    """former implementation : whitelist member ids are fetched then sent back as a NOT IN bind list"""
+    user_ids = list(map(lambda x: x[0], db.session.query(WhitelistUser.user_id).
+                        filter(WhitelistUser.whitelist_id == whitelist_id).all()))
+    query = db.session.query(User).filter(User.organization_id == ORGANIZATION_ID, not_(User.id.in_(user_ids)))
+    return query.count(), query.order_by(User.email.asc()).limit(10).all()
+
+
+def _legacy_charge_points_not_in_whitelist(whitelist_id: int):
+    """former implementation : whitelist member ids are fetched then sent back as a NOT IN bind list"""
+    cp_ids = list(map(lambda x: x[0], db.session.query(WhitelistChargePoint.charge_point_id).
+                      filter(WhitelistChargePoint.whitelist_id == whitelist_id).all()))
+    query = db.session.query(ChargePoint).filter(ChargePoint.organization_id == ORGANIZATION_ID,
+                                                 not_(ChargePoint.id.in_(cp_ids)))
+    return query.count(), query.order_by(ChargePoint.reference.asc()).limit(10).all()
+
+
+def _users_not_in_whitelist(whitelist_id: int):
+    _filter = {'organization_id': ORGANIZATION_ID, 'excluded_whitelist_id': whitelist_id}
+    return WhitelistUser.get_total_for_list_not_in_whitelist(_filter), \
+        WhitelistUser.get_all_for_list_not_in_whitelist(limit=10, _filter=_filter)
+
+
+def _charge_points_not_in_whitelist(whitelist_id: int):
+    _filter = {'organization_id': ORGANIZATION_ID, 'excluded_whitelist_id': whitelist_id}
+    return WhitelistChargePoint.get_total_for_list_not_in_whitelist(_filter), \
+        WhitelistChargePoint.get_all_for_list_not_in_whitelist(limit=10, _filter=_filter)
+
+
+def _report(label: str, function, repeat: int):
+    try:
+        median, maximum = measure(function, repeat)
+        click.echo(f"  {label:<28} median {median:9.1f} ms   max {maximum:9.1f} ms")
+    except OperationalError as err:
+        click.echo(f"  {label:<28} failed: {err.orig}")
+    db.session.rollback()
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000', help='Comma separated numbers of whitelist members')
+@click.option('--repeat', default=5, help='Number of runs per measure')
+def run(sizes: str, repeat: int):
+    """measures out of whitelist listings for whitelists of growing size"""
+    application = create_application()
+    for size in map(int, sizes.split(',')):
+        connection = create_database()
+        # a tenth of the organization stays outside the whitelist
+        user_ids = populate_users(connection, size + size // 10)
+        cp_ids = populate_charge_points(connection, size + size // 10)
+        whitelist_id = create_whitelist(connection, f"bench {size}", user_ids[:size], cp_ids[:size])
+        connection.close()
+
+        click.echo(f"whitelist with {size} users and {size} charge points")
+        with application.app_context():
+            _report('users NOT IN list', lambda: _legacy_users_not_in_whitelist(whitelist_id), repeat)
+            _report('users NOT EXISTS', lambda: _users_not_in_whitelist(whitelist_id), repeat)
+            _report('charge points NOT IN list', lambda: _legacy_charge_points_not_in_whitelist(whitelist_id), repeat)
+            _report('charge points NOT EXISTS', lambda: _charge_points_not_in_whitelist(whitelist_id), repeat)
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,75 @@
+"""benchmark of streaming exports
+compares fetching all employees of an organization with export-organization-employees (one request, one statement)
+against paging list-organization-employees with cursors, for growing organization sizes.
+Peak python memory of the export is measured with tracemalloc while the response body is consumed
+usage: python -m benchmarks.export_stream --sizes 10000,100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users
+import base64
+import json
+import time
+import tracemalloc
+
+import click
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _export(client, headers: dict, export_format: str) -> int:
+    """consumes the export response chunk by chunk and returns the number of lines"""
+    response = client.get(f"/api/administrator/export-organization-employees?format={export_format}",
+                          headers=headers, buffered=False)
+    lines = sum(chunk.count(b'\n') for chunk in response.iter_encoded())
+    response.close()
+    return lines
+
+
+def _page(client, headers: dict, limit: int):
+    """fetches all pages of the list and returns (number of rows, number of requests)"""
+    rows, requests, cursor = 0, 0, None
+    while True:
+        url = f"/api/administrator/list-organization-employees?limit={limit}&with_total=false"
+        if cursor:
+            url += f"&cursor={cursor}"
+        data = json.loads(client.get(url, headers=headers).data)
+        rows, requests, cursor = rows + len(data['rows']), requests + 1, data['next_cursor']
+        if not cursor:
+            return rows, requests
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000', help='Comma separated numbers of employees')
+@click.option('--limit', default=100, help='Page size of the paginated list')
+def run(sizes: str, limit: int):
+    """measures full export duration and memory against paging for each organization size"""
+    for size in map(int, sizes.split(',')):
+        connection = create_database()
+        populate_users(connection, size)
+        connection.close()
+        application = create_application()
+        client = application.test_client()
+        headers = _login(client)
+
+        click.echo(f"{size} employees")
+        for export_format in ('ndjson', 'csv'):
+            start = time.perf_counter()
+            lines = _export(client, headers, export_format)
+            duration = time.perf_counter() - start
+            tracemalloc.start()
+            _export(client, headers, export_format)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            click.echo(f"  export {export_format:<7} {lines:7d} lines  {duration:7.2f} s  "
+                       f"peak memory {peak / 1024 / 1024:6.1f} MiB")
+        start = time.perf_counter()
+        rows, requests = _page(client, headers, limit)
+        click.echo(f"  paging by {limit:<4} {rows:7d} rows   {time.perf_counter() - start:7.2f} s  "
+                   f"{requests} requests")
+
+
+if __name__ == '__main__':
+    run()
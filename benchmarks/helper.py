@@ -0,0 +1,115 @@
+"""shared helpers of benchmark scripts
+importing this module points LOG_FILEPATH and DATA_FILEPATH to a throw-away directory, so it must be imported
+before any api or common module. Databases are created from sql/db_creation.sql then populated with
+generated users, charge points and whitelist members"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Callable, List, Optional, Tuple
+
+BENCHMARK_DIRECTORY = tempfile.mkdtemp(prefix='portail-entreprise-benchmark-')
+os.environ['LOG_FILEPATH'] = os.path.join(BENCHMARK_DIRECTORY, 'logs')
+os.environ['DATA_FILEPATH'] = os.path.join(BENCHMARK_DIRECTORY, 'files')
+os.makedirs(os.environ['LOG_FILEPATH'])
+os.makedirs(os.environ['DATA_FILEPATH'])
+
+DATABASE_FILEPATH = os.path.join(os.environ['DATA_FILEPATH'], 'db.sqlite')
+_SQL_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql')
+
+# ids of the default organization and employee role of db_creation.sql
+ORGANIZATION_ID = 1
+EMPLOYEE_ROLE_ID = 2
+
+
+def create_database() -> sqlite3.Connection:
+    """(re)creates the benchmark database with default data and returns a connection to it"""
+    # write-ahead log files of a former database must not be applied to the new one
+    for filepath in (DATABASE_FILEPATH, f"{DATABASE_FILEPATH}-wal", f"{DATABASE_FILEPATH}-shm"):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    connection = sqlite3.connect(DATABASE_FILEPATH)
+    with open(os.path.join(_SQL_DIRECTORY, 'db_creation.sql'), encoding='utf-8') as sql_file:
+        connection.executescript(sql_file.read())
+    connection.commit()
+    return connection
+
+
+def create_application():
+    """returns the api flask application working on the benchmark database"""
+    from api.application import create_app
+    return create_app()
+
+
+def populate_users(connection: sqlite3.Connection, count: int, prefix: str = 'bench') -> List[int]:
+    """inserts count employees in the default organization and returns their ids"""
+    connection.executemany(
+        "INSERT INTO user(email, password, firstname, lastname, phone, organization_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"{prefix}.{i}@dummy.qovoltis.com", 'password', f"First{i}", f"Last{i}", '+33612345678', ORGANIZATION_ID)
+         for i in range(count)))
+    ids = [row[0] for row in connection.execute("SELECT id FROM user WHERE email LIKE ? ORDER BY id",
+                                                (f"{prefix}.%",))]
+    connection.executemany("INSERT INTO user_role(user_id, role_id) VALUES (?, ?)",
+                           ((_id, EMPLOYEE_ROLE_ID) for _id in ids))
+    connection.commit()
+    return ids
+
+
+def populate_addresses(connection: sqlite3.Connection, count: int, seed: int = 0) -> List[int]:
+    """inserts count addresses randomly located in metropolitan France and returns their ids"""
+    generator = random.Random(seed)
+    first_id = connection.execute("SELECT coalesce(max(id), 0) + 1 FROM address").fetchone()[0]
+    connection.executemany(
+        "INSERT INTO address(id, label, zip_code_id, latitude, longitude) VALUES (?, ?, 1, ?, ?)",
+        ((first_id + i, f"{i} rue du benchmark", round(generator.uniform(42.5, 51.0), 7),
+          round(generator.uniform(-4.5, 8.0), 7)) for i in range(count)))
+    connection.commit()
+    return list(range(first_id, first_id + count))
+
+
+def populate_charge_points(connection: sqlite3.Connection, count: int, prefix: str = 'BENCH',
+                           address_ids: Optional[List[int]] = None) -> List[int]:
+    """inserts count charge points in the default organization and returns their ids, charge points are spread over
+    address_ids or over the default addresses"""
+    address_ids = address_ids or range(1, 7)
+    connection.executemany(
+        "INSERT INTO charge_point(reference, address_id, organization_id, status_id) VALUES (?, ?, ?, ?)",
+        ((f"FR*{prefix}*{i:06d}", address_ids[i % len(address_ids)], ORGANIZATION_ID, 1 + i % 3)
+         for i in range(count)))
+    ids = [row[0] for row in connection.execute("SELECT id FROM charge_point WHERE reference LIKE ? ORDER BY id",
+                                                (f"FR*{prefix}*%",))]
+    connection.commit()
+    return ids
+
+
+def create_whitelist(connection: sqlite3.Connection, label: str,
+                     user_ids: List[int] = (), charge_point_ids: List[int] = ()) -> int:
+    """creates a whitelist of the default organization with given members and returns its id"""
+    cursor = connection.execute("INSERT INTO whitelist(label, organization_id, paid_by_organization, created_at) "
+                                "VALUES (?, ?, 1, '2021-11-22')", (label, ORGANIZATION_ID))
+    whitelist_id = cursor.lastrowid
+    connection.executemany("INSERT INTO whitelist_user(whitelist_id, user_id, created_at) VALUES (?, ?, '2021-11-22')",
+                           ((whitelist_id, _id) for _id in user_ids))
+    connection.executemany("INSERT INTO whitelist_charge_point(whitelist_id, charge_point_id, created_at) "
+                           "VALUES (?, ?, '2021-11-22')", ((whitelist_id, _id) for _id in charge_point_ids))
+    connection.commit()
+    return whitelist_id
+
+
+def rebuild_effective_access(connection: sqlite3.Connection):
+    """recomputes the whole effective_access table from whitelist links"""
+    with open(os.path.join(_SQL_DIRECTORY, 'upgrade', '0001_effective_access.sql'), encoding='utf-8') as sql_file:
+        connection.executescript(sql_file.read())
+    connection.commit()
+
+
+def measure(function: Callable, repeat: int = 5) -> Tuple[float, float]:
+    """runs function repeat times and returns (median, max) duration in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), max(durations)
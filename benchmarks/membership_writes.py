@@ -0,0 +1,64 @@
+"""benchmark of bulk whitelist membership writes
+adds, updates then removes --size users of a whitelist with update-users, then adds and removes --size charge points
+with update-charge-points, each in a single api call. The whitelist has a few members of the other kind so that
+effective access rows are refreshed too
+usage: python -m benchmarks.membership_writes --size 50000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist
+import base64
+import collections
+import json
+import time
+
+import click
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _post(client, headers: dict, url: str, body: dict, label: str):
+    start = time.perf_counter()
+    response = client.post(url, headers=headers, json=body)
+    duration = time.perf_counter() - start
+    results = collections.Counter(json.loads(response.data)['data'].values()) if response.status_code == 200 else {}
+    click.echo(f"  {label:<28} {response.status_code}  {duration:6.2f} s  {dict(results)}")
+
+
+@click.command()
+@click.option('--size', default=50000, help='Number of users and of charge points written in each call')
+@click.option('--others', default=5, help='Number of charge points (users) of the whitelist written with users '
+                                           '(charge points)')
+def run(size: int, others: int):
+    """measures update-users and update-charge-points calls writing size members"""
+    connection = create_database()
+    populate_users(connection, size)
+    charge_point_ids = populate_charge_points(connection, size)
+    user_whitelist_id = create_whitelist(connection, 'bench users', charge_point_ids=charge_point_ids[:others])
+    charge_point_whitelist_id = create_whitelist(connection, 'bench charge points')
+    connection.close()
+    application = create_application()
+    client = application.test_client()
+    headers = _login(client)
+
+    user_emails = [f"bench.{i}@dummy.qovoltis.com" for i in range(size)]
+    references = [f"FR*BENCH*{i:06d}" for i in range(size)]
+    click.echo(f"{size} members, whitelists have {others} members of the other kind")
+    url = f"/api/whitelist/update-users/{user_whitelist_id}"
+    _post(client, headers, f"{url}/in", {'user_emails': user_emails, 'expires_at': None}, 'add users')
+    _post(client, headers, f"{url}/in", {'user_emails': user_emails, 'expires_at': '2030-01-01'}, 'update users')
+    _post(client, headers, f"{url}/out", {'user_emails': user_emails}, 'remove users')
+
+    url = f"/api/whitelist/update-users/{charge_point_whitelist_id}/in"
+    client.post(url, headers=headers, json={'user_emails': user_emails[:others], 'expires_at': None})
+    url = f"/api/whitelist/update-charge-points/{charge_point_whitelist_id}"
+    _post(client, headers, f"{url}/in", {'references': references}, 'add charge points')
+    _post(client, headers, f"{url}/in", {'references': references}, 'add charge points again')
+    _post(client, headers, f"{url}/out", {'references': references}, 'remove charge points')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,73 @@
+"""benchmark of the nearby charge points list
+measures list-allowed-charge-points searched around a point, on --size charge points located at distinct random
+addresses of metropolitan France and all allowed to the employee, and compares its statement with the same search
+filtering the accesses of the employee without the spatial index
+usage: python -m benchmarks.nearby_charge_points --size 100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_addresses, populate_charge_points, \
+    create_whitelist, rebuild_effective_access, measure, DATABASE_FILEPATH
+import base64
+import json
+import math
+import sqlite3
+
+import click
+
+from api.helper.response_cache import ResponseCache
+
+# Paris
+_LATITUDE = 48.8566
+_LONGITUDE = 2.3522
+
+# former search : every access of the employee is joined to its address before distance filtering
+_SCAN_STATEMENT = """
+SELECT charge_point.id, ((address.latitude - :latitude) * 111.32) * ((address.latitude - :latitude) * 111.32)
++ ((address.longitude - :longitude) * :scale) * ((address.longitude - :longitude) * :scale) AS distance
+FROM effective_access
+JOIN charge_point ON charge_point.id = effective_access.charge_point_id
+JOIN address ON address.id = charge_point.address_id
+WHERE effective_access.user_id = :user_id AND distance <= :radius * :radius
+GROUP BY charge_point.id ORDER BY distance, charge_point.id LIMIT 10
+"""
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+@click.command()
+@click.option('--size', default=100000, help='Number of charge points allowed to the employee')
+@click.option('--radiuses', default='5,20,50', help='Comma separated search radiuses in km')
+def run(size: int, radiuses: str):
+    """measures nearby charge points lists with and without the spatial index"""
+    connection = create_database()
+    address_ids = populate_addresses(connection, size)
+    charge_point_ids = populate_charge_points(connection, size, address_ids=address_ids)
+    # the benchmark employee is the administrator, which is also an employee
+    create_whitelist(connection, 'bench', [1], charge_point_ids)
+    rebuild_effective_access(connection)
+    connection.close()
+    application = create_application()
+    application.response_cache = ResponseCache(0)
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"{size} charge points at distinct addresses, all allowed to the employee")
+
+    connection = sqlite3.connect(DATABASE_FILEPATH)
+    scale = 111.32 * math.cos(math.radians(_LATITUDE))
+    for radius in map(float, radiuses.split(',')):
+        url = f"/api/employee/list-allowed-charge-points?lat={_LATITUDE}&lon={_LONGITUDE}&radius={radius}"
+        total = json.loads(client.get(url, headers=headers).data)['total']
+        nearby, _ = measure(lambda: client.get(url, headers=headers))
+        parameters = {'latitude': _LATITUDE, 'longitude': _LONGITUDE, 'scale': scale, 'radius': radius,
+                      'user_id': 1}
+        scan, _ = measure(lambda: connection.execute(_SCAN_STATEMENT, parameters).fetchall())
+        click.echo(f"  radius {radius:5.1f} km  {total:6d} charge points  "
+                   f"endpoint {nearby:8.2f} ms  former statement without spatial index {scan:8.2f} ms")
+    connection.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,67 @@
+"""benchmark of list pages with their total
+compares a separate count statement followed by the page statement against the single page statement
+carrying the total in a COUNT(*) OVER () column, and against a page without total
+usage: python -m benchmarks.page_total --sizes 10000,100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, measure, ORGANIZATION_ID
+import click
+
+from common.db_model import db
+from common.db_model.user import User, Role
+from common.db_model.whitelist import WhitelistUser, WhitelistChargePoint
+
+
+def _lists(whitelist_id: int):
+    """returns (label, count function, page function, combined function, filter) of each measured list"""
+    return [
+        ('employees', User.get_total_for_list, User.get_all_for_list, User.get_page_for_list,
+         {'organization_id': ORGANIZATION_ID, 'role': Role.EMPLOYEE}),
+        ('whitelist users', WhitelistUser.get_total_for_list_for_whitelist,
+         WhitelistUser.get_all_for_list_for_whitelist, WhitelistUser.get_page_for_list_for_whitelist,
+         {'whitelist_id': whitelist_id}),
+        ('users out of whitelist', WhitelistUser.get_total_for_list_not_in_whitelist,
+         WhitelistUser.get_all_for_list_not_in_whitelist, WhitelistUser.get_page_for_list_not_in_whitelist,
+         {'organization_id': ORGANIZATION_ID, 'excluded_whitelist_id': whitelist_id}),
+        ('whitelist charge points', WhitelistChargePoint.get_total_for_list_for_whitelist,
+         WhitelistChargePoint.get_all_for_list_for_whitelist,
+         WhitelistChargePoint.get_page_for_list_for_whitelist, {'whitelist_id': whitelist_id}),
+    ]
+
+
+def _report(label: str, function, repeat: int):
+    median, maximum = measure(function, repeat)
+    click.echo(f"  {label:<48} median {median:9.1f} ms   max {maximum:9.1f} ms")
+    db.session.rollback()
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000', help='Comma separated numbers of users and charge points')
+@click.option('--repeat', default=5, help='Number of runs per measure')
+def run(sizes: str, repeat: int):
+    """measures list pages with total on organizations of growing size"""
+    application = create_application()
+    for size in map(int, sizes.split(',')):
+        connection = create_database()
+        user_ids = populate_users(connection, size)
+        cp_ids = populate_charge_points(connection, size)
+        whitelist_id = create_whitelist(connection, f"bench {size}", user_ids[:size // 2], cp_ids[:size // 2])
+        connection.close()
+
+        click.echo(f"organization with {size} users and {size} charge points")
+        with application.app_context():
+            for label, get_total, get_page, get_page_and_total, _filter in _lists(whitelist_id):
+                rows, next_cursor = get_page(limit=10, _filter=_filter)
+                if get_page_and_total(limit=10, _filter=_filter) != (rows, get_total(_filter), next_cursor):
+                    raise click.ClickException(f"{label} : single statement and count + page results differ")
+                _report(f"{label} count + page", lambda: (get_total(_filter), get_page(limit=10, _filter=_filter)),
+                        repeat)
+                _report(f"{label} page with total", lambda: get_page_and_total(limit=10, _filter=_filter), repeat)
+                _report(f"{label} page without total",
+                        lambda: get_page_and_total(limit=10, _filter=_filter, with_total=False), repeat)
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    run()
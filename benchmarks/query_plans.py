@@ -0,0 +1,131 @@
+"""EXPLAIN QUERY PLAN report of the repository methods
+every statement emitted by a repository method is captured and explained on a populated database,
+full scans of tables growing with organizations size are flagged
+usage: python -m benchmarks.query_plans > doc/query_plans.txt"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, rebuild_effective_access, ORGANIZATION_ID
+import re
+from datetime import date
+from typing import List, Tuple
+
+import click
+from sqlalchemy import event
+
+from common.db_model import db
+from common.db_model.user import User, Role
+from common.db_model.charge_point import ChargePoint, ChargePointStatusCount, ChargePointStatusSnapshot, \
+    ChargePointCluster
+from common.db_model.whitelist import Whitelist, WhitelistUser, WhitelistChargePoint
+from common.db_model.effective_access import EffectiveAccess
+
+# tables whose size grows with organizations, scanning them is flagged
+_LARGE_TABLES = ['user', 'user_role', 'charge_point', 'whitelist', 'whitelist_user', 'whitelist_charge_point',
+                 'effective_access']
+# SCAN of a large table or of one of its aliases (user_role_1)
+_FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(_LARGE_TABLES)})(_\d+)?( |$)")
+
+
+def _repository_calls(user_id: int, whitelist_id: int, charge_point_ids: List[int]):
+    """returns (label, function) of each explained repository call"""
+    employees = {'organization_id': ORGANIZATION_ID, 'role': Role.EMPLOYEE}
+    whitelists = {'organization_id': ORGANIZATION_ID}
+    in_whitelist = {'whitelist_id': whitelist_id}
+    out_whitelist = {'organization_id': ORGANIZATION_ID, 'excluded_whitelist_id': whitelist_id}
+    allowed = {'user_id': user_id, 'unexpired_at': '2021-12-01'}
+    return [
+        ('User.get_by_email', lambda: User.get_by_email('bench.1@dummy.qovoltis.com')),
+        ('User.get_total_for_list', lambda: User.get_total_for_list(employees)),
+        ('User.get_all_for_list sort=email', lambda: User.get_all_for_list(_filter=employees)),
+        ('User.get_all_for_list sort=lastname', lambda: User.get_all_for_list(sort='lastname', _filter=employees)),
+        ('User.get_all_for_list search lastname', lambda: User.get_all_for_list(_filter={**employees,
+                                                                                         'lastname': 'ast12'})),
+        ('Whitelist.get_total_for_list', lambda: Whitelist.get_total_for_list(whitelists)),
+        ('Whitelist.get_all_for_list sort=created_at', lambda: Whitelist.get_all_for_list(_filter=whitelists)),
+        ('Whitelist.get_all_for_list sort=label', lambda: Whitelist.get_all_for_list(sort='label',
+                                                                                    _filter=whitelists)),
+        ('Whitelist.get_all_for_list sort=expires_at', lambda: Whitelist.get_all_for_list(sort='expires_at',
+                                                                                         _filter=whitelists)),
+        ('WhitelistUser.get_total_for_list_for_whitelist',
+         lambda: WhitelistUser.get_total_for_list_for_whitelist(in_whitelist)),
+        ('WhitelistUser.get_all_for_list_for_whitelist',
+         lambda: WhitelistUser.get_all_for_list_for_whitelist(_filter=in_whitelist)),
+        ('WhitelistUser.get_total_for_list_not_in_whitelist',
+         lambda: WhitelistUser.get_total_for_list_not_in_whitelist(out_whitelist)),
+        ('WhitelistUser.get_all_for_list_not_in_whitelist',
+         lambda: WhitelistUser.get_all_for_list_not_in_whitelist(_filter=out_whitelist)),
+        ('WhitelistChargePoint.get_total_for_list_for_whitelist',
+         lambda: WhitelistChargePoint.get_total_for_list_for_whitelist(in_whitelist)),
+        ('WhitelistChargePoint.get_all_for_list_for_whitelist',
+         lambda: WhitelistChargePoint.get_all_for_list_for_whitelist(_filter=in_whitelist)),
+        ('WhitelistChargePoint.get_total_for_list_not_in_whitelist',
+         lambda: WhitelistChargePoint.get_total_for_list_not_in_whitelist(out_whitelist)),
+        ('WhitelistChargePoint.get_all_for_list_not_in_whitelist',
+         lambda: WhitelistChargePoint.get_all_for_list_not_in_whitelist(_filter=out_whitelist)),
+        ('EffectiveAccess.get_total_for_list', lambda: EffectiveAccess.get_total_for_list(allowed)),
+        ('EffectiveAccess.get_all_for_list', lambda: EffectiveAccess.get_all_for_list(_filter=allowed)),
+        ('EffectiveAccess.get_page_for_list near',
+         lambda: EffectiveAccess.get_page_for_list(sort='distance', _filter={**allowed,
+                                                                             'near': (48.8182737, 2.3292709, 5)})),
+        ('EffectiveAccess.refresh users', lambda: EffectiveAccess.refresh(whitelist_id, user_ids=[user_id])),
+        ('EffectiveAccess.refresh charge points',
+         lambda: EffectiveAccess.refresh(whitelist_id, charge_point_ids=charge_point_ids[:10])),
+        ('ChargePoint.get_all_for_list', lambda: ChargePoint.get_all_for_list(_filter=whitelists)),
+        ('ChargePoint.get_all_for_list search reference',
+         lambda: ChargePoint.get_all_for_list(_filter={**whitelists, 'reference': 'ch*0001'})),
+        ('ChargePointStatusCount.get_for_organization',
+         lambda: ChargePointStatusCount.get_for_organization(ORGANIZATION_ID)),
+        ('ChargePointCluster.get_for_bounding_box',
+         lambda: ChargePointCluster.get_for_bounding_box(ORGANIZATION_ID, 9, 48.1, 1.4, 49.3, 3.6)),
+        ('ChargePointStatusSnapshot.get_history',
+         lambda: ChargePointStatusSnapshot.get_history(ORGANIZATION_ID, date(2021, 11, 1), date(2021, 11, 30))),
+    ]
+
+
+def _explain(statement: str, parameters) -> List[str]:
+    connection = db.session.connection().connection
+    return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+@click.command()
+@click.option('--size', default=5000, help='Number of generated users and charge points')
+def run(size: int):
+    """prints query plans of each repository method and flags full scans of large tables"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    cp_ids = populate_charge_points(connection, size)
+    whitelist_id = create_whitelist(connection, 'bench', user_ids[:size // 2], cp_ids[:size // 2])
+    for i in range(20):
+        create_whitelist(connection, f"bench {i}", user_ids[i::20], cp_ids[i::20])
+    rebuild_effective_access(connection)
+    connection.close()
+
+    application = create_application()
+    statements: List[Tuple[str, object]] = []
+    full_scans = 0
+
+    with application.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        for label, function in _repository_calls(user_ids[0], whitelist_id, cp_ids):
+            statements.clear()
+            function()
+            click.echo(f"### {label}")
+            for statement, parameters in list(statements):
+                click.echo(' '.join(statement.split()))
+                for line in _explain(statement, parameters):
+                    flag = ''
+                    if _FULL_SCAN.match(line):
+                        flag = '   <== FULL SCAN'
+                        full_scans += 1
+                    click.echo(f"    {line}{flag}")
+            click.echo('')
+        db.session.rollback()
+
+    click.echo(f"{full_scans} full scan(s) of large tables")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,98 @@
+"""benchmark of the production server
+measures requests per second on the list endpoints served by `main.py serve` with a growing number of workers,
+requests are sent by client processes each using a keep-alive connection
+usage: python -m benchmarks.server_workers --workers 1,2,4 --clients 16 --duration 10"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, populate_users, populate_charge_points, create_whitelist
+import base64
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+_MAIN_FILEPATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+_ADMINISTRATOR_CREDENTIALS = 'administrator@dummy.qovoltis.com:password'
+
+
+def _login(port: int) -> str:
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    credentials = base64.b64encode(_ADMINISTRATOR_CREDENTIALS.encode()).decode()
+    connection.request('POST', '/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    token = json.loads(connection.getresponse().read())['data']['token']
+    connection.close()
+    return token
+
+
+def _wait_until_listening(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            http.client.HTTPConnection('127.0.0.1', port, timeout=1).connect()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise click.ClickException(f"server not listening on port {port}")
+            time.sleep(0.2)
+
+
+def _send_requests(arguments) -> int:
+    """sends list requests in a loop until duration is elapsed and returns the number of successful ones"""
+    port, token, paths, duration = arguments
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Authorization': f"Bearer {token}"}
+    succeeded = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        connection.request('GET', paths[succeeded % len(paths)], headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{paths[succeeded % len(paths)]} answered {response.status}")
+        succeeded += 1
+    connection.close()
+    return succeeded
+
+
+@click.command()
+@click.option('--workers', default='1,2,4', help='Comma separated numbers of worker processes')
+@click.option('--clients', default=16, help='Number of concurrent client processes')
+@click.option('--duration', default=10, help='Duration of each measure in seconds')
+@click.option('--size', default=10000, help='Number of users and charge points of the organization')
+@click.option('--port', default=8765, help='Port of the benchmarked server')
+def run(workers: str, clients: int, duration: int, size: int, port: int):
+    """measures list endpoints throughput for each number of workers"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    cp_ids = populate_charge_points(connection, size)
+    whitelist_id = create_whitelist(connection, 'bench', user_ids[:size // 2], cp_ids[:size // 2])
+    connection.close()
+    paths = ['/api/administrator/list-organization-employees?limit=10',
+             '/api/administrator/list-whitelists?limit=10',
+             f"/api/whitelist/list-users/{whitelist_id}/in?limit=10",
+             f"/api/whitelist/list-charge-points/{whitelist_id}/in?limit=10"]
+
+    click.echo(f"list endpoints of an organization with {size} users and {size} charge points, {clients} clients")
+    for worker_count in map(int, workers.split(',')):
+        server = subprocess.Popen([sys.executable, _MAIN_FILEPATH, '--port', str(port), 'serve',
+                                   '--workers', str(worker_count)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_listening(port)
+            token = _login(port)
+            with multiprocessing.Pool(clients) as pool:
+                start = time.perf_counter()
+                succeeded = sum(pool.map(_send_requests, [(port, token, paths, duration)] * clients))
+                elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+        click.echo(f"  {worker_count:3d} worker(s) : {succeeded / elapsed:10.0f} requests/s")
+
+
+if __name__ == '__main__':
+    run()
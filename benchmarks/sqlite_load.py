@@ -0,0 +1,113 @@
+"""mixed read/write load test of the sqlite engine configuration
+reader threads list whitelist members while writer threads add and remove members of another whitelist,
+read and write latencies are compared between the former engine (no pool, rollback journal, default pragmas)
+and the engine configured by ApiConfig (connection pool and SQLITE_PRAGMAS profile)
+usage: python -m benchmarks.sqlite_load --readers 8 --writers 2 --duration 10"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import DATABASE_FILEPATH, create_database, populate_users, create_whitelist
+import statistics
+import threading
+import time
+from typing import List
+
+import click
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from api.config import ApiConfig
+from common.db_model.sqlite_profile import init_sqlite_profile
+
+_READ_STATEMENTS = [
+    text("SELECT count(*) FROM whitelist_user WHERE whitelist_id = :whitelist_id"),
+    text("SELECT user.id, user.email, user.firstname, user.lastname FROM whitelist_user "
+         "JOIN user ON user.id = whitelist_user.user_id WHERE whitelist_user.whitelist_id = :whitelist_id "
+         "ORDER BY user.lastname LIMIT 10"),
+]
+_INSERT_STATEMENT = text("INSERT INTO whitelist_user(whitelist_id, user_id, created_at) "
+                         "VALUES (:whitelist_id, :user_id, '2021-11-22')")
+_DELETE_STATEMENT = text("DELETE FROM whitelist_user WHERE whitelist_id = :whitelist_id")
+
+
+def _create_former_engine() -> Engine:
+    engine = create_engine(f"sqlite:///{DATABASE_FILEPATH}", poolclass=NullPool)
+
+    @event.listens_for(engine, 'connect')
+    def set_journal_mode(dbapi_connection, connection_record):
+        # the journal mode is stored in the database file, it is set back to the sqlite default
+        dbapi_connection.execute("PRAGMA journal_mode = DELETE")
+
+    return engine
+
+
+def _create_configured_engine() -> Engine:
+    engine = create_engine(f"sqlite:///{DATABASE_FILEPATH}", **ApiConfig.SQLALCHEMY_ENGINE_OPTIONS)
+    init_sqlite_profile(engine, ApiConfig.SQLITE_PRAGMAS)
+    return engine
+
+
+def _read(engine: Engine, whitelist_id: int, deadline: float, latencies: List[float]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        with engine.connect() as connection:
+            for statement in _READ_STATEMENTS:
+                connection.execute(statement, {'whitelist_id': whitelist_id}).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def _write(engine: Engine, whitelist_id: int, user_ids: List[int], deadline: float, latencies: List[float]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(_INSERT_STATEMENT, [{'whitelist_id': whitelist_id, 'user_id': _id} for _id in user_ids])
+        with engine.begin() as connection:
+            connection.execute(_DELETE_STATEMENT, {'whitelist_id': whitelist_id})
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def _percentiles(latencies: List[float]) -> str:
+    if len(latencies) < 2:
+        return f"{len(latencies)} operations"
+    centiles = statistics.quantiles(latencies, n=100)
+    return f"{len(latencies):7d} ops   p50 {centiles[49]:8.1f} ms   p95 {centiles[94]:8.1f} ms   " \
+           f"p99 {centiles[98]:8.1f} ms   max {max(latencies):8.1f} ms"
+
+
+@click.command()
+@click.option('--readers', default=8, help='Number of reader threads')
+@click.option('--writers', default=2, help='Number of writer threads')
+@click.option('--duration', default=10, help='Duration of each measure in seconds')
+@click.option('--size', default=10000, help='Number of users of the organization')
+@click.option('--batch', default=500, help='Number of members added then removed by each write')
+def run(readers: int, writers: int, duration: int, size: int, batch: int):
+    """measures read and write latencies under a mixed load for both engine configurations"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    read_whitelist_id = create_whitelist(connection, 'bench read', user_ids[:size // 2])
+    write_whitelist_ids = [create_whitelist(connection, f"bench write {i}") for i in range(writers)]
+    connection.close()
+
+    click.echo(f"{readers} readers of a {size // 2} members whitelist, "
+               f"{writers} writers of {batch} members, {duration} s")
+    for label, create_engine_function in (('former engine', _create_former_engine),
+                                          ('configured engine', _create_configured_engine)):
+        engine = create_engine_function()
+        read_latencies, write_latencies = [], []
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=_read, args=(engine, read_whitelist_id, deadline, read_latencies))
+                   for _ in range(readers)]
+        threads += [threading.Thread(target=_write, args=(engine, whitelist_id, user_ids[:batch], deadline,
+                                                          write_latencies))
+                    for whitelist_id in write_whitelist_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        click.echo(f"  {label}")
+        click.echo(f"    reads  {_percentiles(read_latencies)}")
+        click.echo(f"    writes {_percentiles(write_latencies)}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,84 @@
+"""benchmark of substring filters of list endpoints
+compares the trigram full text search index lookup against the former ilike '%value%' filter
+usage: python -m benchmarks.text_search --sizes 10000,100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    measure, ORGANIZATION_ID
+import click
+
+from common.db_model import db
+from common.db_model.user import User, Role
+from common.db_model.charge_point import ChargePoint
+from common.db_model.address import Address, ZipCode
+from common.db_model.list_query import contains_filter
+
+# searched values : a selective one and a frequent one
+_USER_SEARCHES = [('lastname', 'ast1234'), ('email', 'bench.9')]
+_CHARGE_POINT_SEARCHES = [('reference', 'ch*001234'), ('reference', 'ch*00')]
+
+
+def _legacy_users(field: str, value: str):
+    """former implementation : ilike on the user column"""
+    query = User.query.join(User.roles).filter(User.organization_id == ORGANIZATION_ID, Role.name == Role.EMPLOYEE,
+                                               contains_filter(getattr(User, field))(value))
+    return query.count(), query.order_by(User.email.asc(), User.id.asc()).limit(10).all()
+
+
+def _users(field: str, value: str):
+    _filter = {'organization_id': ORGANIZATION_ID, 'role': Role.EMPLOYEE, field: value}
+    return User.get_total_for_list(_filter), User.get_all_for_list(limit=10, _filter=_filter)[0]
+
+
+def _legacy_charge_points(field: str, value: str):
+    """former implementation : ilike on the charge point column"""
+    query = ChargePoint.query.join(ChargePoint.status).join(ChargePoint.address).join(Address.zip_code).\
+        join(ZipCode.city).filter(ChargePoint.organization_id == ORGANIZATION_ID,
+                                  contains_filter(getattr(ChargePoint, field))(value))
+    return query.count(), query.order_by(ChargePoint.reference.asc(), ChargePoint.id.asc()).limit(10).all()
+
+
+def _charge_points(field: str, value: str):
+    _filter = {'organization_id': ORGANIZATION_ID, field: value}
+    return ChargePoint.get_total_for_list(_filter), ChargePoint.get_all_for_list(limit=10, _filter=_filter)[0]
+
+
+def _compare(label: str, legacy_function, function, repeat: int):
+    """checks both implementations return the same rows then measures them"""
+    if legacy_function() != function():
+        raise click.ClickException(f"{label} : search and ilike results differ")
+    _report(f"{label} ilike", legacy_function, repeat)
+    _report(f"{label} search", function, repeat)
+
+
+def _report(label: str, function, repeat: int):
+    median, maximum = measure(function, repeat)
+    click.echo(f"  {label:<40} median {median:9.1f} ms   max {maximum:9.1f} ms")
+    db.session.rollback()
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000', help='Comma separated numbers of users and charge points')
+@click.option('--repeat', default=5, help='Number of runs per measure')
+def run(sizes: str, repeat: int):
+    """measures substring searches on organizations of growing size"""
+    application = create_application()
+    for size in map(int, sizes.split(',')):
+        connection = create_database()
+        populate_users(connection, size)
+        populate_charge_points(connection, size)
+        connection.close()
+
+        click.echo(f"organization with {size} users and {size} charge points")
+        with application.app_context():
+            for field, value in _USER_SEARCHES:
+                _compare(f"users {field} '{value}'", lambda: _legacy_users(field, value),
+                         lambda: _users(field, value), repeat)
+            for field, value in _CHARGE_POINT_SEARCHES:
+                _compare(f"charge points {field} '{value}'", lambda: _legacy_charge_points(field, value),
+                         lambda: _charge_points(field, value), repeat)
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,50 @@
+"""micro-benchmark of bearer token authentication overhead per request
+compares token decoding and the whole token verification of a request (decoding, revocation check, principal cache,
+transient user) with and without the cache of verified tokens
+usage: python -m benchmarks.token_auth --calls 20000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, measure
+import click
+from flask import g
+
+from api.auth import token_auth
+from api.auth.revocation_store import TokenRevocationStore
+from api.auth.token_manager import TokenManager
+from api.config import ApiConfig
+from common.db_model.user import User
+
+
+@click.command()
+@click.option('--calls', default=20000, help='Number of calls of each measure')
+def run(calls: int):
+    """measures authentication cost per request with and without verified tokens cache"""
+    create_database().close()
+    application = create_application()
+    revocation_store = TokenRevocationStore(ApiConfig.REVOKED_TOKENS_FILEPATH)
+    with application.app_context():
+        m_user = User.get_by_email('administrator@dummy.qovoltis.com')
+        user_id, user_email = m_user.id, m_user.email
+
+    for label, cache_size in (('without verified tokens cache', 0),
+                              ('with verified tokens cache', ApiConfig.VERIFIED_TOKEN_CACHE_SIZE)):
+        token_manager = TokenManager(ApiConfig.USER_TOKEN_VALIDITY_SPAN, revocation_store, cache_size)
+        application.token_manager = token_manager
+        token = token_manager.generate_token(user_id, user_email)
+        median, _ = measure(lambda: [token_manager.decode_token(token) for _ in range(calls)])
+        click.echo(f"  {label:<32} decode_token  {median * 1000 / calls:8.1f} us/call")
+
+        with application.test_request_context(headers={'Authorization': f"Bearer {token}"}):
+            def verify():
+                for _ in range(calls):
+                    g.current_user = None
+                    token_auth.verify_token_callback(token)
+            median, _ = measure(verify)
+        click.echo(f"  {label:<32} verify_token  {median * 1000 / calls:8.1f} us/call")
+
+    # login returns the buffered token after checking its stored expiry, it used to decode it
+    median, _ = measure(lambda: [token_manager.generate_token(user_id, user_email) for _ in range(calls)])
+    click.echo(f"  {'login with a buffered token':<32} generate_token {median * 1000 / calls:7.1f} us/call")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,86 @@
+"""benchmark of the token revocation store
+measures the decode cost of a valid and of a revoked token with an empty store then with --revoked revoked tokens,
+the delay before a token revoked by another process is refused, and the pruning of expired revocations
+usage: python -m benchmarks.token_revocation --revoked 100000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import measure
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+import jwt
+
+from api.auth.revocation_store import TokenRevocationStore
+from api.auth.token_manager import TokenManager
+
+_STORE_FILEPATH = os.path.join(os.environ['DATA_FILEPATH'], 'revoked_tokens.sqlite')
+
+
+def _create_token(user_id: int, validity_span: float) -> str:
+    now = datetime.utcnow()
+    return jwt.encode({'iat': now, 'exp': now + timedelta(seconds=validity_span), 'sub': user_id,
+                       'ref': f"bench.{user_id}@dummy.qovoltis.com"}, 'SpaceArt', 'HS256')
+
+
+def _measure_decode(token_manager: TokenManager, label: str, calls: int):
+    valid_token, revoked_token = _create_token(0, 3600), _create_token(1, 3600)
+    token_manager.invalidate_user_token(1, revoked_token)
+    for name, token in (('valid', valid_token), ('revoked', revoked_token)):
+        median, maximum = measure(lambda: [token_manager.decode_token(token) for _ in range(calls)])
+        click.echo(f"  {label:<32} decode {name:<8} {median * 1000 / calls:8.1f} us/call")
+
+
+def _revoke_in_other_process(token: str, ready, revoked_at):
+    store = TokenRevocationStore(_STORE_FILEPATH)
+    # opens the connection to the shared file before measuring
+    store.is_revoked(token)
+    token_manager = TokenManager(revocation_store=store)
+    ready.wait()
+    revoked_at.value = time.time()
+    token_manager.invalidate_user_token(2, token)
+
+
+@click.command()
+@click.option('--revoked', default=100000, help='Number of revoked tokens')
+@click.option('--calls', default=10000, help='Number of decodes of each measure')
+def run(revoked: int, calls: int):
+    """measures decode cost, cross-process visibility and pruning of revoked tokens"""
+    token_manager = TokenManager(revocation_store=TokenRevocationStore(_STORE_FILEPATH))
+    _measure_decode(token_manager, 'empty store', calls)
+
+    start = time.perf_counter()
+    for user_id in range(revoked):
+        token_manager.invalidate_user_token(user_id + 10, _create_token(user_id + 10, 3600))
+    click.echo(f"  revoked {revoked} tokens in {time.perf_counter() - start:.1f} s")
+    _measure_decode(token_manager, f"{revoked} revoked tokens", calls)
+    # a new process loads revocations from the shared file
+    start = time.perf_counter()
+    store = TokenRevocationStore(_STORE_FILEPATH)
+    store.is_revoked('')
+    click.echo(f"  loading {len(store)} revocations in a new process took {time.perf_counter() - start:.2f} s")
+
+    token = _create_token(2, 3600)
+    ready, revoked_at = multiprocessing.Event(), multiprocessing.Value('d', 0)
+    process = multiprocessing.Process(target=_revoke_in_other_process, args=(token, ready, revoked_at))
+    process.start()
+    ready.set()
+    # polls like requests would, without starving the other process of cpu
+    while token_manager.decode_token(token).get('error', None) is None:
+        time.sleep(0.001)
+    refused_at = time.time()
+    process.join()
+    click.echo(f"  token revoked by another process refused {(refused_at - revoked_at.value) * 1000:.2f} ms "
+               f"after its revocation")
+
+    store = TokenRevocationStore()
+    for user_id in range(1000):
+        store.revoke(_create_token(user_id, 0.5), time.time() + 0.5)
+    before = len(store)
+    time.sleep(0.6)
+    click.echo(f"  {before} revocations, {len(store)} left once their tokens expired")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,92 @@
+"""benchmark of per user activity logging
+compares the queued UserLogger writing through a pool of open files against the former implementation
+opening a new file handler on the shared logger for every request
+usage: python -m benchmarks.user_logging --requests 20000 --users 200"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import BENCHMARK_DIRECTORY
+import logging
+import os
+import time
+from logging.handlers import TimedRotatingFileHandler
+from typing import Optional
+
+import click
+
+from api.auth import user_logger
+from api.auth.user_logger import UserLogger
+
+
+class _LegacyUserLogger:
+    """former implementation : handlers of the shared logger are replaced by a new file handler on each call"""
+    __log_formatter = logging.Formatter('%(asctime)s %(name)s %(module)s  %(lineno)d %(levelname)s %(message)s')
+
+    def __init__(self, log_directory: str, user_email: Optional[str] = None):
+        self.__log_directory = log_directory
+        self.__file_logger = logging.getLogger("legacy-user-logger")
+        self.__file_logger.propagate = False
+        self.set_user_email(user_email)
+
+    def set_user_email(self, user_email: Optional[str], log_level: int = logging.DEBUG):
+        if user_email is None:
+            user_email = '000000-Default'
+        for handler in self.__file_logger.handlers:
+            self.__file_logger.removeHandler(handler)
+        log_handler = TimedRotatingFileHandler(f"{self.__log_directory}/{user_email}.log",
+                                               when='midnight',
+                                               backupCount=7,
+                                               utc=True)
+        log_handler.setFormatter(_LegacyUserLogger.__log_formatter)
+        self.__file_logger.addHandler(log_handler)
+        self.__file_logger.setLevel(log_level)
+
+    @property
+    def file_logger(self):
+        return self.__file_logger
+
+
+def _count_lines(directory: str) -> int:
+    total = 0
+    for filename in os.listdir(directory):
+        with open(os.path.join(directory, filename), encoding='utf-8') as log_file:
+            total += sum(1 for _ in log_file)
+    return total
+
+
+def _simulate_requests(create_logger, requests: int, users: int):
+    """each simulated request creates the logger of its user and logs its call, as token authentication does"""
+    for i in range(requests):
+        logger = create_logger(f"bench.{i % users}@dummy.qovoltis.com")
+        logger.file_logger.info(f"Call on benchmark request {i}")
+
+
+@click.command()
+@click.option('--requests', default=20000, help='Number of simulated requests')
+@click.option('--users', default=200, help='Number of distinct users')
+def run(requests: int, users: int):
+    """measures logging throughput of simulated authenticated requests"""
+    legacy_directory = os.path.join(BENCHMARK_DIRECTORY, 'legacy-user-logs')
+    os.makedirs(legacy_directory)
+
+    start = time.perf_counter()
+    _simulate_requests(lambda email: _LegacyUserLogger(legacy_directory, email), requests, users)
+    legacy_duration = time.perf_counter() - start
+    for handler in logging.getLogger("legacy-user-logger").handlers:
+        handler.close()
+
+    start = time.perf_counter()
+    _simulate_requests(UserLogger, requests, users)
+    request_duration = time.perf_counter() - start
+    # stopping the listener waits until all queued records are written
+    user_logger._PIPELINE.stop()
+    flushed_duration = time.perf_counter() - start
+
+    click.echo(f"{requests} requests of {users} users")
+    click.echo(f"  former logger : {requests / legacy_duration:10.0f} requests/s "
+               f"({_count_lines(legacy_directory)} lines written)")
+    click.echo(f"  queued logger : {requests / request_duration:10.0f} requests/s on request side, "
+               f"{requests / flushed_duration:10.0f} requests/s until written "
+               f"({_count_lines(user_logger._LOG_DIRECTORY)} lines written)")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,85 @@
+"""benchmark of whitelist deletion
+deletes a whitelist of --size users and --charge-points charge points (so size * charge-points effective access rows)
+with the former per-link commits, with the single transaction delete and with the asynchronous delete.
+While the asynchronous deletion runs, the worst latency of requests served meanwhile is measured
+usage: python -m benchmarks.whitelist_delete --size 50000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, rebuild_effective_access
+import base64
+import json
+import time
+
+import click
+
+from common.db_model import db
+from common.db_model.effective_access import EffectiveAccess
+from common.db_model.whitelist import Whitelist
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _former_delete(application, whitelist_id: int):
+    """former delete : one transaction per member. It used to fail as deleted links were kept in the collections of
+    the whitelist (the session does not expire objects on commit), the whitelist is expired here before its deletion"""
+    with application.app_context():
+        m_whitelist = Whitelist.query.filter_by(id=whitelist_id).first()
+        for m_whitelist_user in m_whitelist.user_links:
+            db.session.delete(m_whitelist_user)
+            db.session.commit()
+        for m_whitelist_charge_point in m_whitelist.charge_point_links:
+            db.session.delete(m_whitelist_charge_point)
+            db.session.commit()
+        EffectiveAccess.refresh(m_whitelist.id)
+        db.session.expire(m_whitelist)
+        db.session.delete(m_whitelist)
+        db.session.commit()
+
+
+@click.command()
+@click.option('--size', default=50000, help='Number of users of the whitelist')
+@click.option('--charge-points', default=10, help='Number of charge points of the whitelist')
+@click.option('--skip-former', is_flag=True, help='Do not measure the former per-link commits (slow)')
+def run(size: int, charge_points: int, skip_former: bool):
+    """measures deletion of a large whitelist"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    charge_point_ids = populate_charge_points(connection, charge_points)
+    whitelist_ids = [create_whitelist(connection, f"bench {i}", user_ids, charge_point_ids) for i in range(3)]
+    rebuild_effective_access(connection)
+    connection.close()
+    application = create_application()
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"whitelists of {size} users and {charge_points} charge points")
+
+    if not skip_former:
+        start = time.perf_counter()
+        _former_delete(application, whitelist_ids[0])
+        click.echo(f"  {'former per-link commits':<26} {time.perf_counter() - start:7.2f} s")
+
+    start = time.perf_counter()
+    response = client.delete(f"/api/whitelist/delete/{whitelist_ids[1]}", headers=headers)
+    click.echo(f"  {'single transaction':<26} {time.perf_counter() - start:7.2f} s  {response.status_code}")
+
+    start = time.perf_counter()
+    response = client.delete(f"/api/whitelist/delete/{whitelist_ids[2]}?async=true", headers=headers)
+    accepted = time.perf_counter() - start
+    deletion_id = json.loads(response.data)['data']['id']
+    worst, requests, status = 0., 0, 'PENDING'
+    while status == 'PENDING':
+        request_start = time.perf_counter()
+        response = client.get(f"/api/whitelist/get-deletion/{deletion_id}", headers=headers)
+        worst, requests = max(worst, time.perf_counter() - request_start), requests + 1
+        status = json.loads(response.data)['data']['status']
+        time.sleep(0.001)
+    click.echo(f"  {'asynchronous':<26} {time.perf_counter() - start:7.2f} s  {status}, accepted in "
+               f"{accepted * 1000:.1f} ms, worst latency of {requests} requests meanwhile {worst * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,56 @@
+"""benchmark of list-whitelists with large whitelists
+compares the former page query, loading every charge point link of the whitelists of the page to count them,
+with the counters of whitelist, then measures list-whitelists sorted by cp_count and user_count
+usage: python -m benchmarks.whitelist_list --whitelists 10 --size 10000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, measure, ORGANIZATION_ID
+import base64
+import json
+
+import click
+from sqlalchemy.orm import joinedload
+
+from common.db_model.whitelist import Whitelist
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _former_page(limit: int):
+    """former page of whitelists and its cp_count"""
+    m_whitelists = Whitelist.query.options(joinedload(Whitelist.charge_point_links, innerjoin=False)). \
+        filter(Whitelist.organization_id == ORGANIZATION_ID).order_by(Whitelist.created_at.desc()).limit(limit).all()
+    return [len(m_whitelist.charge_point_links) for m_whitelist in m_whitelists]
+
+
+@click.command()
+@click.option('--whitelists', default=10, help='Number of large whitelists')
+@click.option('--size', default=10000, help='Number of users and of charge points of each whitelist')
+def run(whitelists: int, size: int):
+    """measures list-whitelists duration with large whitelists"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    charge_point_ids = populate_charge_points(connection, size)
+    for i in range(whitelists):
+        create_whitelist(connection, f"bench {i}", user_ids, charge_point_ids)
+    connection.close()
+    application = create_application()
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"{whitelists} whitelists of {size} users and {size} charge points")
+
+    with application.test_request_context():
+        median, worst = measure(lambda: _former_page(whitelists))
+    click.echo(f"  {'former page query':<32} median {median:8.2f} ms  max {worst:8.2f} ms")
+    for sort in ('created_at', 'cp_count', 'user_count'):
+        url = f"/api/administrator/list-whitelists?limit={whitelists}&sort={sort}"
+        median, worst = measure(lambda: client.get(url, headers=headers))
+        click.echo(f"  {'list-whitelists sort=' + sort:<32} median {median:8.2f} ms  max {worst:8.2f} ms")
+
+
+if __name__ == '__main__':
+    run()
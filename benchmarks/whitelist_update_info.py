@@ -0,0 +1,78 @@
+"""benchmark of whitelist update-info
+measures update-info calls renaming a whitelist of --size users and --size charge points, then changing its
+expiration date and its paid_by_organization flag, and compares them with the former recomputation of all its
+effective access rows. Access rows written by both are checked to be identical
+usage: python -m benchmarks.whitelist_update_info --size 1000"""
+# helper must be imported first to point the api to the benchmark directory
+from benchmarks.helper import create_database, create_application, populate_users, populate_charge_points, \
+    create_whitelist, rebuild_effective_access, DATABASE_FILEPATH
+import base64
+import json
+import sqlite3
+import time
+
+import click
+
+from common.db_model import db
+from common.db_model.effective_access import EffectiveAccess
+
+_ACCESS_STATEMENT = "SELECT user_id, charge_point_id, created_at, expires_at, paid_by_organization " \
+                    "FROM effective_access WHERE whitelist_id = ? ORDER BY user_id, charge_point_id"
+
+
+def _login(client) -> dict:
+    credentials = base64.b64encode(b'administrator@dummy.qovoltis.com:password').decode('ascii')
+    response = client.post('/api/user/login', headers={'Authorization': f"Basic {credentials}"})
+    return {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
+
+
+def _post(client, headers: dict, url: str, body: dict, label: str):
+    start = time.perf_counter()
+    response = client.post(url, headers=headers, json=body)
+    click.echo(f"  {label:<36} {response.status_code}  {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+
+@click.command()
+@click.option('--size', default=1000, help='Number of users and of charge points of the whitelist')
+def run(size: int):
+    """measures update-info calls on a whitelist of size x size access rows"""
+    connection = create_database()
+    user_ids = populate_users(connection, size)
+    charge_point_ids = populate_charge_points(connection, size)
+    whitelist_id = create_whitelist(connection, 'bench', user_ids, charge_point_ids)
+    # half of the members expire before the whitelist so that both expiration dates are involved
+    connection.execute("UPDATE whitelist_user SET expires_at = '2030-01-01' WHERE whitelist_id = ? AND user_id % 2 = 0",
+                       (whitelist_id,))
+    connection.commit()
+    rebuild_effective_access(connection)
+    connection.close()
+    application = create_application()
+    client = application.test_client()
+    headers = _login(client)
+    click.echo(f"whitelist of {size} users, {size} charge points ({size * size} access rows)")
+
+    url = f"/api/whitelist/update-info/{whitelist_id}"
+    _post(client, headers, url, {'label': 'bench renamed', 'paid_by_organization': True, 'expires_at': None},
+          'rename')
+    _post(client, headers, url, {'label': 'bench renamed', 'paid_by_organization': True,
+                                 'expires_at': '2031-01-01'}, 'change expires_at')
+    connection = sqlite3.connect(DATABASE_FILEPATH)
+    connection.execute("UPDATE whitelist SET paid_by_organization = 0 WHERE id = ?", (whitelist_id,))
+    connection.commit()
+    _post(client, headers, url, {'label': 'bench renamed', 'paid_by_organization': True,
+                                 'expires_at': '2031-01-01'}, 'change paid_by_organization')
+    updated = connection.execute(_ACCESS_STATEMENT, (whitelist_id,)).fetchall()
+
+    with application.app_context():
+        start = time.perf_counter()
+        EffectiveAccess.refresh(whitelist_id)
+        db.session.commit()
+        click.echo(f"  {'former refresh of all access rows':<36}      "
+                   f"{(time.perf_counter() - start) * 1000:9.2f} ms")
+    refreshed = connection.execute(_ACCESS_STATEMENT, (whitelist_id,)).fetchall()
+    connection.close()
+    click.echo(f"  access rows identical to the former refresh: {updated == refreshed}")
+
+
+if __name__ == '__main__':
+    run()
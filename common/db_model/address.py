@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import math
 from decimal import Decimal
 
 from sqlalchemy.orm import joinedload
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, select, type_coerce
+from sqlalchemy.sql import Select
 from flask_rbac import RoleMixin, UserMixin
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 from . import db
 
 
@@ -33,3 +35,68 @@ class Address(db.Model):
     latitude: Decimal = db.Column(db.Numeric, nullable=False)
     longitude: Decimal = db.Column(db.Numeric, nullable=False)
 
+
+
+# r*tree spatial index of address coordinates, its rows are maintained by database triggers
+# (see sql/upgrade/0008_address_location.sql), id of a row is the id of the indexed address
+address_location = db.Table(
+    'address_location',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('min_latitude', db.Float),
+    db.Column('max_latitude', db.Float),
+    db.Column('min_longitude', db.Float),
+    db.Column('max_longitude', db.Float)
+)
+
+# kilometers per degree of latitude, and of longitude at the equator
+_KM_PER_DEGREE = 111.32
+# distances are computed by an equirectangular projection centered on the searched location, whose error stays
+# below one percent within this radius
+MAX_SEARCH_RADIUS = 100.0
+
+
+class Location(NamedTuple):
+    """circle searched around a point, radius is in kilometers"""
+    latitude: float
+    longitude: float
+    radius: float
+
+    @staticmethod
+    def parse(value) -> Location:
+        """returns the location of a (latitude, longitude, radius) sequence, raises ValueError if it is invalid"""
+        try:
+            latitude, longitude, radius = (float(item) for item in value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid location '{value}', must be latitude, longitude and radius")
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            raise ValueError(f"Invalid coordinates {latitude}, {longitude}")
+        if not (0 < radius <= MAX_SEARCH_RADIUS):
+            raise ValueError(f"Invalid radius {radius}, must be greater than 0 and at most {MAX_SEARCH_RADIUS} km")
+        return Location(latitude, longitude, radius)
+
+    def _longitude_scale(self) -> float:
+        """kilometers per degree of longitude at the latitude of the location"""
+        return _KM_PER_DEGREE * math.cos(math.radians(self.latitude))
+
+    def address_ids(self) -> Select:
+        """statement of the ids of the addresses located in the bounding box of the circle, looked up in the spatial
+        index. The box is clipped to valid coordinates, circles crossing the antimeridian are not supported"""
+        latitude_delta = self.radius / _KM_PER_DEGREE
+        longitude_delta = min(self.radius / max(self._longitude_scale(), 1e-6), 180.0)
+        return select(address_location.c.id).where(
+            address_location.c.max_latitude >= self.latitude - latitude_delta,
+            address_location.c.min_latitude <= self.latitude + latitude_delta,
+            address_location.c.max_longitude >= self.longitude - longitude_delta,
+            address_location.c.min_longitude <= self.longitude + longitude_delta)
+
+    def squared_distance(self, latitude_column, longitude_column):
+        """expression of the squared distance in km² between the location and coordinates columns"""
+        latitude_distance = (latitude_column - self.latitude) * _KM_PER_DEGREE
+        longitude_distance = (longitude_column - self.longitude) * self._longitude_scale()
+        # coordinates columns are decimal, the distance is a float so that it can be encoded in cursors
+        return type_coerce(latitude_distance * latitude_distance + longitude_distance * longitude_distance, db.Float)
+
+    def distance(self, latitude: float, longitude: float) -> float:
+        """distance in km between the location and given coordinates, as computed by squared_distance"""
+        return math.hypot((float(latitude) - self.latitude) * _KM_PER_DEGREE,
+                          (float(longitude) - self.longitude) * self._longitude_scale())
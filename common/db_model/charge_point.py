@@ -1,9 +1,12 @@
 from __future__ import annotations
+from datetime import date, timedelta
+from itertools import groupby
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
-from sqlalchemy import and_, desc, not_
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from . import db
+from .list_query import ListQuery, equal_filter, search_filter
+from .search import charge_point_search
 from common.db_model.user import Organization
 from common.db_model.address import Address, ZipCode, City
 
@@ -43,69 +46,182 @@ class ChargePoint(db.Model):
             "status_label": self.status.label
         }
 
-    @staticmethod
-    def _get_filter_condition(_filter: Optional[Dict] = None):
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        for key, value in _filter.items():
-            if key == 'organization_id':
-                condition = and_(condition, ChargePoint.organization_id == value)
-            elif key == 'status':
-                condition = and_(condition, ChargePoint.status == value)
-            elif key == 'accessible_by_user_id':
-                condition = and_(condition, f"WhitelistUser.user_id == {value}")
-                now = datetime.utcnow().strftime(fmt="%y-%m-%d")
-                condition = and_(condition,
-                                 f"or_(WhitelistUser.expires_at.is_(None),WhitelistUser.expires_at>={now})")
-                condition = and_(condition, f"or_(Whitelist.expires_at.is_(None),Whitelist.expires_at>={now})")
-
-        return condition
-
     @staticmethod
     def get_total_for_list(_filter: Optional[Dict] = None) -> int:
         """returns total number of charge points which match given filter conditions"""
-        condition = ChargePoint._get_filter_condition(_filter)
-        return db.session.query(ChargePoint, "WhitelistChargePoint", "Whitelist", "WhitelistUser").\
-                   join(ChargePoint.organization). \
-                   join(ChargePoint.status). \
-                   join(ChargePoint.whitelist_links, isouter=True). \
-                   join("WhitelistChargePoint.whitelist", isouter=True). \
-                   join("Whitelist.user_links", isouter=True). \
-                   filter(condition).count() or 0
+        return _CHARGE_POINT_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list(limit: int = 10,
                          offset: int = 0,
-                         sort: str = 'reference',
-                         order: str = 'asc',
-                         _filter: Optional[Dict] = None) -> list:
-        """special request adapted for table queries"""
-        condition = ChargePoint._get_filter_condition(_filter)
-
-        query = ChargePoint.query.\
-                   options(joinedload(ChargePoint.organization)). \
-                   join(ChargePoint.organization). \
-                   join(ChargePoint.status). \
-                   join(ChargePoint.whitelist_links, isouter=True). \
-                   join("WhitelistChargePoint.whitelist", isouter=True). \
-                   join("Whitelist.user_links", isouter=True). \
-                   filter(condition)
-
-        if sort == 'reference':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+                         sort: Optional[str] = None,
+                         order: Optional[str] = None,
+                         _filter: Optional[Dict] = None,
+                         cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """special request adapted for table queries
+        returns the page of charge points and the cursor of the next page"""
+        return _CHARGE_POINT_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
+    @staticmethod
+    def get_page_for_list(limit: int = 10,
+                          offset: int = 0,
+                          sort: Optional[str] = None,
+                          order: Optional[str] = None,
+                          _filter: Optional[Dict] = None,
+                          cursor: Optional[str] = None,
+                          with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """special request adapted for table queries, page and total are fetched by a single statement
+        returns the page of charge points, their total number (None if with_total is False)
+        and the cursor of the next page"""
+        return _CHARGE_POINT_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
+
+
+class ChargePointStatusCount(db.Model):
+    """number of charge points of an organization by status, kept current by triggers on charge_point"""
+    __tablename__ = 'charge_point_status_count'
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), primary_key=True)
+    status_id = db.Column(db.Integer, db.ForeignKey('charge_point_status.id'), primary_key=True)
+    status: ChargePointStatus = db.relationship(ChargePointStatus)
+    cp_count: int = db.Column(db.Integer, nullable=False)
 
+    @staticmethod
+    def get_for_organization(organization_id: int) -> List[Tuple[str, str, int]]:
+        """returns (status code, status label, number of charge points) of the statuses of the charge points
+        of an organization"""
+        return db.session.query(ChargePointStatus.code, ChargePointStatus.label, ChargePointStatusCount.cp_count). \
+            join(ChargePointStatusCount.status). \
+            filter(ChargePointStatusCount.organization_id == organization_id, ChargePointStatusCount.cp_count > 0). \
+            order_by(ChargePointStatus.code).all()
+
+
+class ChargePointStatusSnapshot(db.Model):
+    """last value of a charge point counter on a day, written by triggers on charge_point_status_count
+    a day without snapshot of a counter keeps the value of its previous snapshot"""
+    __tablename__ = 'charge_point_status_snapshot'
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), primary_key=True)
+    day: str = db.Column(db.String, primary_key=True)
+    status_id = db.Column(db.Integer, db.ForeignKey('charge_point_status.id'), primary_key=True)
+    cp_count: int = db.Column(db.Integer, nullable=False)
 
+    @staticmethod
+    def get_history(organization_id: int, start: date, end: date) -> List[Dict]:
+        """returns the number of charge points of an organization by status for each day from start to end"""
+        counts = dict()
+        # values at the beginning of the period come from the last snapshot of each status before it
+        # (sqlite returns the other columns of the row holding the max)
+        for status_id, cp_count, _ in db.session.query(ChargePointStatusSnapshot.status_id,
+                                                       ChargePointStatusSnapshot.cp_count,
+                                                       func.max(ChargePointStatusSnapshot.day)). \
+                filter(ChargePointStatusSnapshot.organization_id == organization_id,
+                       ChargePointStatusSnapshot.day < start.isoformat()). \
+                group_by(ChargePointStatusSnapshot.status_id):
+            counts[status_id] = cp_count
+
+        snapshots = db.session.query(ChargePointStatusSnapshot.day, ChargePointStatusSnapshot.status_id,
+                                     ChargePointStatusSnapshot.cp_count). \
+            filter(ChargePointStatusSnapshot.organization_id == organization_id,
+                   ChargePointStatusSnapshot.day >= start.isoformat(),
+                   ChargePointStatusSnapshot.day <= end.isoformat()). \
+            order_by(ChargePointStatusSnapshot.day).all()
+        statuses = ChargePointStatus.query.order_by(ChargePointStatus.code).all()
+
+        history = list()
+        index = 0
+        day = start
+        while day <= end:
+            while index < len(snapshots) and snapshots[index][0] == day.isoformat():
+                counts[snapshots[index][1]] = snapshots[index][2]
+                index += 1
+            history.append({'day': day.isoformat(),
+                            'statuses': [{'status_code': m_status.code,
+                                          'status_label': m_status.label,
+                                          'cp_count': counts.get(m_status.id, 0)} for m_status in statuses]})
+            day += timedelta(days=1)
+        return history
+
+
+class ChargePointCluster(db.Model):
+    """number of charge points of an organization with one status in one cell of a map zoom level, kept current by
+    triggers on charge_point and address. A zoom level splits the world in cells of 360 / 2^zoom degrees"""
+    __tablename__ = 'charge_point_cluster'
+    # highest zoom level of sql/upgrade/0009_charge_point_cluster.sql, higher zoom levels are served its clusters
+    MAX_ZOOM = 16
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), primary_key=True)
+    zoom: int = db.Column(db.Integer, primary_key=True)
+    cell_y: int = db.Column(db.Integer, primary_key=True)
+    cell_x: int = db.Column(db.Integer, primary_key=True)
+    status_id = db.Column(db.Integer, db.ForeignKey('charge_point_status.id'), primary_key=True)
+    status: ChargePointStatus = db.relationship(ChargePointStatus)
+    cp_count: int = db.Column(db.Integer, nullable=False)
+    latitude_sum: float = db.Column(db.Float, nullable=False)
+    longitude_sum: float = db.Column(db.Float, nullable=False)
 
+    @staticmethod
+    def _cell(coordinate: float, offset: float, zoom: int) -> int:
+        """index of the cell of a latitude (offset 90) or longitude (offset 180), as computed by triggers"""
+        return int((coordinate + offset) * (1 << zoom) / 360)
 
+    @staticmethod
+    def get_for_bounding_box(organization_id: int, zoom: int, min_latitude: float, min_longitude: float,
+                             max_latitude: float, max_longitude: float) -> List[Dict]:
+        """returns the clusters of the charge points of an organization in the cells of a zoom level intersecting
+        a bounding box, each cluster holding its number of charge points, their centroid and their number by status"""
+        zoom = min(max(zoom, 0), ChargePointCluster.MAX_ZOOM)
+        rows = db.session.query(ChargePointCluster.cell_y, ChargePointCluster.cell_x, ChargePointStatus.code,
+                                ChargePointCluster.cp_count, ChargePointCluster.latitude_sum,
+                                ChargePointCluster.longitude_sum). \
+            join(ChargePointCluster.status). \
+            filter(ChargePointCluster.organization_id == organization_id,
+                   ChargePointCluster.zoom == zoom,
+                   ChargePointCluster.cell_y.between(ChargePointCluster._cell(min_latitude, 90, zoom),
+                                                     ChargePointCluster._cell(max_latitude, 90, zoom)),
+                   ChargePointCluster.cell_x.between(ChargePointCluster._cell(min_longitude, 180, zoom),
+                                                     ChargePointCluster._cell(max_longitude, 180, zoom)),
+                   ChargePointCluster.cp_count > 0). \
+            order_by(ChargePointCluster.cell_y, ChargePointCluster.cell_x, ChargePointStatus.code).all()
+
+        clusters = list()
+        for _, cell_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+            cell_rows = list(cell_rows)
+            cp_count = sum(row[3] for row in cell_rows)
+            clusters.append({'latitude': round(sum(row[4] for row in cell_rows) / cp_count, 7),
+                             'longitude': round(sum(row[5] for row in cell_rows) / cp_count, 7),
+                             'cp_count': cp_count,
+                             'statuses': [{'status_code': row[2], 'cp_count': row[3]} for row in cell_rows]})
+        return clusters
+
+
+# columns of exported charge points, lists of charge points join their status, address, zip code and city
+CHARGE_POINT_EXPORT_COLUMNS = {
+    'reference': ChargePoint.reference,
+    'organization': Organization.name_column(ChargePoint.organization_id),
+    'address': Address.label,
+    'zip_code': ZipCode.code,
+    'city': City.name,
+    'status_code': ChargePointStatus.code,
+    'status_label': ChargePointStatus.label
+}
+
+
+_CHARGE_POINT_LIST = ListQuery(
+    entities=[ChargePoint],
+    key_column=ChargePoint.id,
+    joins=[ChargePoint.status, ChargePoint.address, Address.zip_code, ZipCode.city],
+    options=lambda: [joinedload(ChargePoint.organization)],
+    filters={
+        'organization_id': equal_filter(ChargePoint.organization_id),
+        'status': equal_filter(ChargePointStatus.code),
+        'reference': search_filter(ChargePoint.reference, charge_point_search.c.reference, ChargePoint.id),
+        'address': search_filter(Address.label, charge_point_search.c.address, ChargePoint.id),
+        'zip_code': search_filter(ZipCode.code, charge_point_search.c.zip_code, ChargePoint.id),
+        'city': search_filter(City.name, charge_point_search.c.city, ChargePoint.id)
+    },
+    sorts={
+        'reference': ChargePoint.reference,
+        'status_code': ChargePointStatus.code,
+        'address': Address.label,
+        'zip_code': ZipCode.code,
+        'city': City.name
+    },
+    default_sort='reference'
+)
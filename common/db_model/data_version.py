@@ -0,0 +1,53 @@
+"""data version of organizations : a counter of organization bumped by every transaction writing data of the
+organization, from which ETags of list and info endpoints are derived (see api/helper/etag.py).
+Transactions of a request are attributed to the organization of the authenticated user and bumped just before their
+commit, so that the new version is visible with the data it versions. Writes made outside of a request (background
+jobs) bump the version themselves with bump_data_version"""
+from flask import g, has_request_context
+from sqlalchemy import event, select, update
+
+from . import db
+from .replica import RoutingSession
+from common.db_model.user import Organization
+
+_WRITTEN = 'data_version_written'
+
+
+def get_data_version(organization_id: int) -> int:
+    """returns the current data version of an organization"""
+    return db.session.execute(select(Organization.data_version).
+                              where(Organization.id == organization_id)).scalar_one()
+
+
+def bump_data_version(organization_id: int, session=None):
+    """increments the data version of an organization in the current transaction of session (db.session by default)
+    the statement is executed by the connection so that it is not seen as a write by the session events"""
+    session = session if session is not None else db.session
+    session.connection().execute(update(Organization.__table__).
+                                 where(Organization.__table__.c.id == organization_id).
+                                 values(data_version=Organization.__table__.c.data_version + 1))
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info[_WRITTEN] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WRITTEN] = True
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _before_commit(session):
+    # pending changes are flushed by the commit after this event
+    written = session.info.get(_WRITTEN, False) or session.new or session.dirty or session.deleted
+    if written and has_request_context() and g.get('current_user', None) is not None:
+        bump_data_version(g.current_user.organization_id, session)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _after_transaction(session):
+    session.info.pop(_WRITTEN, None)
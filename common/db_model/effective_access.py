@@ -0,0 +1,177 @@
+from __future__ import annotations
+from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, or_, func, select
+from datetime import date
+from typing import List, Optional, Dict, Tuple
+from . import db
+from .list_query import ListQuery, equal_filter, search_filter, boolean_filter
+from .search import charge_point_search
+from common.db_model.user import User
+from common.db_model.address import Address, ZipCode, City, Location
+from common.db_model.charge_point import ChargePoint, ChargePointStatus
+from common.db_model.whitelist import Whitelist, WhitelistUser, WhitelistChargePoint, chunked
+
+# date used in place of a null expires_at when comparing expiration dates
+_NEVER = date(year=9999, month=12, day=31)
+
+
+class EffectiveAccess(db.Model):
+    """Materialized access of one user to one charge point through one whitelist.
+    Rows are derived from whitelist, whitelist_user and whitelist_charge_point and must be refreshed
+    with EffectiveAccess.refresh each time one of these changes, inside the same transaction"""
+    __tablename__ = 'effective_access'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, primary_key=True)
+    user: User = db.relationship(User)
+    charge_point_id = db.Column(db.Integer, db.ForeignKey('charge_point.id'), nullable=False, primary_key=True)
+    charge_point: ChargePoint = db.relationship(ChargePoint)
+    whitelist_id = db.Column(db.Integer, db.ForeignKey('whitelist.id'), nullable=False, primary_key=True)
+    whitelist: Whitelist = db.relationship(Whitelist)
+    # max of whitelist, whitelist_user and whitelist_charge_point created_at
+    created_at: date = db.Column(db.Date, nullable=False)
+    # min of whitelist and whitelist_user expires_at, None if both never expire
+    expires_at: Optional[date] = db.Column(db.Date, nullable=True)
+    paid_by_organization: bool = db.Column(db.Boolean, nullable=False)
+
+    @staticmethod
+    def refresh(whitelist_id: int,
+                user_ids: Optional[List[int]] = None,
+                charge_point_ids: Optional[List[int]] = None):
+        """recomputes access rows of one whitelist, restricted to given users and/or charge points if any.
+        Given ids are refreshed by chunks to stay below the sqlite bound parameters limit.
+        Pending session changes are flushed first, commit is left to the caller"""
+        db.session.flush()
+
+        for user_ids_chunk in (chunked(user_ids) if user_ids is not None else [None]):
+            for charge_point_ids_chunk in (chunked(charge_point_ids) if charge_point_ids is not None else [None]):
+                EffectiveAccess._refresh(whitelist_id, user_ids_chunk, charge_point_ids_chunk)
+
+    @staticmethod
+    def _refresh(whitelist_id: int, user_ids: Optional[List[int]], charge_point_ids: Optional[List[int]]):
+        condition = EffectiveAccess.whitelist_id == whitelist_id
+        if user_ids is not None:
+            condition = and_(condition, EffectiveAccess.user_id.in_(user_ids))
+        if charge_point_ids is not None:
+            condition = and_(condition, EffectiveAccess.charge_point_id.in_(charge_point_ids))
+        db.session.query(EffectiveAccess).filter(condition).delete(synchronize_session=False)
+
+        condition = and_(Whitelist.id == whitelist_id,
+                         WhitelistUser.whitelist_id == Whitelist.id,
+                         WhitelistChargePoint.whitelist_id == Whitelist.id)
+        if user_ids is not None:
+            condition = and_(condition, WhitelistUser.user_id.in_(user_ids))
+        if charge_point_ids is not None:
+            condition = and_(condition, WhitelistChargePoint.charge_point_id.in_(charge_point_ids))
+
+        # sqlite multi-arguments min and max are scalar functions
+        created_at = func.max(Whitelist.created_at, WhitelistUser.created_at, WhitelistChargePoint.created_at)
+        expires_at = func.nullif(func.min(func.coalesce(Whitelist.expires_at, _NEVER),
+                                          func.coalesce(WhitelistUser.expires_at, _NEVER)), _NEVER)
+
+        query = select(WhitelistUser.user_id, WhitelistChargePoint.charge_point_id, Whitelist.id,
+                       created_at, expires_at, Whitelist.paid_by_organization).filter(condition)
+        db.session.execute(EffectiveAccess.__table__.insert().from_select(
+            ['user_id', 'charge_point_id', 'whitelist_id', 'created_at', 'expires_at', 'paid_by_organization'],
+            query))
+
+    @staticmethod
+    def update_whitelist_info(whitelist_id: int, expires_at: Optional[date], paid_by_organization: bool):
+        """updates access rows of one whitelist after a change of its expires_at or paid_by_organization, by a single
+        statement instead of recomputing the rows of all its users and charge points. Commit is left to the caller"""
+        member_expires_at = select(WhitelistUser.expires_at). \
+            where(WhitelistUser.whitelist_id == EffectiveAccess.whitelist_id,
+                  WhitelistUser.user_id == EffectiveAccess.user_id).scalar_subquery()
+        # sqlite multi-arguments min is a scalar function
+        access_expires_at = func.nullif(func.min(func.coalesce(expires_at, _NEVER),
+                                                 func.coalesce(member_expires_at, _NEVER)), _NEVER)
+        db.session.query(EffectiveAccess).filter(EffectiveAccess.whitelist_id == whitelist_id). \
+            update({EffectiveAccess.expires_at: access_expires_at,
+                    EffectiveAccess.paid_by_organization: paid_by_organization}, synchronize_session=False)
+
+    @staticmethod
+    def get_total_for_list(_filter: Optional[Dict] = None) -> int:
+        """returns number of distinct charge points matching given filter conditions"""
+        return _ALLOWED_CHARGE_POINT_LIST.get_total(_filter)
+
+    @staticmethod
+    def get_all_for_list(limit: int = 10,
+                         offset: int = 0,
+                         sort: Optional[str] = None,
+                         order: Optional[str] = None,
+                         _filter: Optional[Dict] = None,
+                         cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """queries intended for getting one user info accross multiple whitelists
+        access rows are grouped by charge point before pagination, each returned tuple is
+        (charge_point, status, address, zip_code, city, created_at, expires_at, paid_by_organization) where
+        created_at is the earliest access start, expires_at the latest access end (None if one access never expires)
+        and paid_by_organization is True if at least one access is paid by the organization"""
+        return _ALLOWED_CHARGE_POINT_LIST.get_page(limit, offset, sort, order, _filter, cursor)
+
+    @staticmethod
+    def get_page_for_list(limit: int = 10,
+                          offset: int = 0,
+                          sort: Optional[str] = None,
+                          order: Optional[str] = None,
+                          _filter: Optional[Dict] = None,
+                          cursor: Optional[str] = None,
+                          with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """same as get_all_for_list, the page and the total number of charge points (None if with_total is False)
+        are fetched by a single statement"""
+        return _ALLOWED_CHARGE_POINT_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
+
+
+def _unexpired_access_filter(value):
+    """access must not be expired at date value"""
+    return or_(EffectiveAccess.expires_at.is_(None), EffectiveAccess.expires_at >= value)
+
+
+def _near_filter(value):
+    """charge point must be located within the circle of the (latitude, longitude, radius) value.
+    Candidate charge points are selected first through the address spatial index, access rows are then looked up
+    by charge point in the primary key index instead of scanning all the accesses of the user"""
+    location = Location.parse(value)
+    return and_(EffectiveAccess.charge_point_id.in_(
+                    select(ChargePoint.id).where(ChargePoint.address_id.in_(location.address_ids()))),
+                location.squared_distance(Address.latitude, Address.longitude) <= location.radius * location.radius)
+
+
+def _distance_sort(_filter: Dict):
+    """distance to the location of the near filter"""
+    if 'near' not in _filter:
+        raise ValueError("Sort 'distance' requires a location")
+    return Location.parse(_filter['near']).squared_distance(Address.latitude, Address.longitude)
+
+
+_ALLOWED_CHARGE_POINT_LIST = ListQuery(
+    entities=[ChargePoint, ChargePointStatus, Address, ZipCode, City,
+              func.min(EffectiveAccess.created_at),
+              func.nullif(func.max(func.coalesce(EffectiveAccess.expires_at, _NEVER)), _NEVER, type_=db.Date),
+              func.max(EffectiveAccess.paid_by_organization)],
+    key_column=ChargePoint.id,
+    conditions=[EffectiveAccess.charge_point_id == ChargePoint.id,
+                ChargePoint.status_id == ChargePointStatus.id,
+                ChargePoint.address_id == Address.id,
+                Address.zip_code_id == ZipCode.id,
+                ZipCode.city_id == City.id],
+    options=lambda: [joinedload(ChargePoint.organization)],
+    filters={
+        'user_id': equal_filter(EffectiveAccess.user_id),
+        'whitelist_id': equal_filter(EffectiveAccess.whitelist_id),
+        'unexpired_at': _unexpired_access_filter,
+        'paid_by_organization': boolean_filter(EffectiveAccess.paid_by_organization),
+        'address': search_filter(Address.label, charge_point_search.c.address, ChargePoint.id),
+        'zip_code': search_filter(ZipCode.code, charge_point_search.c.zip_code, ChargePoint.id),
+        'city': search_filter(City.name, charge_point_search.c.city, ChargePoint.id),
+        'status_code': search_filter(ChargePointStatus.code, charge_point_search.c.status_code, ChargePoint.id),
+        'near': _near_filter
+    },
+    sorts={
+        'reference': ChargePoint.reference,
+        'address': Address.label,
+        'zip_code': ZipCode.code,
+        'city': City.name,
+        'distance': _distance_sort
+    },
+    default_sort='reference',
+    group_by=ChargePoint.id,
+    count_column=EffectiveAccess.charge_point_id
+)
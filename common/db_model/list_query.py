@@ -0,0 +1,207 @@
+"""declarative list (table) queries shared by model repositories
+each list is declared once with its entities, joins, filters and sorts, the ListQuery then builds
+count and page statements for any filter, sort, order and pagination requested by the api.
+The total can also be fetched by the page statement itself, saving a statement per page.
+Statements only differ by their bound parameters for a given set of filter keys and sort,
+so SQLAlchemy compiled cache is hit and SQL compilation is skipped after the first request.
+Lists declaring export columns can also be streamed whole, as flat rows fetched by batches"""
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+from sqlalchemy.orm import Query
+
+from . import db
+from .pagination import paginate
+
+
+def equal_filter(column) -> Callable:
+    """filter on exact value of a column"""
+    return lambda value: column == value
+
+
+def contains_filter(column) -> Callable:
+    """case insensitive filter on a substring of a text column"""
+    return lambda value: column.ilike(f"%{value.strip()}%")
+
+
+# the trigram tokenizer only indexes substrings of at least 3 characters
+_TRIGRAM_LENGTH = 3
+
+
+def search_filter(column, search_column, key_column) -> Callable:
+    """case insensitive filter on a substring of a text column served by its trigram full text search index
+    :param search_column: column of a search table indexing column, search table rowid being the key_column value
+    values shorter than a trigram can't be looked up in the index and fall back to contains_filter"""
+    fallback = contains_filter(column)
+
+    def _filter(value):
+        value = value.strip()
+        if len(value) < _TRIGRAM_LENGTH:
+            return fallback(value)
+        # value is searched as a single phrase, double quotes are escaped by doubling them
+        phrase = '"' + value.replace('"', '""') + '"'
+        return key_column.in_(select(search_column.table.c.rowid).where(search_column.op('MATCH')(phrase)))
+
+    return _filter
+
+
+def boolean_filter(column) -> Callable:
+    """filter on the truth value of a boolean column"""
+    return lambda value: column == bool(value)
+
+
+class ListQuery:
+    """declarative definition of a list query
+    :param entities: entities and column expressions of each returned row
+    :param key_column: unique column of the rows, used as pagination tie-breaker
+    :param sorts: dictionary of sort name => sorted column, or function returning the sorted column for the filter
+    values of the request for sorts depending on them (distance to a searched location)
+    :param default_sort: sort name used when none is requested
+    :param default_order: order used when none is requested
+    :param filters: dictionary of filter key => function returning the condition for a filter value,
+    unknown filter keys are ignored
+    :param joins: relationships or targets joined to the first entity
+    :param conditions: conditions always applied (join conditions between entities)
+    :param options: function returning loader options applied to page queries only, called on first use
+    since backref relationships only exist once mappers are configured
+    :param group_by: if set page rows are grouped by this column before pagination
+    :param count_column: if set total is the number of distinct values of this column instead of the number of rows
+    :param export_columns: dictionary of column name => column expression of exported rows, expressions may be
+    correlated scalar subqueries so that an export is a single statement
+    """
+
+    def __init__(self,
+                 entities: Sequence,
+                 key_column,
+                 sorts: Dict[str, Any],
+                 default_sort: str,
+                 default_order: str = 'asc',
+                 filters: Optional[Dict[str, Callable]] = None,
+                 joins: Sequence = (),
+                 conditions: Sequence = (),
+                 options: Optional[Callable[[], Sequence]] = None,
+                 group_by=None,
+                 count_column=None,
+                 export_columns: Optional[Dict[str, Any]] = None):
+        self._entities = tuple(entities)
+        self._key_column = key_column
+        self._sorts = sorts
+        self._default_sort = default_sort
+        self._default_order = default_order
+        self._filters = filters or {}
+        self._joins = tuple(joins)
+        self._conditions = tuple(conditions)
+        self._options_factory = options
+        self._options: Tuple = ()
+        self._group_by = group_by
+        self._count_column = count_column
+        self._export_columns = export_columns or {}
+        self._base_query: Optional[Query] = None
+
+    def _get_base_query(self) -> Query:
+        """returns the query with entities, joins and constant conditions, built once and then reused since
+        queries are generative"""
+        if self._base_query is None:
+            if self._options_factory is not None:
+                self._options = tuple(self._options_factory())
+            query = Query(self._entities)
+            for join in self._joins:
+                query = query.join(join)
+            if self._conditions:
+                query = query.filter(*self._conditions)
+            self._base_query = query
+        return self._base_query
+
+    def _get_filtered_query(self, _filter: Optional[Dict] = None) -> Query:
+        query = self._get_base_query().with_session(db.session())
+        conditions = [self._filters[key](value) for key, value in (_filter or {}).items() if key in self._filters]
+        if conditions:
+            query = query.filter(*conditions)
+        return query
+
+    def _get_total_statement(self, _filter: Optional[Dict] = None) -> Select:
+        query = self._get_filtered_query(_filter)
+        if self._count_column is not None:
+            return query.with_entities(func.count(func.distinct(self._count_column))).statement
+        return select(func.count()).select_from(query.subquery())
+
+    def get_total(self, _filter: Optional[Dict] = None) -> int:
+        """returns total number of rows which match given filter conditions"""
+        return db.session.execute(self._get_total_statement(_filter)).scalar() or 0
+
+    def get_page(self,
+                 limit: int = 10,
+                 offset: int = 0,
+                 sort: Optional[str] = None,
+                 order: Optional[str] = None,
+                 _filter: Optional[Dict] = None,
+                 cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """returns the page of rows which match given filter conditions and the cursor of the next page
+        raises ValueError if sort, order or cursor is not supported"""
+        rows, next_cursor, _ = self._paginate(limit, offset, sort, order, _filter, cursor, False)
+        return rows, next_cursor
+
+    def get_page_and_total(self,
+                           limit: int = 10,
+                           offset: int = 0,
+                           sort: Optional[str] = None,
+                           order: Optional[str] = None,
+                           _filter: Optional[Dict] = None,
+                           cursor: Optional[str] = None,
+                           with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """returns the page of rows which match given filter conditions, their total number (None if with_total is
+        False) and the cursor of the next page. The total is fetched by the page statement itself as an uncorrelated
+        count subquery evaluated once, a separate count is only run for empty pages past the end of the list.
+        raises ValueError if sort, order or cursor is not supported"""
+        rows, next_cursor, total = self._paginate(limit, offset, sort, order, _filter, cursor, with_total)
+        if with_total and total is None:
+            total = self.get_total(_filter)
+        return rows, total, next_cursor
+
+    def get_rows_for_export(self,
+                            sort: Optional[str] = None,
+                            order: Optional[str] = None,
+                            _filter: Optional[Dict] = None,
+                            batch_size: int = 1000) -> Query:
+        """returns the query of export columns of all rows which match given filter conditions, in list order.
+        Rows are fetched by batches of batch_size while the query is iterated, so memory does not depend on the
+        number of rows. raises ValueError if sort or order is not supported"""
+        sort, order = self._check_sort(sort, order)
+        query = self._get_filtered_query(_filter). \
+            with_entities(*[column.label(name) for name, column in self._export_columns.items()])
+        if self._group_by is not None:
+            query = query.group_by(self._group_by)
+        sort_column = self._get_sort_column(sort, _filter)
+        if order == 'asc':
+            query = query.order_by(sort_column.asc(), self._key_column.asc())
+        else:
+            query = query.order_by(sort_column.desc(), self._key_column.desc())
+        return query.yield_per(batch_size)
+
+    def _check_sort(self, sort: Optional[str], order: Optional[str]) -> Tuple[str, str]:
+        """returns sort and order or their default values, raises ValueError if they are not supported"""
+        sort = sort or self._default_sort
+        order = (order or self._default_order).lower()
+        if sort not in self._sorts:
+            raise ValueError(f"Unsupported sort '{sort}', must be one of {', '.join(self._sorts.keys())}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unsupported order '{order}', must be either asc or desc")
+        return sort, order
+
+    def _get_sort_column(self, sort: str, _filter: Optional[Dict]):
+        sort_column = self._sorts[sort]
+        return sort_column(_filter or {}) if callable(sort_column) else sort_column
+
+    def _paginate(self, limit: int, offset: int, sort: Optional[str], order: Optional[str], _filter: Optional[Dict],
+                  cursor: Optional[str], with_total: bool) -> Tuple[list, Optional[str], Optional[int]]:
+        sort, order = self._check_sort(sort, order)
+
+        query = self._get_filtered_query(_filter)
+        if self._options:
+            query = query.options(*self._options)
+        if self._group_by is not None:
+            query = query.group_by(self._group_by)
+
+        total_column = self._get_total_statement(_filter).correlate(None).scalar_subquery() if with_total else None
+        return paginate(query, self._get_sort_column(sort, _filter), self._key_column, order, limit, offset, cursor, total_column)
@@ -0,0 +1,89 @@
+"""helper functions for paginating list queries either by offset or by keyset (cursor)
+a cursor is an opaque string encoding the (sort column, primary key) values of the last row of a page,
+next page is fetched by seeking rows strictly after these values instead of skipping offset rows.
+the total number of rows can be fetched by the page statement itself as an additional column"""
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Optional, Tuple, List, Any
+
+from sqlalchemy import and_, or_, Date
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(sort_value: Any, key_value: Any) -> str:
+    """returns the opaque cursor designating a row by its sort and key values"""
+    payload = json.dumps([sort_value, key_value], default=lambda x: x.isoformat())
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, sort_column) -> Tuple[Any, Any]:
+    """returns (sort value, key value) encoded in cursor, raises ValueError if cursor is invalid"""
+    try:
+        sort_value, key_value = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort_value is not None and isinstance(sort_column.type, Date):
+            sort_value = date.fromisoformat(sort_value)
+    except (binascii.Error, TypeError, ValueError, UnicodeError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return sort_value, key_value
+
+
+def _seek_condition(sort_column, key_column, ascending: bool, sort_value: Any, key_value: Any):
+    """condition selecting rows located after (sort_value, key_value) in the list order
+    sqlite puts null values first in ascending order and last in descending order"""
+    if ascending:
+        key_after = key_column > key_value
+        if sort_value is None:
+            return or_(sort_column.isnot(None), and_(sort_column.is_(None), key_after))
+        return or_(sort_column > sort_value, and_(sort_column == sort_value, key_after))
+
+    key_after = key_column < key_value
+    if sort_value is None:
+        return and_(sort_column.is_(None), key_after)
+    return or_(sort_column < sort_value, sort_column.is_(None), and_(sort_column == sort_value, key_after))
+
+
+def paginate(query: Query,
+             sort_column,
+             key_column,
+             order: str = 'asc',
+             limit: int = 10,
+             offset: int = 0,
+             cursor: Optional[str] = None,
+             total_column=None) -> Tuple[List, Optional[str], Optional[int]]:
+    """orders query on (sort_column, key_column) and returns one page of rows with the cursor of the next page
+    (None if this page is the last one) and the total number of query rows.
+    key_column must be unique among query rows so that it can be used as a tie-breaker.
+    if cursor is given the page starts right after the row it designates and offset is ignored.
+    total_column is an uncorrelated scalar subquery counting all rows regardless of pagination,
+    total is None if it is not given or if the page is empty and does not start the list since no row carries it"""
+    single_entity = len(query.column_descriptions) == 1
+    ascending = order.lower() == 'asc'
+
+    if ascending:
+        query = query.order_by(sort_column.asc(), key_column.asc())
+    else:
+        query = query.order_by(sort_column.desc(), key_column.desc())
+
+    if cursor:
+        sort_value, key_value = decode_cursor(cursor, sort_column)
+        query = query.filter(_seek_condition(sort_column, key_column, ascending, sort_value, key_value))
+    else:
+        query = query.offset(offset)
+
+    # total, sort and key values are fetched along rows to build the next cursor
+    extra_columns = [total_column] if total_column is not None else []
+    extra_columns += [sort_column, key_column]
+    rows = query.add_columns(*extra_columns).limit(limit).all()
+
+    next_cursor = encode_cursor(*rows[-1][-2:]) if rows and len(rows) == limit else None
+    total = None
+    if total_column is not None:
+        if rows:
+            total = rows[0][-3]
+        elif not cursor and not offset:
+            total = 0
+    rows = list(map(lambda row: row[0] if single_entity else tuple(row[:-len(extra_columns)]), rows))
+
+    return rows, next_cursor, total
@@ -0,0 +1,81 @@
+"""sql statements instrumentation through engine events
+statements lasting at least a latency threshold are always logged, a sample of the other ones is logged too.
+Each logged statement comes with its duration, bind parameters and the repository method which issued it.
+Records are written to sqlalchemy.log by a listener thread so that requests never wait for file I/O"""
+import logging
+import os
+import random
+import sys
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from common.queued_logging import QueuedLogPipeline
+
+# load .env files if any
+load_dotenv()
+_LOG_FILEPATH = f"{os.environ.get('LOG_FILEPATH', './logs')}/sqlalchemy.log"
+_PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# files of the list query engine are skipped to report the repository method using it
+_SKIPPED_FILES = {os.path.abspath(__file__)} | {os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+                                                for filename in ('list_query.py', 'pagination.py')}
+_MAX_PARAMETERS_LENGTH = 1000
+
+
+def _create_file_handler() -> logging.Handler:
+    handler = RotatingFileHandler(_LOG_FILEPATH, mode='a', maxBytes=1000000, backupCount=5)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+    return handler
+
+
+_PIPELINE = QueuedLogPipeline("sql-queries", _create_file_handler)
+
+
+def _get_caller() -> Optional[str]:
+    """returns module.function:line of the innermost project frame which issued the current statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_DIRECTORY) and 'site-packages' not in filename \
+                and filename not in _SKIPPED_FILES:
+            return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def init_query_logging(engine: Engine, slow_threshold: float, sample_rate: float):
+    """logs statements of engine lasting at least slow_threshold milliseconds with a WARNING level
+    and a sample_rate share (between 0 and 1) of faster ones with an INFO level"""
+    _PIPELINE.ensure_started()
+    logger = _PIPELINE.logger
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+        if duration >= slow_threshold:
+            level = logging.WARNING
+        elif sample_rate and random.random() < sample_rate:
+            level = logging.INFO
+        else:
+            return
+        parameters = repr(parameters)
+        if len(parameters) > _MAX_PARAMETERS_LENGTH:
+            parameters = parameters[:_MAX_PARAMETERS_LENGTH] + '...'
+        logger.log(level, f"{duration:.1f} ms{' executemany' if executemany else ''} from {_get_caller()}\n"
+                          f"{statement}\nparameters: {parameters}")
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        # failed statements never reach after_cursor_execute
+        start_times = exception_context.connection.info.get('query_start_time', None) \
+            if exception_context.connection is not None else None
+        if start_times:
+            start_times.pop()
@@ -0,0 +1,148 @@
+"""read routing to a replica database : reads of GET requests go to the replica engine, other requests and
+all writes go to the primary database.
+Two replica modes are available :
+- READ_ONLY, the replica engine opens the primary database file with read-only connections, it is never stale
+- BACKUP, the replica is a copy of the primary database file refreshed with the sqlite backup API when older than
+the refresh interval. Reads of a user who wrote after the last refresh go to the primary database (read-your-writes).
+Refresh and write times are file modification times, so that they are shared by all server workers"""
+import fcntl
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Union
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine import Engine
+
+from .sqlite_profile import init_sqlite_profile
+
+READ_ONLY = 'readonly'
+BACKUP = 'backup'
+
+
+class ReplicaRouter:
+    """decides for the current request whether reads may go to the replica engine"""
+
+    def __init__(self, mode: str, engine: Engine, primary_filepath: str, replica_filepath: str,
+                 refresh_interval: float):
+        if mode not in (READ_ONLY, BACKUP):
+            raise ValueError(f"Unknown replica mode {mode}, must be either {READ_ONLY} or {BACKUP}.")
+        self.mode = mode
+        self.engine = engine
+        self._primary_filepath = primary_filepath
+        self._replica_filepath = replica_filepath
+        self._refresh_interval = refresh_interval
+        # modification time of this file is the start time of the last refresh, it also locks refreshes
+        self._refresh_filepath = f"{replica_filepath}.refresh"
+        # modification time of each file of this directory is the last write time of a user
+        self._writes_directory = f"{replica_filepath}.writes"
+        if mode == BACKUP:
+            os.makedirs(self._writes_directory, exist_ok=True)
+
+    def use_replica(self) -> bool:
+        """returns True if reads of the current request may go to the replica.
+        Only GET requests use it, a request can opt out with the replica=false query argument"""
+        if not has_request_context() or request.method != 'GET':
+            return False
+        user = g.get('current_user', None)
+        user_id = user.id if user is not None else None
+        # the decision is taken once per request, then again once the user is authenticated
+        decision = g.get('read_replica', None)
+        if decision is not None and decision[0] == user_id:
+            return decision[1]
+
+        use_replica = request.args.get('replica', 'true').lower() != 'false'
+        if use_replica and self.mode == BACKUP:
+            refreshed_at = self._get_modification_time(self._refresh_filepath)
+            if time.time() - refreshed_at > self._refresh_interval:
+                refreshed_at = self.refresh() or refreshed_at
+            if user_id is not None:
+                use_replica = refreshed_at > self._get_modification_time(f"{self._writes_directory}/{user_id}")
+        g.read_replica = (user_id, use_replica)
+        return use_replica
+
+    def record_write(self, user_id: int):
+        """registers that user_id has just written to the primary database,
+        its reads go to the primary database until the replica is refreshed"""
+        if self.mode != BACKUP:
+            return
+        filepath = f"{self._writes_directory}/{user_id}"
+        with open(filepath, 'a'):
+            pass
+        os.utime(filepath)
+
+    def refresh(self) -> Optional[float]:
+        """copies the primary database into the replica unless another process is already doing it,
+        returns the start time of the copy, None if the replica was not refreshed"""
+        with open(self._refresh_filepath, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            started_at = time.time()
+            source = sqlite3.connect(self._primary_filepath)
+            destination = sqlite3.connect(self._replica_filepath)
+            try:
+                source.backup(destination)
+            finally:
+                destination.close()
+                source.close()
+            os.utime(self._refresh_filepath, (started_at, started_at))
+            return started_at
+
+    @staticmethod
+    def _get_modification_time(filepath: str) -> float:
+        try:
+            return os.path.getmtime(filepath)
+        except FileNotFoundError:
+            return 0
+
+
+def create_replica_router(mode: str, primary_filepath: str, replica_filepath: str, refresh_interval: float,
+                          engine_options: Dict, pragmas: Dict[str, Union[str, int]]) -> ReplicaRouter:
+    """returns the router of given mode, its replica engine has the same options and pragmas as the primary one"""
+    if mode == READ_ONLY:
+        url = f"sqlite:///file:{primary_filepath}?mode=ro&uri=true"
+        # the journal mode belongs to the primary database file, read-only connections cannot change it
+        pragmas = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+    else:
+        url = f"sqlite:///{replica_filepath}"
+    engine = create_engine(url, **engine_options)
+    init_sqlite_profile(engine, pragmas)
+    router = ReplicaRouter(mode, engine, primary_filepath, replica_filepath, refresh_interval)
+    if mode == BACKUP:
+        router.refresh()
+    return router
+
+
+class RoutingSession(SignallingSession):
+    """session reading from the replica engine of the application when its replica router allows it,
+    requests writing to the primary database are flagged by g.wrote_primary"""
+
+    def get_bind(self, mapper=None, clause=None):
+        router: Optional[ReplicaRouter] = getattr(self.app, 'replica_router', None)
+        if router is not None and not self._flushing and router.use_replica():
+            return router.engine
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    if has_request_context():
+        g.wrote_primary = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _do_orm_execute(orm_execute_state):
+    if has_request_context() and (orm_execute_state.is_insert or orm_execute_state.is_update
+                                  or orm_execute_state.is_delete):
+        g.wrote_primary = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """flask_sqlalchemy manager whose sessions are RoutingSession"""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,54 @@
+"""versioned upgrades of the database schema
+sql/db_creation.sql creates the latest schema, databases created by an older version of it are upgraded by
+the scripts of sql/upgrade named NNNN_description.sql. The schema version is stored in sqlite PRAGMA user_version,
+each script whose number is greater than this version is applied in its own transaction along with the new version"""
+import os
+import re
+from typing import List, Tuple
+
+_UPGRADE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  'sql', 'upgrade')
+_UPGRADE_FILENAME = re.compile(r'^(\d{4})_\w+\.sql$')
+
+
+def get_upgrade_scripts() -> List[Tuple[int, str]]:
+    """returns (version, filepath) of all upgrade scripts ordered by version"""
+    scripts = list()
+    for filename in os.listdir(_UPGRADE_DIRECTORY):
+        match = _UPGRADE_FILENAME.match(filename)
+        if match:
+            scripts.append((int(match.group(1)), os.path.join(_UPGRADE_DIRECTORY, filename)))
+    return sorted(scripts)
+
+
+def get_schema_version(engine) -> int:
+    """returns the schema version of the database"""
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade_schema(engine) -> List[str]:
+    """applies upgrade scripts more recent than the database schema version and returns their file names
+    an empty database is left untouched, it must be created with sql/db_creation.sql"""
+    with engine.connect() as connection:
+        if not connection.exec_driver_sql("SELECT count(*) FROM sqlite_master").scalar():
+            return []
+    version = get_schema_version(engine)
+    applied = list()
+    for script_version, filepath in get_upgrade_scripts():
+        if script_version <= version:
+            continue
+        with open(filepath, encoding='utf-8') as sql_file:
+            script = sql_file.read()
+        raw_connection = engine.raw_connection()
+        try:
+            # executescript runs outside of the driver transaction handling, hence the explicit transaction
+            raw_connection.connection.executescript(
+                f"BEGIN;\n{script}\nPRAGMA user_version = {script_version};\nCOMMIT;")
+        except Exception:
+            raw_connection.connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+        applied.append(os.path.basename(filepath))
+    return applied
@@ -0,0 +1,22 @@
+"""trigram full text search shadow tables of the text fields filtered by substring in list queries
+their rows are maintained by database triggers (see sql/upgrade/0003_search_index.sql), they are only read
+through search_filter conditions. rowid of a search table row is the id of the indexed row"""
+from . import db
+
+user_search = db.Table(
+    'user_search',
+    db.Column('rowid', db.Integer, primary_key=True),
+    db.Column('email', db.String),
+    db.Column('firstname', db.String),
+    db.Column('lastname', db.String)
+)
+
+charge_point_search = db.Table(
+    'charge_point_search',
+    db.Column('rowid', db.Integer, primary_key=True),
+    db.Column('reference', db.String),
+    db.Column('status_code', db.String),
+    db.Column('address', db.String),
+    db.Column('zip_code', db.String),
+    db.Column('city', db.String)
+)
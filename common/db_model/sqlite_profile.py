@@ -0,0 +1,18 @@
+"""sqlite tuning profile : pragmas executed on every new dbapi connection of the engine.
+Connections are kept open by the engine pool, so that pragmas, page cache and memory map are reused between requests"""
+from typing import Dict, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def init_sqlite_profile(engine: Engine, pragmas: Dict[str, Union[str, int]]):
+    """executes PRAGMA name = value for each item of pragmas on every connection opened by engine,
+    it must be called before the engine opens its first connection"""
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
@@ -1,10 +1,12 @@
 from __future__ import annotations
-from sqlalchemy.orm import joinedload
-from sqlalchemy import and_, desc
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, joinedload, selectinload
 from flask_rbac import RoleMixin, UserMixin
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import Iterable, List, Optional, Dict, Tuple
 from . import db, rbac
+from .list_query import ListQuery, equal_filter, search_filter
+from .search import user_search
 
 
 @rbac.as_role_model
@@ -51,11 +53,18 @@ class Organization(db.Model):
     __tablename__ = 'organization'
     id: int = db.Column(db.Integer, primary_key=True)
     name: str = db.Column(db.String, nullable=False, unique=True)
+    # bumped by every write of the organization data, see data_version.py
+    data_version: int = db.Column(db.Integer, nullable=False, default=0)
 
     @staticmethod
     def find_one_by_name(name: str) -> Optional[Organization]:
         return Organization.query.filter_by(name=name).one_or_none()
 
+    @staticmethod
+    def name_column(organization_id_column):
+        """returns the correlated scalar subquery of the name of the organization of id organization_id_column"""
+        return select(Organization.name).where(Organization.id == organization_id_column).scalar_subquery()
+
 
 user_role = db.Table(
     'user_role',
@@ -100,9 +109,32 @@ class User(db.Model, UserMixin):
     def get_by_email(email: str) -> Optional[User]:
         return User.query. \
             options(joinedload(User.organization, innerjoin=False)). \
-            options(joinedload(User.roles, innerjoin=False)). \
+            options(selectinload(User.roles)). \
             filter_by(email=email).one_or_none()
 
+    @staticmethod
+    def get_by_id(_id: int) -> Optional[User]:
+        return User.query. \
+            options(joinedload(User.organization, innerjoin=False)). \
+            options(selectinload(User.roles)). \
+            filter_by(id=_id).one_or_none()
+
+    @staticmethod
+    def create_authenticated(_id: int, email: str, organization_id: int, role_names: Iterable[str]) -> User:
+        """return a transient user (never bound to the db session) built from a cached authenticated identity,
+        it only carries what authorization checks need, use get_by_id to load the full user"""
+        authenticated_user = User()
+        authenticated_user.id = _id
+        authenticated_user.email = email
+        authenticated_user.organization_id = organization_id
+        roles = list()
+        for name in role_names:
+            role = Role()
+            role.name = name
+            roles.append(role)
+        authenticated_user.roles = roles
+        return authenticated_user
+
     @staticmethod
     def create_anonymous() -> User:
         """return an anonymous user"""
@@ -126,59 +158,75 @@ class User(db.Model, UserMixin):
             "roles": list(map(lambda x: x.name, self.roles))
         }
 
-    @staticmethod
-    def _get_filter_condition(_filter: Optional[Dict] = None):
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        for key, value in _filter.items():
-            if key == 'organization_id':
-                condition = and_(condition, User.organization_id == value)
-            elif key == 'role':
-                condition = and_(condition, Role.name == value)
-            elif key == 'email':
-                condition = and_(condition, User.email.ilike(f"%{value.strip()}%"))
-            elif key == 'firstname':
-                condition = and_(condition, User.firstname.ilike(f"%{value.strip()}%"))
-            elif key == 'lastname':
-                condition = and_(condition, User.lastname.ilike(f"%{value.strip()}%"))
-
-        return condition
-
     @staticmethod
     def get_total_for_list(_filter: Optional[Dict] = None) -> int:
         """returns total number of users which match given filter conditions"""
-        condition = User._get_filter_condition(_filter)
-        return User.query.join(User.roles). \
-                   filter(condition). \
-                   count() or 0
+        return _USER_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list(limit: int = 10,
                          offset: int = 0,
-                         sort: str = 'email',
-                         order: str = 'asc',
-                         _filter: Optional[Dict] = None) -> list:
-        """special request adapted for table queries"""
-        condition = User._get_filter_condition(_filter)
-
-        query = User.query.join(User.roles).options(joinedload(User.organization)).filter(condition)
-
-        if sort == 'firstname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.firstname.asc())
-            else:
-                query = query.order_by(User.firstname.desc())
-        elif sort == 'lastname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.lastname.asc())
-            else:
-                query = query.order_by(User.lastname.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(User.email.asc())
-            else:
-                query = query.order_by(User.email.desc())
+                         sort: Optional[str] = None,
+                         order: Optional[str] = None,
+                         _filter: Optional[Dict] = None,
+                         cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """special request adapted for table queries
+        returns the page of users and the cursor of the next page"""
+        return _USER_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
-        return query.limit(limit).offset(offset).all() or list()
+    @staticmethod
+    def get_page_for_list(limit: int = 10,
+                          offset: int = 0,
+                          sort: Optional[str] = None,
+                          order: Optional[str] = None,
+                          _filter: Optional[Dict] = None,
+                          cursor: Optional[str] = None,
+                          with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """special request adapted for table queries, page and total are fetched by a single statement
+        returns the page of users, their total number (None if with_total is False)
+        and the cursor of the next page"""
+        return _USER_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
 
+    @staticmethod
+    def get_rows_for_export(sort: Optional[str] = None,
+                            order: Optional[str] = None,
+                            _filter: Optional[Dict] = None):
+        """returns the query of flat rows of all users which match given filter conditions, fetched by batches
+        while iterated"""
+        return _USER_LIST.get_rows_for_export(sort, order, _filter)
+
+
+# roles are aggregated by a subquery on aliases, user_role and role being already joined by the user list
+_export_user_role = user_role.alias()
+_export_role = aliased(Role)
+
+USER_EXPORT_COLUMNS = {
+    'email': User.email,
+    'firstname': User.firstname,
+    'lastname': User.lastname,
+    'phone': User.phone,
+    'organization': Organization.name_column(User.organization_id),
+    'roles': select(func.group_concat(_export_role.name, ',')).
+    where(_export_user_role.c.user_id == User.id, _export_user_role.c.role_id == _export_role.id).scalar_subquery()
+}
+
+_USER_LIST = ListQuery(
+    entities=[User],
+    key_column=User.id,
+    joins=[User.roles],
+    options=lambda: [joinedload(User.organization)],
+    filters={
+        'organization_id': equal_filter(User.organization_id),
+        'role': equal_filter(Role.name),
+        'email': search_filter(User.email, user_search.c.email, User.id),
+        'firstname': search_filter(User.firstname, user_search.c.firstname, User.id),
+        'lastname': search_filter(User.lastname, user_search.c.lastname, User.id)
+    },
+    sorts={
+        'email': User.email,
+        'firstname': User.firstname,
+        'lastname': User.lastname
+    },
+    default_sort='email',
+    export_columns=USER_EXPORT_COLUMNS
+)
@@ -1,12 +1,26 @@
 from __future__ import annotations
 from sqlalchemy.orm import joinedload
-from sqlalchemy import and_, desc, or_, not_
-from datetime import datetime, timedelta, date
-from typing import List, Optional, Dict
+from sqlalchemy import and_, or_, not_, exists, select, delete
+from sqlalchemy.dialects.sqlite import insert
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Dict, Sequence, Tuple
 from . import db
-from common.db_model.user import Organization, User
+from .list_query import ListQuery, equal_filter, contains_filter, search_filter
+from .search import user_search, charge_point_search
+from common.db_model.user import Organization, User, USER_EXPORT_COLUMNS
 from common.db_model.address import Address, ZipCode, City
-from common.db_model.charge_point import ChargePoint, ChargePointStatus
+from common.db_model.charge_point import ChargePoint, ChargePointStatus, CHARGE_POINT_EXPORT_COLUMNS
+
+
+# number of values bound to an IN (...) condition, sqlite limits the number of bound parameters of a statement
+# (999 before sqlite 3.32)
+CHUNK_SIZE = 500
+
+
+def chunked(values: Sequence, size: int = CHUNK_SIZE) -> Iterator[Sequence]:
+    """yields successive slices of size values"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 
 class Whitelist(db.Model):
@@ -20,6 +34,9 @@ class Whitelist(db.Model):
     paid_by_organization: bool = db.Column(db.Boolean, nullable=False)
     created_at: date = db.Column(db.Date, nullable=False)
     expires_at: Optional[date] = db.Column(db.Date, nullable=True)
+    # numbers of members, kept current by triggers on whitelist_charge_point and whitelist_user
+    cp_count: int = db.Column(db.Integer, nullable=False, default=0)
+    user_count: int = db.Column(db.Integer, nullable=False, default=0)
 
     def to_list_dict(self) -> Dict:
         """returns a dictionary of this whitelist_user adapted for tables"""
@@ -31,58 +48,38 @@ class Whitelist(db.Model):
             "paid_by_organization": self.paid_by_organization,
             "created_at": self.created_at.isoformat(),
             "expires_at": self.expires_at.isoformat() if self.expires_at else None,
-            "cp_count": len(self.charge_point_links)
+            "cp_count": self.cp_count,
+            "user_count": self.user_count
         }
 
-    @staticmethod
-    def _get_filter_condition(_filter: Optional[Dict] = None):
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        for key, value in _filter.items():
-            if key == 'organization_id':
-                condition = and_(condition, Whitelist.organization_id == value)
-            elif key == 'label':
-                condition = and_(condition, Whitelist.label.ilike(f"%{value.strip()}%"))
-
-        return condition
-
     @staticmethod
     def get_total_for_list(_filter: Optional[Dict] = None) -> int:
         """returns total number of whitelist which match given filter conditions"""
-        condition = Whitelist._get_filter_condition(_filter)
-        return Whitelist.query.filter(condition).count() or 0
+        return _WHITELIST_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list(limit: int = 10,
                          offset: int = 0,
-                         sort: str = 'created_at',
-                         order: str = 'desc',
-                         _filter: Optional[Dict] = None) -> list:
-        """special request adapted for table queries"""
-        condition = Whitelist._get_filter_condition(_filter)
-
-        query = Whitelist.query. \
-            options(joinedload(Whitelist.charge_point_links, innerjoin=False)). \
-            filter(condition)
-
-        if sort == 'label':
-            if order.lower() == 'asc':
-                query = query.order_by(Whitelist.label.asc())
-            else:
-                query = query.order_by(Whitelist.label.desc())
-        elif sort == 'expires_at':
-            if order.lower() == 'asc':
-                query = query.order_by(Whitelist.expires_at.asc())
-            else:
-                query = query.order_by(Whitelist.expires_at.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(Whitelist.created_at.asc())
-            else:
-                query = query.order_by(Whitelist.created_at.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+                         sort: Optional[str] = None,
+                         order: Optional[str] = None,
+                         _filter: Optional[Dict] = None,
+                         cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """special request adapted for table queries
+        returns the page of whitelists and the cursor of the next page"""
+        return _WHITELIST_LIST.get_page(limit, offset, sort, order, _filter, cursor)
+
+    @staticmethod
+    def get_page_for_list(limit: int = 10,
+                          offset: int = 0,
+                          sort: Optional[str] = None,
+                          order: Optional[str] = None,
+                          _filter: Optional[Dict] = None,
+                          cursor: Optional[str] = None,
+                          with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """special request adapted for table queries, page and total are fetched by a single statement
+        returns the page of whitelists, their total number (None if with_total is False)
+        and the cursor of the next page"""
+        return _WHITELIST_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
 
 
 class WhitelistUser(db.Model):
@@ -103,228 +100,114 @@ class WhitelistUser(db.Model):
         }
 
     @staticmethod
-    def _get_filter_condition(_filter: Optional[Dict] = None):
-        """queries intended for getting one user info accross multiple whitelists"""
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        condition = and_(condition, WhitelistChargePoint.whitelist_id == Whitelist.id)
-        condition = and_(condition, WhitelistChargePoint.charge_point_id == ChargePoint.id)
-        condition = and_(condition, WhitelistUser.whitelist_id == Whitelist.id)
-        condition = and_(condition, ChargePoint.status_id == ChargePointStatus.id)
-        condition = and_(condition, ChargePoint.address_id == Address.id)
-        condition = and_(condition, Address.zip_code_id == ZipCode.id)
-        condition = and_(condition, ZipCode.city_id == City.id)
-
-        for key, value in _filter.items():
-            if key == 'user_id':
-                condition = and_(condition, WhitelistUser.user_id == value)
-            elif key == 'whitelist_id':
-                condition = and_(condition, Whitelist.id == value)
-            elif key == 'unexpired_at':
-                condition = and_(condition, or_(WhitelistUser.expires_at.is_(None), WhitelistUser.expires_at >= value))
-                condition = and_(condition, or_(Whitelist.expires_at.is_(None), Whitelist.expires_at >= value))
-            elif key == 'paid_by_organization':
-                condition = and_(condition, Whitelist.paid_by_organization == bool(value))
-            elif key == 'address':
-                condition = and_(condition, Address.label.ilike(f"%{value.strip()}%"))
-            elif key == 'zip_code':
-                condition = and_(condition, ZipCode.code.ilike(f"%{value.strip()}%"))
-            elif key == 'city':
-                condition = and_(condition, City.name.ilike(f"%{value.strip()}%"))
-            elif key == 'status_code':
-                condition = and_(condition, ChargePointStatus.code.ilike(f"%{value.strip()}%"))
-
-        return condition
-
-    @staticmethod
-    def get_total_for_list(_filter: Optional[Dict] = None) -> int:
-        """queries intended for getting one user info accross multiple whitelists"""
-        condition = WhitelistUser._get_filter_condition(_filter)
-        return db.session.query(WhitelistUser, Whitelist, WhitelistChargePoint, ChargePoint,
-                                ChargePointStatus, Address, ZipCode, City). \
-                   filter(condition). \
-                   group_by(ChargePoint.id). \
-                   count() or 0
-
-    @staticmethod
-    def get_all_for_list(limit: int = 10,
-                         offset: int = 0,
-                         sort: str = 'reference',
-                         order: str = 'asc',
-                         _filter: Optional[Dict] = None) -> list:
-        """queries intended for getting one user info accross multiple whitelists"""
-        condition = WhitelistUser._get_filter_condition(_filter)
-
-        query = db.session.query(WhitelistUser, Whitelist, WhitelistChargePoint, ChargePoint,
-                                 ChargePointStatus, Address, ZipCode, City). \
-            options(joinedload(ChargePoint.organization)). \
-            options(joinedload(ChargePoint.status)). \
-            options(joinedload(ChargePoint.address).joinedload(Address.zip_code).joinedload(ZipCode.city)). \
-            filter(condition)
-
-        if sort == 'reference':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-        elif sort == 'address':
-            if order.lower() == 'asc':
-                query = query.order_by(Address.label.asc())
-            else:
-                query = query.order_by(Address.label.desc())
-        elif sort == 'zip_code':
-            if order.lower() == 'asc':
-                query = query.order_by(ZipCode.code.asc())
-            else:
-                query = query.order_by(ZipCode.code.desc())
-        elif sort == 'city':
-            if order.lower() == 'asc':
-                query = query.order_by(City.name.asc())
-            else:
-                query = query.order_by(City.name.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+    def add_users(whitelist: Whitelist, user_emails: Sequence[str],
+                  expires_at: Optional[date]) -> Tuple[Dict[str, str], List[int]]:
+        """adds users of the whitelist organization to the whitelist, or updates the expiry of their access if they
+        already belong to it, emails of unknown users are ignored.
+        Returns email => ADDED or UPDATED and the ids of these users, commit is left to the caller"""
+        results, user_ids, links = {}, [], []
+        for emails in chunked(list(set(user_emails))):
+            rows = db.session.execute(
+                select(User.id, User.email, WhitelistUser.user_id.isnot(None)).
+                outerjoin(WhitelistUser, and_(WhitelistUser.user_id == User.id,
+                                              WhitelistUser.whitelist_id == whitelist.id)).
+                where(User.email.in_(emails), User.organization_id == whitelist.organization_id))
+            for user_id, email, exists_ in rows:
+                results[email] = "UPDATED" if exists_ else "ADDED"
+                user_ids.append(user_id)
+                links.append({'whitelist_id': whitelist.id, 'user_id': user_id, 'expires_at': expires_at})
+        if links:
+            statement = insert(WhitelistUser.__table__).values(created_at=datetime.utcnow().date())
+            statement = statement.on_conflict_do_update(index_elements=['whitelist_id', 'user_id'],
+                                                        set_={'expires_at': statement.excluded.expires_at})
+            db.session.execute(statement, links)
+        return results, user_ids
 
     @staticmethod
-    def _get_filter_condition_for_whitelist(_filter: Optional[Dict] = None):
-        """queries intended for getting users of one whitelist only"""
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        condition = and_(condition, WhitelistUser.user_id == User.id)
-        condition = and_(condition, WhitelistUser.whitelist_id == Whitelist.id)
-
-        for key, value in _filter.items():
-            if key == 'email':
-                condition = and_(condition, User.email.ilike(f"%{value.strip()}%"))
-            if key == 'firstname':
-                condition = and_(condition, User.firstname.ilike(f"%{value.strip()}%"))
-            if key == 'lastname':
-                condition = and_(condition, User.lastname.ilike(f"%{value.strip()}%"))
-            elif key == 'whitelist_id':
-                condition = and_(condition, Whitelist.id == value)
-            elif key == 'unexpired_at':
-                condition = and_(condition, or_(WhitelistUser.expires_at.is_(None), WhitelistUser.expires_at >= value))
-                condition = and_(condition, or_(Whitelist.expires_at.is_(None), Whitelist.expires_at >= value))
-
-        return condition
+    def remove_users(whitelist: Whitelist, user_emails: Sequence[str]) -> Tuple[Dict[str, str], List[int]]:
+        """removes users from the whitelist, emails of users not in the whitelist are ignored.
+        Returns email => REMOVED and the ids of these users, commit is left to the caller"""
+        results, user_ids = {}, []
+        for emails in chunked(list(set(user_emails))):
+            rows = db.session.execute(
+                select(User.id, User.email).
+                where(WhitelistUser.user_id == User.id, WhitelistUser.whitelist_id == whitelist.id,
+                      User.email.in_(emails), User.organization_id == whitelist.organization_id))
+            for user_id, email in rows:
+                results[email] = "REMOVED"
+                user_ids.append(user_id)
+        for ids in chunked(user_ids):
+            db.session.execute(delete(WhitelistUser.__table__).
+                               where(WhitelistUser.whitelist_id == whitelist.id, WhitelistUser.user_id.in_(ids)))
+        return results, user_ids
 
     @staticmethod
     def get_total_for_list_for_whitelist(_filter: Optional[Dict] = None) -> int:
         """queries intended for getting users of one whitelist only"""
-        condition = WhitelistUser._get_filter_condition_for_whitelist(_filter)
-        return db.session.query(WhitelistUser, User, Whitelist). \
-                   filter(condition).count() or 0
+        return _WHITELIST_USER_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list_for_whitelist(limit: int = 10,
                                        offset: int = 0,
-                                       sort: str = 'reference',
-                                       order: str = 'asc',
-                                       _filter: Optional[Dict] = None) -> list:
+                                       sort: Optional[str] = None,
+                                       order: Optional[str] = None,
+                                       _filter: Optional[Dict] = None,
+                                       cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
         """queries intended for getting users of one whitelist only"""
-        condition = WhitelistUser._get_filter_condition_for_whitelist(_filter)
-
-        query = db.session.query(WhitelistUser, User, Whitelist).filter(condition)
-
-        if sort == 'email':
-            if order.lower() == 'asc':
-                query = query.order_by(User.email.asc())
-            else:
-                query = query.order_by(User.email.desc())
-        elif sort == 'firstname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.firstname.asc())
-            else:
-                query = query.order_by(User.firstname.desc())
-        elif sort == 'lastname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.lastname.asc())
-            else:
-                query = query.order_by(User.lastname.desc())
-        elif sort == 'created_at':
-            if order.lower() == 'asc':
-                query = query.order_by(WhitelistUser.created_at.asc())
-            else:
-                query = query.order_by(WhitelistUser.created_at.desc())
-        elif sort == 'expires_at':
-            if order.lower() == 'asc':
-                query = query.order_by(WhitelistUser.expires_at.asc())
-            else:
-                query = query.order_by(WhitelistUser.expires_at.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(WhitelistUser.created_at.asc())
-            else:
-                query = query.order_by(WhitelistUser.created_at.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+        return _WHITELIST_USER_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
     @staticmethod
-    def _get_filter_condition_not_in_whitelist(_filter: Optional[Dict] = None):
-        """queries intended for getting users not in one whitelist only"""
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        for key, value in _filter.items():
-            if key == 'email':
-                condition = and_(condition, User.email.ilike(f"%{value.strip()}%"))
-            if key == 'firstname':
-                condition = and_(condition, User.firstname.ilike(f"%{value.strip()}%"))
-            if key == 'lastname':
-                condition = and_(condition, User.lastname.ilike(f"%{value.strip()}%"))
-            elif key == 'excluded_whitelist_id':
-                # this method is surely not the most optimized but efficient with not too much data
-                user_ids_in_whitelist = db.session.query(WhitelistUser.user_id). \
-                    filter(WhitelistUser.whitelist_id == value).all()
-                user_ids_in_whitelist = list(map(lambda x: x[0], user_ids_in_whitelist))
-                condition = and_(condition, not_(User.id.in_(user_ids_in_whitelist)))
-            elif key == 'organization_id':
-                condition = and_(condition, User.organization_id == value)
-
-        return condition
+    def get_page_for_list_for_whitelist(limit: int = 10,
+                                        offset: int = 0,
+                                        sort: Optional[str] = None,
+                                        order: Optional[str] = None,
+                                        _filter: Optional[Dict] = None,
+                                        cursor: Optional[str] = None,
+                                        with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """queries intended for getting users of one whitelist only
+        page and total (None if with_total is False) are fetched by a single statement"""
+        return _WHITELIST_USER_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
 
     @staticmethod
     def get_total_for_list_not_in_whitelist(_filter: Optional[Dict] = None) -> int:
         """queries intended for getting users not in one whitelist only"""
-        condition = WhitelistUser._get_filter_condition_not_in_whitelist(_filter)
-        return db.session.query(User). \
-                   filter(condition).count() or 0
+        return _NOT_WHITELIST_USER_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list_not_in_whitelist(limit: int = 10,
                                           offset: int = 0,
-                                          sort: str = 'reference',
-                                          order: str = 'asc',
-                                          _filter: Optional[Dict] = None) -> list:
+                                          sort: Optional[str] = None,
+                                          order: Optional[str] = None,
+                                          _filter: Optional[Dict] = None,
+                                          cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
         """queries intended for getting users not in one whitelist only"""
-        condition = WhitelistUser._get_filter_condition_not_in_whitelist(_filter)
+        return _NOT_WHITELIST_USER_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
-        query = db.session.query(User).filter(condition)
+    @staticmethod
+    def get_page_for_list_not_in_whitelist(limit: int = 10,
+                                           offset: int = 0,
+                                           sort: Optional[str] = None,
+                                           order: Optional[str] = None,
+                                           _filter: Optional[Dict] = None,
+                                           cursor: Optional[str] = None,
+                                           with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """queries intended for getting users not in one whitelist only
+        page and total (None if with_total is False) are fetched by a single statement"""
+        return _NOT_WHITELIST_USER_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
 
-        if sort == 'email':
-            if order.lower() == 'asc':
-                query = query.order_by(User.email.asc())
-            else:
-                query = query.order_by(User.email.desc())
-        elif sort == 'firstname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.firstname.asc())
-            else:
-                query = query.order_by(User.firstname.desc())
-        elif sort == 'lastname':
-            if order.lower() == 'asc':
-                query = query.order_by(User.lastname.asc())
-            else:
-                query = query.order_by(User.lastname.desc())
+    @staticmethod
+    def get_rows_for_export_for_whitelist(sort: Optional[str] = None,
+                                          order: Optional[str] = None,
+                                          _filter: Optional[Dict] = None):
+        """queries intended for exporting users of one whitelist only, rows are fetched by batches"""
+        return _WHITELIST_USER_LIST.get_rows_for_export(sort, order, _filter)
 
-        return query.limit(limit).offset(offset).all() or list()
+    @staticmethod
+    def get_rows_for_export_not_in_whitelist(sort: Optional[str] = None,
+                                             order: Optional[str] = None,
+                                             _filter: Optional[Dict] = None):
+        """queries intended for exporting users not in one whitelist only, rows are fetched by batches"""
+        return _NOT_WHITELIST_USER_LIST.get_rows_for_export(sort, order, _filter)
 
 
 class WhitelistChargePoint(db.Model):
@@ -336,177 +219,247 @@ class WhitelistChargePoint(db.Model):
     created_at: date = db.Column(db.Date, nullable=False)
 
     @staticmethod
-    def _get_filter_condition_for_whitelist(_filter: Optional[Dict] = None):
-        """queries intended for getting charge points of one whitelist only"""
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        condition = and_(condition, or_(WhitelistChargePoint.charge_point_id == ChargePoint.id,
-                                        WhitelistChargePoint.charge_point_id.is_(None)))
-        condition = and_(condition, ChargePoint.status_id == ChargePointStatus.id)
-        condition = and_(condition, ChargePoint.address_id == Address.id)
-        condition = and_(condition, Address.zip_code_id == ZipCode.id)
-        condition = and_(condition, ZipCode.city_id == City.id)
-
-        for key, value in _filter.items():
-            if key == 'whitelist_id':
-                condition = and_(condition, WhitelistChargePoint.whitelist_id == value)
-            elif key == 'excluded_whitelist_id':
-                # this method is surely not the most optimized but efficient with not too much data
-                cp_ids_in_whitelist = db.session.query(WhitelistChargePoint.charge_point_id). \
-                    filter(WhitelistChargePoint.whitelist_id == value).all()
-                cp_ids_in_whitelist = list(map(lambda x: x[0], cp_ids_in_whitelist))
-                condition = and_(condition, not_(ChargePoint.id.in_(cp_ids_in_whitelist)))
-            elif key == 'organization_id':
-                condition = and_(condition, ChargePoint.organization_id == value)
-            elif key == 'reference':
-                condition = and_(condition, ChargePoint.reference.ilike(f"%{value.strip()}%"))
-            elif key == 'address':
-                condition = and_(condition, Address.label.ilike(f"%{value.strip()}%"))
-            elif key == 'zip_code':
-                condition = and_(condition, ZipCode.code.ilike(f"%{value.strip()}%"))
-            elif key == 'city':
-                condition = and_(condition, City.name.ilike(f"%{value.strip()}%"))
-            elif key == 'status_code':
-                condition = and_(condition, ChargePointStatus.code.ilike(f"%{value.strip()}%"))
-
-        return condition
+    def add_charge_points(whitelist: Whitelist, references: Sequence[str]) -> Tuple[Dict[str, str], List[int]]:
+        """adds charge points of the whitelist organization to the whitelist, references of unknown charge points or
+        of charge points already in the whitelist are ignored.
+        Returns reference => ADDED and the ids of all found charge points, commit is left to the caller"""
+        results, charge_point_ids, links = {}, [], []
+        for chunk in chunked(list(set(references))):
+            rows = db.session.execute(
+                select(ChargePoint.id, ChargePoint.reference, WhitelistChargePoint.charge_point_id.isnot(None)).
+                outerjoin(WhitelistChargePoint, and_(WhitelistChargePoint.charge_point_id == ChargePoint.id,
+                                                     WhitelistChargePoint.whitelist_id == whitelist.id)).
+                where(ChargePoint.reference.in_(chunk), ChargePoint.organization_id == whitelist.organization_id))
+            for charge_point_id, reference, exists_ in rows:
+                charge_point_ids.append(charge_point_id)
+                if not exists_:
+                    results[reference] = "ADDED"
+                    links.append({'whitelist_id': whitelist.id, 'charge_point_id': charge_point_id})
+        if links:
+            statement = insert(WhitelistChargePoint.__table__).values(created_at=datetime.utcnow().date())
+            db.session.execute(statement.on_conflict_do_nothing(index_elements=['whitelist_id', 'charge_point_id']),
+                               links)
+        return results, charge_point_ids
+
+    @staticmethod
+    def remove_charge_points(whitelist: Whitelist, references: Sequence[str]) -> Tuple[Dict[str, str], List[int]]:
+        """removes charge points from the whitelist, references of charge points not in the whitelist are ignored.
+        Returns reference => REMOVED and the ids of these charge points, commit is left to the caller"""
+        results, charge_point_ids = {}, []
+        for chunk in chunked(list(set(references))):
+            rows = db.session.execute(
+                select(ChargePoint.id, ChargePoint.reference).
+                where(WhitelistChargePoint.charge_point_id == ChargePoint.id,
+                      WhitelistChargePoint.whitelist_id == whitelist.id,
+                      ChargePoint.reference.in_(chunk), ChargePoint.organization_id == whitelist.organization_id))
+            for charge_point_id, reference in rows:
+                results[reference] = "REMOVED"
+                charge_point_ids.append(charge_point_id)
+        for ids in chunked(charge_point_ids):
+            db.session.execute(delete(WhitelistChargePoint.__table__).
+                               where(WhitelistChargePoint.whitelist_id == whitelist.id,
+                                     WhitelistChargePoint.charge_point_id.in_(ids)))
+        return results, charge_point_ids
 
     @staticmethod
     def get_total_for_list_for_whitelist(_filter: Optional[Dict] = None) -> int:
         """queries intended for getting charge points of one whitelist only"""
-        condition = WhitelistChargePoint._get_filter_condition_for_whitelist(_filter)
-        return db.session.query(ChargePoint, ChargePointStatus, WhitelistChargePoint, Address, ZipCode, City). \
-                   filter(condition).count() or 0
+        return _WHITELIST_CHARGE_POINT_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list_for_whitelist(limit: int = 10,
                                        offset: int = 0,
-                                       sort: str = 'reference',
-                                       order: str = 'asc',
-                                       _filter: Optional[Dict] = None) -> list:
+                                       sort: Optional[str] = None,
+                                       order: Optional[str] = None,
+                                       _filter: Optional[Dict] = None,
+                                       cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
         """queries intended for getting charge points of one whitelist only"""
-        condition = WhitelistChargePoint._get_filter_condition_for_whitelist(_filter)
-
-        query = db.session.query(ChargePoint, ChargePointStatus, WhitelistChargePoint,
-                                 Address, ZipCode, City).filter(condition)
-
-        if sort == 'reference':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-        elif sort == 'status_code':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePointStatus.code.asc())
-            else:
-                query = query.order_by(ChargePointStatus.code.desc())
-        elif sort == 'address':
-            if order.lower() == 'asc':
-                query = query.order_by(Address.label.asc())
-            else:
-                query = query.order_by(Address.label.desc())
-        elif sort == 'zip_code':
-            if order.lower() == 'asc':
-                query = query.order_by(ZipCode.code.asc())
-            else:
-                query = query.order_by(ZipCode.code.desc())
-        elif sort == 'city':
-            if order.lower() == 'asc':
-                query = query.order_by(City.name.asc())
-            else:
-                query = query.order_by(City.name.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+        return _WHITELIST_CHARGE_POINT_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
     @staticmethod
-    def _get_filter_condition_not_in_whitelist(_filter: Optional[Dict] = None):
-        """queries intended for getting charge points not in one whitelist only"""
-        condition = and_(True, True)
-        _filter = _filter or {}
-
-        condition = and_(condition, ChargePoint.status_id == ChargePointStatus.id)
-        condition = and_(condition, ChargePoint.address_id == Address.id)
-        condition = and_(condition, Address.zip_code_id == ZipCode.id)
-        condition = and_(condition, ZipCode.city_id == City.id)
-
-        for key, value in _filter.items():
-            if key == 'excluded_whitelist_id':
-                # this method is surely not the most optimized but efficient with not too much data
-                cp_ids_in_whitelist = db.session.query(WhitelistChargePoint.charge_point_id). \
-                    filter(WhitelistChargePoint.whitelist_id == value).all()
-                cp_ids_in_whitelist = list(map(lambda x: x[0], cp_ids_in_whitelist))
-                condition = and_(condition, not_(ChargePoint.id.in_(cp_ids_in_whitelist)))
-            elif key == 'organization_id':
-                condition = and_(condition, ChargePoint.organization_id == value)
-            elif key == 'reference':
-                condition = and_(condition, ChargePoint.reference.ilike(f"%{value.strip()}%"))
-            elif key == 'address':
-                condition = and_(condition, Address.label.ilike(f"%{value.strip()}%"))
-            elif key == 'zip_code':
-                condition = and_(condition, ZipCode.code.ilike(f"%{value.strip()}%"))
-            elif key == 'city':
-                condition = and_(condition, City.name.ilike(f"%{value.strip()}%"))
-            elif key == 'status_code':
-                condition = and_(condition, ChargePointStatus.code.ilike(f"%{value.strip()}%"))
-
-        return condition
+    def get_page_for_list_for_whitelist(limit: int = 10,
+                                        offset: int = 0,
+                                        sort: Optional[str] = None,
+                                        order: Optional[str] = None,
+                                        _filter: Optional[Dict] = None,
+                                        cursor: Optional[str] = None,
+                                        with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """queries intended for getting charge points of one whitelist only
+        page and total (None if with_total is False) are fetched by a single statement"""
+        return _WHITELIST_CHARGE_POINT_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor, with_total)
 
     @staticmethod
     def get_total_for_list_not_in_whitelist(_filter: Optional[Dict] = None) -> int:
-        """queries intended for getting charge points of one whitelist only"""
-        condition = WhitelistChargePoint._get_filter_condition_not_in_whitelist(_filter)
-        return db.session.query(ChargePoint, ChargePointStatus, Address, ZipCode, City). \
-                   filter(condition).count() or 0
+        """queries intended for getting charge points not in one whitelist only"""
+        return _NOT_WHITELIST_CHARGE_POINT_LIST.get_total(_filter)
 
     @staticmethod
     def get_all_for_list_not_in_whitelist(limit: int = 10,
                                           offset: int = 0,
-                                          sort: str = 'reference',
-                                          order: str = 'asc',
-                                          _filter: Optional[Dict] = None) -> list:
+                                          sort: Optional[str] = None,
+                                          order: Optional[str] = None,
+                                          _filter: Optional[Dict] = None,
+                                          cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
         """queries intended for getting charge points not in one whitelist only"""
-        condition = WhitelistChargePoint._get_filter_condition_not_in_whitelist(_filter)
-
-        query = db.session.query(ChargePoint, ChargePointStatus,
-                                 Address, ZipCode, City).filter(condition)
-
-        if sort == 'reference':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-        elif sort == 'status_code':
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePointStatus.code.asc())
-            else:
-                query = query.order_by(ChargePointStatus.code.desc())
-        elif sort == 'address':
-            if order.lower() == 'asc':
-                query = query.order_by(Address.label.asc())
-            else:
-                query = query.order_by(Address.label.desc())
-        elif sort == 'zip_code':
-            if order.lower() == 'asc':
-                query = query.order_by(ZipCode.code.asc())
-            else:
-                query = query.order_by(ZipCode.code.desc())
-        elif sort == 'city':
-            if order.lower() == 'asc':
-                query = query.order_by(City.name.asc())
-            else:
-                query = query.order_by(City.name.desc())
-        else:
-            if order.lower() == 'asc':
-                query = query.order_by(ChargePoint.reference.asc())
-            else:
-                query = query.order_by(ChargePoint.reference.desc())
-
-        return query.limit(limit).offset(offset).all() or list()
+        return _NOT_WHITELIST_CHARGE_POINT_LIST.get_page(limit, offset, sort, order, _filter, cursor)
 
+    @staticmethod
+    def get_page_for_list_not_in_whitelist(limit: int = 10,
+                                           offset: int = 0,
+                                           sort: Optional[str] = None,
+                                           order: Optional[str] = None,
+                                           _filter: Optional[Dict] = None,
+                                           cursor: Optional[str] = None,
+                                           with_total: bool = True) -> Tuple[list, Optional[int], Optional[str]]:
+        """queries intended for getting charge points not in one whitelist only
+        page and total (None if with_total is False) are fetched by a single statement"""
+        return _NOT_WHITELIST_CHARGE_POINT_LIST.get_page_and_total(limit, offset, sort, order, _filter, cursor,
+                                                                   with_total)
+
+    @staticmethod
+    def get_rows_for_export_for_whitelist(sort: Optional[str] = None,
+                                          order: Optional[str] = None,
+                                          _filter: Optional[Dict] = None):
+        """queries intended for exporting charge points of one whitelist only, rows are fetched by batches"""
+        return _WHITELIST_CHARGE_POINT_LIST.get_rows_for_export(sort, order, _filter)
 
+    @staticmethod
+    def get_rows_for_export_not_in_whitelist(sort: Optional[str] = None,
+                                             order: Optional[str] = None,
+                                             _filter: Optional[Dict] = None):
+        """queries intended for exporting charge points not in one whitelist only, rows are fetched by batches"""
+        return _NOT_WHITELIST_CHARGE_POINT_LIST.get_rows_for_export(sort, order, _filter)
+
+
+def _unexpired_whitelist_user_filter(value):
+    """whitelist and user access must not be expired at date value"""
+    return and_(or_(WhitelistUser.expires_at.is_(None), WhitelistUser.expires_at >= value),
+                or_(Whitelist.expires_at.is_(None), Whitelist.expires_at >= value))
+
+
+def _excluded_whitelist_user_filter(value):
+    """user must not belong to whitelist with id value (correlated anti-join)"""
+    return not_(exists().where(and_(WhitelistUser.user_id == User.id, WhitelistUser.whitelist_id == value)))
+
+
+def _excluded_whitelist_charge_point_filter(value):
+    """charge point must not belong to whitelist with id value (correlated anti-join)"""
+    return not_(exists().where(and_(WhitelistChargePoint.charge_point_id == ChargePoint.id,
+                                    WhitelistChargePoint.whitelist_id == value)))
+
+
+_WHITELIST_LIST = ListQuery(
+    entities=[Whitelist],
+    key_column=Whitelist.id,
+    options=lambda: [joinedload(Whitelist.organization)],
+    filters={
+        'organization_id': equal_filter(Whitelist.organization_id),
+        'label': contains_filter(Whitelist.label)
+    },
+    sorts={
+        'created_at': Whitelist.created_at,
+        'label': Whitelist.label,
+        'expires_at': Whitelist.expires_at,
+        'cp_count': Whitelist.cp_count,
+        'user_count': Whitelist.user_count
+    },
+    default_sort='created_at',
+    default_order='desc'
+)
+
+_USER_FILTERS = {
+    'email': search_filter(User.email, user_search.c.email, User.id),
+    'firstname': search_filter(User.firstname, user_search.c.firstname, User.id),
+    'lastname': search_filter(User.lastname, user_search.c.lastname, User.id)
+}
+
+_USER_SORTS = {
+    'email': User.email,
+    'firstname': User.firstname,
+    'lastname': User.lastname
+}
+
+_WHITELIST_USER_LIST = ListQuery(
+    entities=[WhitelistUser, User, Whitelist],
+    key_column=User.id,
+    conditions=[WhitelistUser.user_id == User.id,
+                WhitelistUser.whitelist_id == Whitelist.id],
+    filters={
+        **_USER_FILTERS,
+        'whitelist_id': equal_filter(Whitelist.id),
+        'unexpired_at': _unexpired_whitelist_user_filter
+    },
+    sorts={
+        **_USER_SORTS,
+        'created_at': WhitelistUser.created_at,
+        'expires_at': WhitelistUser.expires_at
+    },
+    default_sort='created_at',
+    default_order='desc',
+    export_columns={
+        **USER_EXPORT_COLUMNS,
+        'access_created_at': WhitelistUser.created_at,
+        'access_expires_at': WhitelistUser.expires_at
+    }
+)
+
+_NOT_WHITELIST_USER_LIST = ListQuery(
+    entities=[User],
+    key_column=User.id,
+    filters={
+        **_USER_FILTERS,
+        'excluded_whitelist_id': _excluded_whitelist_user_filter,
+        'organization_id': equal_filter(User.organization_id)
+    },
+    sorts=_USER_SORTS,
+    default_sort='email',
+    export_columns=USER_EXPORT_COLUMNS
+)
+
+_CHARGE_POINT_CONDITIONS = [
+    ChargePoint.status_id == ChargePointStatus.id,
+    ChargePoint.address_id == Address.id,
+    Address.zip_code_id == ZipCode.id,
+    ZipCode.city_id == City.id
+]
+
+_CHARGE_POINT_FILTERS = {
+    'excluded_whitelist_id': _excluded_whitelist_charge_point_filter,
+    'organization_id': equal_filter(ChargePoint.organization_id),
+    'reference': search_filter(ChargePoint.reference, charge_point_search.c.reference, ChargePoint.id),
+    'address': search_filter(Address.label, charge_point_search.c.address, ChargePoint.id),
+    'zip_code': search_filter(ZipCode.code, charge_point_search.c.zip_code, ChargePoint.id),
+    'city': search_filter(City.name, charge_point_search.c.city, ChargePoint.id),
+    'status_code': search_filter(ChargePointStatus.code, charge_point_search.c.status_code, ChargePoint.id)
+}
+
+_CHARGE_POINT_SORTS = {
+    'reference': ChargePoint.reference,
+    'status_code': ChargePointStatus.code,
+    'address': Address.label,
+    'zip_code': ZipCode.code,
+    'city': City.name
+}
+
+_WHITELIST_CHARGE_POINT_LIST = ListQuery(
+    entities=[ChargePoint, ChargePointStatus, WhitelistChargePoint, Address, ZipCode, City],
+    key_column=ChargePoint.id,
+    conditions=[WhitelistChargePoint.charge_point_id == ChargePoint.id, *_CHARGE_POINT_CONDITIONS],
+    filters={
+        **_CHARGE_POINT_FILTERS,
+        'whitelist_id': equal_filter(WhitelistChargePoint.whitelist_id)
+    },
+    sorts=_CHARGE_POINT_SORTS,
+    default_sort='reference',
+    export_columns=CHARGE_POINT_EXPORT_COLUMNS
+)
+
+_NOT_WHITELIST_CHARGE_POINT_LIST = ListQuery(
+    entities=[ChargePoint, ChargePointStatus, Address, ZipCode, City],
+    key_column=ChargePoint.id,
+    conditions=_CHARGE_POINT_CONDITIONS,
+    filters=_CHARGE_POINT_FILTERS,
+    sorts=_CHARGE_POINT_SORTS,
+    default_sort='reference',
+    export_columns=CHARGE_POINT_EXPORT_COLUMNS
+)
@@ -0,0 +1,112 @@
+"""whitelist deletion : a whitelist, its members and the effective access rows it grants are deleted by set-based
+statements inside a single transaction.
+Very large whitelists can be deleted asynchronously, a WhitelistDeletion row being the job handle : members are first
+deleted by chunks in short transactions, so that the sqlite writer lock is released between chunks,
+then the whitelist itself"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, or_, text, update
+
+from . import db
+from common.db_model.whitelist import Whitelist, WhitelistUser, WhitelistChargePoint
+from common.db_model.effective_access import EffectiveAccess
+
+# tables of rows referencing a whitelist, in deletion order
+_MEMBER_TABLES = (EffectiveAccess.__table__, WhitelistUser.__table__, WhitelistChargePoint.__table__)
+
+
+class WhitelistDeletion(db.Model):
+    """asynchronous deletion of a whitelist, kept after the whitelist is deleted"""
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    __tablename__ = 'whitelist_deletion'
+    id: int = db.Column(db.Integer, primary_key=True)
+    whitelist_id: int = db.Column(db.Integer, nullable=False)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), nullable=False)
+    label: str = db.Column(db.String, nullable=False)
+    status: str = db.Column(db.String, nullable=False)
+    created_at: datetime = db.Column(db.DateTime, nullable=False)
+    finished_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+    # last progress of the thread running the deletion, None until a thread claims it
+    heartbeat_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> Dict:
+        """returns a dictionary of this whitelist deletion"""
+
+        return {
+            "id": self.id,
+            "whitelist_id": self.whitelist_id,
+            "label": self.label,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    @staticmethod
+    def get_by_id(_id: int) -> Optional[WhitelistDeletion]:
+        return WhitelistDeletion.query.filter_by(id=_id).one_or_none()
+
+    @staticmethod
+    def get_pending(whitelist_id: int) -> Optional[WhitelistDeletion]:
+        """returns the pending deletion of a whitelist if any"""
+        return WhitelistDeletion.query.filter_by(whitelist_id=whitelist_id, status=WhitelistDeletion.PENDING).first()
+
+    @staticmethod
+    def claim(deletion_id: int, stalled_after: timedelta) -> bool:
+        """claims a pending deletion for the calling thread if no thread of any worker ran it within stalled_after,
+        returns True if it was claimed. commit is left to the caller"""
+        now = datetime.utcnow()
+        table = WhitelistDeletion.__table__
+        result = db.session.execute(update(table).
+                                    where(table.c.id == deletion_id,
+                                          table.c.status == WhitelistDeletion.PENDING,
+                                          or_(table.c.heartbeat_at.is_(None),
+                                              table.c.heartbeat_at < now - stalled_after)).
+                                    values(heartbeat_at=now))
+        return result.rowcount == 1
+
+    @staticmethod
+    def beat(deletion_id: int):
+        """records the progress of the thread running a deletion, commit is left to the caller"""
+        table = WhitelistDeletion.__table__
+        db.session.execute(update(table).where(table.c.id == deletion_id).values(heartbeat_at=datetime.utcnow()))
+
+    @staticmethod
+    def create(whitelist: Whitelist) -> WhitelistDeletion:
+        """registers a pending deletion of whitelist, commit is left to the caller"""
+        m_deletion = WhitelistDeletion()
+        m_deletion.whitelist_id = whitelist.id
+        m_deletion.organization_id = whitelist.organization_id
+        m_deletion.label = whitelist.label
+        m_deletion.status = WhitelistDeletion.PENDING
+        m_deletion.created_at = datetime.utcnow()
+        db.session.add(m_deletion)
+        return m_deletion
+
+
+def delete_whitelist(whitelist_id: int):
+    """deletes a whitelist with its members and access rows, its pending deletions are marked as done.
+    commit is left to the caller"""
+    for table in _MEMBER_TABLES:
+        db.session.execute(delete(table).where(table.c.whitelist_id == whitelist_id))
+    db.session.execute(delete(Whitelist.__table__).where(Whitelist.__table__.c.id == whitelist_id))
+    db.session.execute(update(WhitelistDeletion.__table__).
+                       where(WhitelistDeletion.__table__.c.whitelist_id == whitelist_id,
+                             WhitelistDeletion.__table__.c.status == WhitelistDeletion.PENDING).
+                       values(status=WhitelistDeletion.DONE, finished_at=datetime.utcnow()))
+
+
+def delete_whitelist_members_chunk(whitelist_id: int, chunk_size: int) -> int:
+    """deletes at most chunk_size rows referencing a whitelist and returns the number of deleted rows,
+    0 once all members and access rows are deleted. commit is left to the caller"""
+    for table in _MEMBER_TABLES:
+        result = db.session.execute(
+            text(f"DELETE FROM {table.name} WHERE rowid IN "
+                 f"(SELECT rowid FROM {table.name} WHERE whitelist_id = :whitelist_id LIMIT :limit)"),
+            {'whitelist_id': whitelist_id, 'limit': chunk_size})
+        if result.rowcount:
+            return result.rowcount
+    return 0
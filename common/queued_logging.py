@@ -0,0 +1,51 @@
+"""non-blocking logging : records of a logger are put in a queue by the calling threads and handled
+by a listener thread, so callers never wait for file I/O"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional
+
+
+class QueuedLogPipeline:
+    """attaches a queue handler to the named logger, records are handled by the handler returned by
+    handler_factory in a listener thread.
+    The listener is started on first use in each process since threads do not survive a fork,
+    queued records are written at exit"""
+
+    def __init__(self, logger_name: str, handler_factory: Callable[[], logging.Handler], level: int = logging.DEBUG):
+        self._queue = queue.Queue(-1)
+        self._handler_factory = handler_factory
+        self._listener: Optional[QueueListener] = None
+        self._listener_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(logger_name)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        self.logger.addHandler(QueueHandler(self._queue))
+        atexit.register(self.stop)
+
+    def ensure_started(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener = QueueListener(self._queue, self._handler_factory())
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def stop(self):
+        """handles all queued records then closes the handler"""
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                # waits for the queue to be drained rather than for the listener thread :
+                # joining a green thread may hang in processes forked by the eventlet server
+                self._listener.enqueue_sentinel()
+                self._queue.join()
+                for handler in self._listener.handlers:
+                    handler.close()
+            self._listener = None
+            self._listener_pid = None
@@ -4,16 +4,10 @@ import os
 import eventlet
 import click
 from dotenv import load_dotenv
-# project imports
-from api.application import create_app
 
 
-@click.command()
-@click.option('--host', default='127.0.0.1', help='Host ip address')
-@click.option('--port', default=8000, help='Access port')
-def start_server(host, port):
-    """configure and create the test api server"""
-    # load .env files if any
+def init_directories():
+    """load .env files if any and create log and data directories"""
     load_dotenv()
 
     log_filepath = os.environ.get('LOG_FILEPATH', './logs')
@@ -23,12 +17,47 @@ def start_server(host, port):
     if not os.path.exists(data_filepath):
         os.mkdir(data_filepath)
 
+
+@click.group(invoke_without_command=True)
+@click.option('--host', default='127.0.0.1', help='Host ip address')
+@click.option('--port', default=8000, help='Access port')
+@click.pass_context
+def start_server(ctx, host, port):
+    """configure and create the test api server, use the serve command for production"""
+    ctx.obj = {'host': host, 'port': port}
+    if ctx.invoked_subcommand is not None:
+        return
+    init_directories()
+
     eventlet.monkey_patch(socket=False)
+    # project imports
+    from api.application import create_app
     # create flask app object
     application = create_app()
     # run the server
     application.run(host=host, port=port)
 
 
+@start_server.command()
+@click.option('--workers', default=1, help='Number of worker processes')
+@click.option('--backlog', default=1024, help='Maximum number of pending connections')
+@click.option('--max-requests', default=0, help='Number of requests after which a worker is replaced, 0 for never')
+@click.option('--max-connections', default=1000, help='Maximum number of concurrent connections per worker')
+@click.pass_context
+def serve(ctx, workers, backlog, max_requests, max_connections):
+    """serve the api with an eventlet wsgi server in pre-forked worker processes"""
+    init_directories()
+
+    # sockets, threads and locks must be green before any project or third-party module is imported
+    eventlet.monkey_patch()
+    # project imports
+    from api.application import create_app
+    from api.server import serve as serve_application
+    # the application is created before forking so that workers share its memory pages
+    application = create_app()
+    serve_application(application, ctx.obj['host'], ctx.obj['port'], workers, backlog, max_requests,
+                      max_connections)
+
+
 if __name__ == '__main__':
     start_server()
@@ -1,4 +1,5 @@
 -- this script list all table creations and initial data for creating start.db
+-- it creates the latest schema version, older databases are upgraded by the scripts of sql/upgrade
 
 -- ############ User tables ###########
 -- tables creation (user)
@@ -7,9 +8,11 @@ id INTEGER PRIMARY KEY AUTOINCREMENT,
 name VARCHAR(30) UNIQUE NOT NULL
 );
 
+-- data_version is the version of the data of the organization, derived into ETags of list and info endpoints
 CREATE TABLE organization(
 id INTEGER PRIMARY KEY AUTOINCREMENT,
-name VARCHAR(50) UNIQUE NOT NULL
+name VARCHAR(50) UNIQUE NOT NULL,
+data_version INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE user(
@@ -23,6 +26,10 @@ organization_id INTEGER NOT NULL,
 FOREIGN KEY(organization_id) REFERENCES organization(id)
 );
 
+CREATE INDEX user_organization_email_idx ON user(organization_id, email);
+CREATE INDEX user_organization_firstname_idx ON user(organization_id, firstname);
+CREATE INDEX user_organization_lastname_idx ON user(organization_id, lastname);
+
 CREATE TABLE user_role(
 user_id INTEGER NOT NULL,
 role_id INTEGER NOT NULL,
@@ -31,6 +38,27 @@ FOREIGN KEY(role_id) REFERENCES role(id),
 UNIQUE(user_id, role_id)
 );
 
+-- trigram full text search shadow index of user fields filtered by substring
+-- users : external content table reading its values from user, rowid is user.id
+CREATE VIRTUAL TABLE user_search USING fts5(
+email, firstname, lastname, content='user', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER user_search_insert AFTER INSERT ON user BEGIN
+INSERT INTO user_search(rowid, email, firstname, lastname) VALUES (new.id, new.email, new.firstname, new.lastname);
+END;
+
+CREATE TRIGGER user_search_delete AFTER DELETE ON user BEGIN
+INSERT INTO user_search(user_search, rowid, email, firstname, lastname)
+VALUES ('delete', old.id, old.email, old.firstname, old.lastname);
+END;
+
+CREATE TRIGGER user_search_update AFTER UPDATE OF email, firstname, lastname ON user BEGIN
+INSERT INTO user_search(user_search, rowid, email, firstname, lastname)
+VALUES ('delete', old.id, old.email, old.firstname, old.lastname);
+INSERT INTO user_search(rowid, email, firstname, lastname) VALUES (new.id, new.email, new.firstname, new.lastname);
+END;
+
 -- data insertion (user)
 INSERT INTO role(name) VALUES
 ('administrator'),
@@ -90,6 +118,29 @@ longitude DECIMAL(10,7) NOT NULL,
 FOREIGN KEY(zip_code_id) REFERENCES zip_code(id)
 );
 
+-- spatial index of address coordinates, looked up by the nearby charge points list
+-- r*tree of points (min = max) kept in sync with address by triggers, id is address.id.
+-- r*tree coordinates are 32 bits floats rounded outwards, so a box query never misses a point inside the box
+CREATE VIRTUAL TABLE address_location USING rtree(
+id, min_latitude, max_latitude, min_longitude, max_longitude
+);
+
+CREATE TRIGGER address_location_insert AFTER INSERT ON address BEGIN
+INSERT INTO address_location(id, min_latitude, max_latitude, min_longitude, max_longitude)
+VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+
+CREATE TRIGGER address_location_delete AFTER DELETE ON address BEGIN
+DELETE FROM address_location WHERE id = old.id;
+END;
+
+CREATE TRIGGER address_location_update AFTER UPDATE OF latitude, longitude ON address BEGIN
+UPDATE address_location
+SET min_latitude = new.latitude, max_latitude = new.latitude,
+min_longitude = new.longitude, max_longitude = new.longitude
+WHERE id = new.id;
+END;
+
 -- data insertion (address)
 INSERT INTO city(name) VALUES
 ('Montrouge'),
@@ -131,6 +182,240 @@ FOREIGN KEY(organization_id) REFERENCES organization(id),
 FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
 );
 
+CREATE INDEX charge_point_organization_reference_idx ON charge_point(organization_id, reference);
+CREATE INDEX charge_point_organization_status_idx ON charge_point(organization_id, status_id);
+CREATE INDEX charge_point_address_idx ON charge_point(address_id);
+
+-- trigram full text search shadow index of charge point fields filtered by substring
+-- charge points : display fields come from joined tables so the shadow table stores its own copy,
+-- rowid is charge_point.id
+CREATE VIRTUAL TABLE charge_point_search USING fts5(
+reference, status_code, address, zip_code, city, tokenize='trigram'
+);
+
+CREATE TRIGGER charge_point_search_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_search(rowid, reference, status_code, address, zip_code, city)
+SELECT new.id, new.reference, charge_point_status.code, address.label, zip_code.code, city.name
+FROM charge_point_status, address
+JOIN zip_code ON zip_code.id = address.zip_code_id
+JOIN city ON city.id = zip_code.city_id
+WHERE charge_point_status.id = new.status_id AND address.id = new.address_id;
+END;
+
+CREATE TRIGGER charge_point_search_delete AFTER DELETE ON charge_point BEGIN
+DELETE FROM charge_point_search WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER charge_point_search_update AFTER UPDATE OF reference, status_id, address_id
+ON charge_point BEGIN
+UPDATE charge_point_search SET
+reference = new.reference,
+status_code = (SELECT code FROM charge_point_status WHERE id = new.status_id),
+address = (SELECT label FROM address WHERE id = new.address_id),
+zip_code = (SELECT zip_code.code FROM address JOIN zip_code ON zip_code.id = address.zip_code_id
+            WHERE address.id = new.address_id),
+city = (SELECT city.name FROM address JOIN zip_code ON zip_code.id = address.zip_code_id
+        JOIN city ON city.id = zip_code.city_id WHERE address.id = new.address_id)
+WHERE rowid = new.id;
+END;
+
+-- referential tables are rarely updated, their changes are propagated to charge points using them
+CREATE TRIGGER charge_point_search_status_update AFTER UPDATE OF code ON charge_point_status BEGIN
+UPDATE charge_point_search SET status_code = new.code
+WHERE rowid IN (SELECT id FROM charge_point WHERE status_id = new.id);
+END;
+
+CREATE TRIGGER charge_point_search_address_update AFTER UPDATE OF label, zip_code_id ON address BEGIN
+UPDATE charge_point_search SET
+address = new.label,
+zip_code = (SELECT code FROM zip_code WHERE id = new.zip_code_id),
+city = (SELECT city.name FROM zip_code JOIN city ON city.id = zip_code.city_id WHERE zip_code.id = new.zip_code_id)
+WHERE rowid IN (SELECT id FROM charge_point WHERE address_id = new.id);
+END;
+
+CREATE TRIGGER charge_point_search_zip_code_update AFTER UPDATE OF code, city_id ON zip_code BEGIN
+UPDATE charge_point_search SET
+zip_code = new.code,
+city = (SELECT name FROM city WHERE id = new.city_id)
+WHERE rowid IN (SELECT charge_point.id FROM charge_point JOIN address ON address.id = charge_point.address_id
+                WHERE address.zip_code_id = new.id);
+END;
+
+CREATE TRIGGER charge_point_search_city_update AFTER UPDATE OF name ON city BEGIN
+UPDATE charge_point_search SET city = new.name
+WHERE rowid IN (SELECT charge_point.id FROM charge_point JOIN address ON address.id = charge_point.address_id
+                JOIN zip_code ON zip_code.id = address.zip_code_id WHERE zip_code.city_id = new.id);
+END;
+
+-- charge point counters by organization and status, kept current by triggers on charge_point
+-- rows are never deleted, counters of a status going back to 0 are kept for the history
+CREATE TABLE charge_point_status_count(
+organization_id INTEGER NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+PRIMARY KEY(organization_id, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+-- daily snapshots of the counters : the snapshot of a day is the last value of the counter that day,
+-- days without any change of a counter have no snapshot, its value is the one of the previous snapshot
+CREATE TABLE charge_point_status_snapshot(
+organization_id INTEGER NOT NULL,
+day TEXT NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+PRIMARY KEY(organization_id, day, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER charge_point_status_snapshot_insert AFTER INSERT ON charge_point_status_count BEGIN
+INSERT INTO charge_point_status_snapshot(organization_id, day, status_id, cp_count)
+VALUES (new.organization_id, date('now'), new.status_id, new.cp_count)
+ON CONFLICT(organization_id, day, status_id) DO UPDATE SET cp_count = excluded.cp_count;
+END;
+
+CREATE TRIGGER charge_point_status_snapshot_update AFTER UPDATE OF cp_count
+ON charge_point_status_count BEGIN
+INSERT INTO charge_point_status_snapshot(organization_id, day, status_id, cp_count)
+VALUES (new.organization_id, date('now'), new.status_id, new.cp_count)
+ON CONFLICT(organization_id, day, status_id) DO UPDATE SET cp_count = excluded.cp_count;
+END;
+
+CREATE TRIGGER charge_point_status_count_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_status_count(organization_id, status_id, cp_count)
+VALUES (new.organization_id, new.status_id, 1)
+ON CONFLICT(organization_id, status_id) DO UPDATE SET cp_count = cp_count + 1;
+END;
+
+CREATE TRIGGER charge_point_status_count_delete AFTER DELETE ON charge_point BEGIN
+UPDATE charge_point_status_count SET cp_count = cp_count - 1
+WHERE organization_id = old.organization_id AND status_id = old.status_id;
+END;
+
+CREATE TRIGGER charge_point_status_count_update AFTER UPDATE OF organization_id, status_id
+ON charge_point WHEN old.organization_id != new.organization_id OR old.status_id != new.status_id BEGIN
+UPDATE charge_point_status_count SET cp_count = cp_count - 1
+WHERE organization_id = old.organization_id AND status_id = old.status_id;
+INSERT INTO charge_point_status_count(organization_id, status_id, cp_count)
+VALUES (new.organization_id, new.status_id, 1)
+ON CONFLICT(organization_id, status_id) DO UPDATE SET cp_count = cp_count + 1;
+END;
+
+-- charge points are written by imports outside the api, their changes bump the data version of their organization
+CREATE TRIGGER charge_point_data_version_insert AFTER INSERT ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id = new.organization_id;
+END;
+
+CREATE TRIGGER charge_point_data_version_delete AFTER DELETE ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id = old.organization_id;
+END;
+
+CREATE TRIGGER charge_point_data_version_update AFTER UPDATE ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id IN (old.organization_id, new.organization_id);
+END;
+
+-- map clusters of charge points, kept current by triggers on charge_point and address
+-- a zoom level splits the world in cells of 360 / 2^zoom degrees of longitude and latitude, cell_x and cell_y
+-- being the indexes of the cell holding a point from longitude -180 and latitude -90.
+-- a row counts the charge points of an organization with one status in one cell, latitude and longitude sums
+-- give the centroid of the cell. Rows are never deleted, cells whose counter went back to 0 are ignored
+CREATE TABLE charge_point_cluster_zoom(
+zoom INTEGER PRIMARY KEY,
+cells INTEGER NOT NULL
+);
+
+INSERT INTO charge_point_cluster_zoom(zoom, cells) VALUES
+(0, 1), (1, 2), (2, 4), (3, 8), (4, 16), (5, 32), (6, 64), (7, 128), (8, 256),
+(9, 512), (10, 1024), (11, 2048), (12, 4096), (13, 8192), (14, 16384), (15, 32768), (16, 65536);
+
+CREATE TABLE charge_point_cluster(
+organization_id INTEGER NOT NULL,
+zoom INTEGER NOT NULL,
+cell_y INTEGER NOT NULL,
+cell_x INTEGER NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+latitude_sum REAL NOT NULL,
+longitude_sum REAL NOT NULL,
+PRIMARY KEY(organization_id, zoom, cell_y, cell_x, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER charge_point_cluster_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT new.organization_id, z.zoom,
+CAST((address.latitude + 90) * z.cells / 360 AS INTEGER), CAST((address.longitude + 180) * z.cells / 360 AS INTEGER),
+new.status_id, 1, address.latitude, address.longitude
+FROM address, charge_point_cluster_zoom z WHERE address.id = new.address_id
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + 1, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
+
+CREATE TRIGGER charge_point_cluster_delete AFTER DELETE ON charge_point BEGIN
+UPDATE charge_point_cluster SET cp_count = cp_count - 1,
+latitude_sum = latitude_sum - (SELECT latitude FROM address WHERE id = old.address_id),
+longitude_sum = longitude_sum - (SELECT longitude FROM address WHERE id = old.address_id)
+WHERE organization_id = old.organization_id AND status_id = old.status_id AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((address.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((address.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM address, charge_point_cluster_zoom z WHERE address.id = old.address_id);
+END;
+
+CREATE TRIGGER charge_point_cluster_update AFTER UPDATE OF organization_id, status_id, address_id
+ON charge_point WHEN old.organization_id != new.organization_id OR old.status_id != new.status_id
+OR old.address_id != new.address_id BEGIN
+UPDATE charge_point_cluster SET cp_count = cp_count - 1,
+latitude_sum = latitude_sum - (SELECT latitude FROM address WHERE id = old.address_id),
+longitude_sum = longitude_sum - (SELECT longitude FROM address WHERE id = old.address_id)
+WHERE organization_id = old.organization_id AND status_id = old.status_id AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((address.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((address.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM address, charge_point_cluster_zoom z WHERE address.id = old.address_id);
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT new.organization_id, z.zoom,
+CAST((address.latitude + 90) * z.cells / 360 AS INTEGER), CAST((address.longitude + 180) * z.cells / 360 AS INTEGER),
+new.status_id, 1, address.latitude, address.longitude
+FROM address, charge_point_cluster_zoom z WHERE address.id = new.address_id
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + 1, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
+
+-- moving an address moves all its charge points, old and new cells are updated by organization and status
+CREATE TRIGGER charge_point_cluster_address_update AFTER UPDATE OF latitude, longitude ON address
+WHEN old.latitude != new.latitude OR old.longitude != new.longitude BEGIN
+UPDATE charge_point_cluster SET
+cp_count = cp_count - (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id),
+latitude_sum = latitude_sum - old.latitude * (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id),
+longitude_sum = longitude_sum - old.longitude * (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id)
+WHERE (organization_id, status_id) IN (SELECT organization_id, status_id FROM charge_point WHERE address_id = old.id)
+AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((old.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((old.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM charge_point_cluster_zoom z);
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT charge_point.organization_id, z.zoom,
+CAST((new.latitude + 90) * z.cells / 360 AS INTEGER), CAST((new.longitude + 180) * z.cells / 360 AS INTEGER),
+charge_point.status_id, count(*), new.latitude * count(*), new.longitude * count(*)
+FROM charge_point, charge_point_cluster_zoom z WHERE charge_point.address_id = new.id GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + excluded.cp_count, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
+
 -- data insertion (charge point)
 INSERT INTO charge_point_status(code, label) VALUES
 ('STUDY', 'En étude'),
@@ -171,6 +456,7 @@ INSERT INTO charge_point(reference, address_id, organization_id, status_id) VALU
 
 -- ############ Whitelists tables ###########
 -- tables creation (whitelists)
+-- cp_count and user_count are the numbers of charge points and users, kept current by triggers on whitelist members
 CREATE TABLE whitelist(
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 label VARCHAR(50) NOT NULL,
@@ -178,10 +464,17 @@ organization_id INTEGER NOT NULL,
 paid_by_organization INTEGER NOT NULL DEFAULT 0,
 created_at TEXT NOT NULL,
 expires_at TEXT,
+cp_count INTEGER NOT NULL DEFAULT 0,
+user_count INTEGER NOT NULL DEFAULT 0,
 FOREIGN KEY(organization_id) REFERENCES organization(id),
 UNIQUE(organization_id, label)
 );
 
+CREATE INDEX whitelist_organization_created_at_idx ON whitelist(organization_id, created_at);
+CREATE INDEX whitelist_organization_expires_at_idx ON whitelist(organization_id, expires_at);
+CREATE INDEX whitelist_organization_cp_count_idx ON whitelist(organization_id, cp_count);
+CREATE INDEX whitelist_organization_user_count_idx ON whitelist(organization_id, user_count);
+
 CREATE TABLE whitelist_user(
 whitelist_id INTEGER NOT NULL,
 user_id INTEGER NOT NULL,
@@ -192,6 +485,10 @@ FOREIGN KEY(user_id) REFERENCES user(id),
 UNIQUE(whitelist_id, user_id)
 );
 
+CREATE INDEX whitelist_user_user_idx ON whitelist_user(user_id);
+CREATE INDEX whitelist_user_created_at_idx ON whitelist_user(whitelist_id, created_at);
+CREATE INDEX whitelist_user_expires_at_idx ON whitelist_user(whitelist_id, expires_at);
+
 CREATE TABLE whitelist_charge_point(
 whitelist_id INTEGER NOT NULL,
 charge_point_id INTEGER NOT NULL,
@@ -201,6 +498,58 @@ FOREIGN KEY(charge_point_id) REFERENCES charge_point(id),
 UNIQUE(whitelist_id, charge_point_id)
 );
 
+CREATE INDEX whitelist_charge_point_charge_point_idx ON whitelist_charge_point(charge_point_id);
+
+CREATE TRIGGER whitelist_user_count_insert AFTER INSERT ON whitelist_user BEGIN
+UPDATE whitelist SET user_count = user_count + 1 WHERE id = new.whitelist_id;
+END;
+
+CREATE TRIGGER whitelist_user_count_delete AFTER DELETE ON whitelist_user BEGIN
+UPDATE whitelist SET user_count = user_count - 1 WHERE id = old.whitelist_id;
+END;
+
+CREATE TRIGGER whitelist_cp_count_insert AFTER INSERT ON whitelist_charge_point BEGIN
+UPDATE whitelist SET cp_count = cp_count + 1 WHERE id = new.whitelist_id;
+END;
+
+CREATE TRIGGER whitelist_cp_count_delete AFTER DELETE ON whitelist_charge_point BEGIN
+UPDATE whitelist SET cp_count = cp_count - 1 WHERE id = old.whitelist_id;
+END;
+
+-- materialized access of users to charge points, one row per (user, charge point, whitelist)
+-- maintained by the api each time whitelist links or whitelist info change
+CREATE TABLE effective_access(
+user_id INTEGER NOT NULL,
+charge_point_id INTEGER NOT NULL,
+whitelist_id INTEGER NOT NULL,
+created_at TEXT NOT NULL,
+expires_at TEXT,
+paid_by_organization INTEGER NOT NULL DEFAULT 0,
+FOREIGN KEY(user_id) REFERENCES user(id),
+FOREIGN KEY(charge_point_id) REFERENCES charge_point(id),
+FOREIGN KEY(whitelist_id) REFERENCES whitelist(id),
+PRIMARY KEY(user_id, charge_point_id, whitelist_id)
+);
+
+CREATE INDEX effective_access_whitelist_idx ON effective_access(whitelist_id, user_id);
+CREATE INDEX effective_access_whitelist_charge_point_idx ON effective_access(whitelist_id, charge_point_id);
+
+-- asynchronous deletions of whitelists : members are deleted by chunks, then the whitelist itself
+-- rows outlive the deleted whitelist so that clients can poll the deletion status
+CREATE TABLE whitelist_deletion(
+id INTEGER PRIMARY KEY AUTOINCREMENT,
+whitelist_id INTEGER NOT NULL,
+organization_id INTEGER NOT NULL,
+label VARCHAR(50) NOT NULL,
+status VARCHAR(10) NOT NULL,
+created_at TEXT NOT NULL,
+finished_at TEXT,
+heartbeat_at TEXT,
+FOREIGN KEY(organization_id) REFERENCES organization(id)
+);
+
+CREATE INDEX whitelist_deletion_whitelist_idx ON whitelist_deletion(whitelist_id, status);
+
 -- data insertion (whitelist)
 INSERT INTO whitelist(label, organization_id, paid_by_organization, created_at, expires_at) VALUES
 ('Premiere whitelist', 1, 1, '2021-11-22', null),
@@ -215,4 +564,16 @@ INSERT INTO whitelist_charge_point(whitelist_id, charge_point_id, created_at) VA
 (1, 2, '2021-11-22'),
 (1, 3, '2021-11-22'),
 (1, 4, '2021-11-22'),
-(2, 1, '2021-11-23');
\ No newline at end of file
+(2, 1, '2021-11-23');
+
+INSERT INTO effective_access(user_id, charge_point_id, whitelist_id, created_at, expires_at, paid_by_organization)
+SELECT wu.user_id, wcp.charge_point_id, w.id,
+max(w.created_at, wu.created_at, wcp.created_at),
+nullif(min(coalesce(w.expires_at, '9999-12-31'), coalesce(wu.expires_at, '9999-12-31')), '9999-12-31'),
+w.paid_by_organization
+FROM whitelist w
+JOIN whitelist_user wu ON wu.whitelist_id = w.id
+JOIN whitelist_charge_point wcp ON wcp.whitelist_id = w.id;
+
+-- schema version, must match the number of the last script of sql/upgrade
+PRAGMA user_version = 10;
\ No newline at end of file
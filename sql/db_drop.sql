@@ -1,12 +1,22 @@
 -- this scripts drop all tables from database allowing for further recreation and reinitialization
 
+DROP TABLE IF EXISTS whitelist_deletion;
+DROP TABLE IF EXISTS effective_access;
 DROP TABLE IF EXISTS whitelist_charge_point;
 DROP TABLE IF EXISTS whitelist_user;
 DROP TABLE IF EXISTS whitelist;
 
+DROP TABLE IF EXISTS charge_point_search;
+DROP TABLE IF EXISTS user_search;
+
+DROP TABLE IF EXISTS charge_point_cluster;
+DROP TABLE IF EXISTS charge_point_cluster_zoom;
+DROP TABLE IF EXISTS charge_point_status_snapshot;
+DROP TABLE IF EXISTS charge_point_status_count;
 DROP TABLE IF EXISTS charge_point;
 DROP TABLE IF EXISTS charge_point_status;
 
+DROP TABLE IF EXISTS address_location;
 DROP TABLE IF EXISTS address;
 DROP TABLE IF EXISTS zip_code;
 DROP TABLE IF EXISTS city;
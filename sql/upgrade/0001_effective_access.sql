@@ -0,0 +1,26 @@
+-- materialized access of users to charge points, one row per (user, charge point, whitelist)
+CREATE TABLE IF NOT EXISTS effective_access(
+user_id INTEGER NOT NULL,
+charge_point_id INTEGER NOT NULL,
+whitelist_id INTEGER NOT NULL,
+created_at TEXT NOT NULL,
+expires_at TEXT,
+paid_by_organization INTEGER NOT NULL DEFAULT 0,
+FOREIGN KEY(user_id) REFERENCES user(id),
+FOREIGN KEY(charge_point_id) REFERENCES charge_point(id),
+FOREIGN KEY(whitelist_id) REFERENCES whitelist(id),
+PRIMARY KEY(user_id, charge_point_id, whitelist_id)
+);
+
+CREATE INDEX IF NOT EXISTS effective_access_whitelist_idx ON effective_access(whitelist_id, user_id);
+
+DELETE FROM effective_access;
+
+INSERT INTO effective_access(user_id, charge_point_id, whitelist_id, created_at, expires_at, paid_by_organization)
+SELECT wu.user_id, wcp.charge_point_id, w.id,
+max(w.created_at, wu.created_at, wcp.created_at),
+nullif(min(coalesce(w.expires_at, '9999-12-31'), coalesce(wu.expires_at, '9999-12-31')), '9999-12-31'),
+w.paid_by_organization
+FROM whitelist w
+JOIN whitelist_user wu ON wu.whitelist_id = w.id
+JOIN whitelist_charge_point wcp ON wcp.whitelist_id = w.id;
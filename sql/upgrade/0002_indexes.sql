@@ -0,0 +1,25 @@
+-- secondary indexes of the access and list hot paths
+-- sqlite index entries end with the rowid, so (organization_id, column) indexes also serve the
+-- (column, id) keyset order of list queries without a temporary b-tree
+
+-- organization employees listed by email, firstname or lastname
+CREATE INDEX IF NOT EXISTS user_organization_email_idx ON user(organization_id, email);
+CREATE INDEX IF NOT EXISTS user_organization_firstname_idx ON user(organization_id, firstname);
+CREATE INDEX IF NOT EXISTS user_organization_lastname_idx ON user(organization_id, lastname);
+
+-- organization charge points listed by reference and counted by status
+CREATE INDEX IF NOT EXISTS charge_point_organization_reference_idx ON charge_point(organization_id, reference);
+CREATE INDEX IF NOT EXISTS charge_point_organization_status_idx ON charge_point(organization_id, status_id);
+
+-- organization whitelists listed by created_at or expires_at (label is served by the unique constraint)
+CREATE INDEX IF NOT EXISTS whitelist_organization_created_at_idx ON whitelist(organization_id, created_at);
+CREATE INDEX IF NOT EXISTS whitelist_organization_expires_at_idx ON whitelist(organization_id, expires_at);
+
+-- whitelist links reached from the user or charge point side
+CREATE INDEX IF NOT EXISTS whitelist_user_user_idx ON whitelist_user(user_id);
+CREATE INDEX IF NOT EXISTS whitelist_user_created_at_idx ON whitelist_user(whitelist_id, created_at);
+CREATE INDEX IF NOT EXISTS whitelist_user_expires_at_idx ON whitelist_user(whitelist_id, expires_at);
+CREATE INDEX IF NOT EXISTS whitelist_charge_point_charge_point_idx ON whitelist_charge_point(charge_point_id);
+
+-- effective access refreshed by charge point
+CREATE INDEX IF NOT EXISTS effective_access_whitelist_charge_point_idx ON effective_access(whitelist_id, charge_point_id);
@@ -0,0 +1,94 @@
+-- trigram full text search shadow index of the text fields filtered by substring in list queries
+-- the trigram tokenizer matches any substring of at least 3 characters case insensitively,
+-- shadow tables are kept in sync with indexed tables by triggers
+
+-- users : external content table reading its values from user, rowid is user.id
+CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(
+email, firstname, lastname, content='user', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user BEGIN
+INSERT INTO user_search(rowid, email, firstname, lastname) VALUES (new.id, new.email, new.firstname, new.lastname);
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user BEGIN
+INSERT INTO user_search(user_search, rowid, email, firstname, lastname)
+VALUES ('delete', old.id, old.email, old.firstname, old.lastname);
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_search_update AFTER UPDATE OF email, firstname, lastname ON user BEGIN
+INSERT INTO user_search(user_search, rowid, email, firstname, lastname)
+VALUES ('delete', old.id, old.email, old.firstname, old.lastname);
+INSERT INTO user_search(rowid, email, firstname, lastname) VALUES (new.id, new.email, new.firstname, new.lastname);
+END;
+
+INSERT INTO user_search(user_search) VALUES ('rebuild');
+
+-- charge points : display fields come from joined tables so the shadow table stores its own copy,
+-- rowid is charge_point.id
+CREATE VIRTUAL TABLE IF NOT EXISTS charge_point_search USING fts5(
+reference, status_code, address, zip_code, city, tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_search(rowid, reference, status_code, address, zip_code, city)
+SELECT new.id, new.reference, charge_point_status.code, address.label, zip_code.code, city.name
+FROM charge_point_status, address
+JOIN zip_code ON zip_code.id = address.zip_code_id
+JOIN city ON city.id = zip_code.city_id
+WHERE charge_point_status.id = new.status_id AND address.id = new.address_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_delete AFTER DELETE ON charge_point BEGIN
+DELETE FROM charge_point_search WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_update AFTER UPDATE OF reference, status_id, address_id
+ON charge_point BEGIN
+UPDATE charge_point_search SET
+reference = new.reference,
+status_code = (SELECT code FROM charge_point_status WHERE id = new.status_id),
+address = (SELECT label FROM address WHERE id = new.address_id),
+zip_code = (SELECT zip_code.code FROM address JOIN zip_code ON zip_code.id = address.zip_code_id
+            WHERE address.id = new.address_id),
+city = (SELECT city.name FROM address JOIN zip_code ON zip_code.id = address.zip_code_id
+        JOIN city ON city.id = zip_code.city_id WHERE address.id = new.address_id)
+WHERE rowid = new.id;
+END;
+
+-- referential tables are rarely updated, their changes are propagated to charge points using them
+CREATE TRIGGER IF NOT EXISTS charge_point_search_status_update AFTER UPDATE OF code ON charge_point_status BEGIN
+UPDATE charge_point_search SET status_code = new.code
+WHERE rowid IN (SELECT id FROM charge_point WHERE status_id = new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_address_update AFTER UPDATE OF label, zip_code_id ON address BEGIN
+UPDATE charge_point_search SET
+address = new.label,
+zip_code = (SELECT code FROM zip_code WHERE id = new.zip_code_id),
+city = (SELECT city.name FROM zip_code JOIN city ON city.id = zip_code.city_id WHERE zip_code.id = new.zip_code_id)
+WHERE rowid IN (SELECT id FROM charge_point WHERE address_id = new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_zip_code_update AFTER UPDATE OF code, city_id ON zip_code BEGIN
+UPDATE charge_point_search SET
+zip_code = new.code,
+city = (SELECT name FROM city WHERE id = new.city_id)
+WHERE rowid IN (SELECT charge_point.id FROM charge_point JOIN address ON address.id = charge_point.address_id
+                WHERE address.zip_code_id = new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_search_city_update AFTER UPDATE OF name ON city BEGIN
+UPDATE charge_point_search SET city = new.name
+WHERE rowid IN (SELECT charge_point.id FROM charge_point JOIN address ON address.id = charge_point.address_id
+                JOIN zip_code ON zip_code.id = address.zip_code_id WHERE zip_code.city_id = new.id);
+END;
+
+DELETE FROM charge_point_search;
+INSERT INTO charge_point_search(rowid, reference, status_code, address, zip_code, city)
+SELECT charge_point.id, charge_point.reference, charge_point_status.code, address.label, zip_code.code, city.name
+FROM charge_point
+JOIN charge_point_status ON charge_point_status.id = charge_point.status_id
+JOIN address ON address.id = charge_point.address_id
+JOIN zip_code ON zip_code.id = address.zip_code_id
+JOIN city ON city.id = zip_code.city_id;
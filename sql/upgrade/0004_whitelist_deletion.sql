@@ -0,0 +1,14 @@
+-- asynchronous deletions of whitelists : members are deleted by chunks, then the whitelist itself
+-- rows outlive the deleted whitelist so that clients can poll the deletion status
+CREATE TABLE IF NOT EXISTS whitelist_deletion(
+id INTEGER PRIMARY KEY AUTOINCREMENT,
+whitelist_id INTEGER NOT NULL,
+organization_id INTEGER NOT NULL,
+label VARCHAR(50) NOT NULL,
+status VARCHAR(10) NOT NULL,
+created_at TEXT NOT NULL,
+finished_at TEXT,
+FOREIGN KEY(organization_id) REFERENCES organization(id)
+);
+
+CREATE INDEX IF NOT EXISTS whitelist_deletion_whitelist_idx ON whitelist_deletion(whitelist_id, status);
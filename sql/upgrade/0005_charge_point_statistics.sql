@@ -0,0 +1,59 @@
+-- charge point counters by organization and status, kept current by triggers on charge_point
+-- rows are never deleted, counters of a status going back to 0 are kept for the history
+CREATE TABLE IF NOT EXISTS charge_point_status_count(
+organization_id INTEGER NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+PRIMARY KEY(organization_id, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+-- daily snapshots of the counters : the snapshot of a day is the last value of the counter that day,
+-- days without any change of a counter have no snapshot, its value is the one of the previous snapshot
+CREATE TABLE IF NOT EXISTS charge_point_status_snapshot(
+organization_id INTEGER NOT NULL,
+day TEXT NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+PRIMARY KEY(organization_id, day, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_status_snapshot_insert AFTER INSERT ON charge_point_status_count BEGIN
+INSERT INTO charge_point_status_snapshot(organization_id, day, status_id, cp_count)
+VALUES (new.organization_id, date('now'), new.status_id, new.cp_count)
+ON CONFLICT(organization_id, day, status_id) DO UPDATE SET cp_count = excluded.cp_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_status_snapshot_update AFTER UPDATE OF cp_count
+ON charge_point_status_count BEGIN
+INSERT INTO charge_point_status_snapshot(organization_id, day, status_id, cp_count)
+VALUES (new.organization_id, date('now'), new.status_id, new.cp_count)
+ON CONFLICT(organization_id, day, status_id) DO UPDATE SET cp_count = excluded.cp_count;
+END;
+
+INSERT INTO charge_point_status_count(organization_id, status_id, cp_count)
+SELECT organization_id, status_id, count(*) FROM charge_point GROUP BY organization_id, status_id
+ON CONFLICT(organization_id, status_id) DO UPDATE SET cp_count = excluded.cp_count;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_status_count_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_status_count(organization_id, status_id, cp_count)
+VALUES (new.organization_id, new.status_id, 1)
+ON CONFLICT(organization_id, status_id) DO UPDATE SET cp_count = cp_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_status_count_delete AFTER DELETE ON charge_point BEGIN
+UPDATE charge_point_status_count SET cp_count = cp_count - 1
+WHERE organization_id = old.organization_id AND status_id = old.status_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_status_count_update AFTER UPDATE OF organization_id, status_id
+ON charge_point WHEN old.organization_id != new.organization_id OR old.status_id != new.status_id BEGIN
+UPDATE charge_point_status_count SET cp_count = cp_count - 1
+WHERE organization_id = old.organization_id AND status_id = old.status_id;
+INSERT INTO charge_point_status_count(organization_id, status_id, cp_count)
+VALUES (new.organization_id, new.status_id, 1)
+ON CONFLICT(organization_id, status_id) DO UPDATE SET cp_count = cp_count + 1;
+END;
@@ -0,0 +1,26 @@
+-- numbers of charge points and users of whitelists, kept current by triggers on whitelist members
+ALTER TABLE whitelist ADD COLUMN cp_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE whitelist ADD COLUMN user_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE whitelist SET
+cp_count = (SELECT count(*) FROM whitelist_charge_point WHERE whitelist_id = whitelist.id),
+user_count = (SELECT count(*) FROM whitelist_user WHERE whitelist_id = whitelist.id);
+
+CREATE INDEX IF NOT EXISTS whitelist_organization_cp_count_idx ON whitelist(organization_id, cp_count);
+CREATE INDEX IF NOT EXISTS whitelist_organization_user_count_idx ON whitelist(organization_id, user_count);
+
+CREATE TRIGGER IF NOT EXISTS whitelist_user_count_insert AFTER INSERT ON whitelist_user BEGIN
+UPDATE whitelist SET user_count = user_count + 1 WHERE id = new.whitelist_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS whitelist_user_count_delete AFTER DELETE ON whitelist_user BEGIN
+UPDATE whitelist SET user_count = user_count - 1 WHERE id = old.whitelist_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS whitelist_cp_count_insert AFTER INSERT ON whitelist_charge_point BEGIN
+UPDATE whitelist SET cp_count = cp_count + 1 WHERE id = new.whitelist_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS whitelist_cp_count_delete AFTER DELETE ON whitelist_charge_point BEGIN
+UPDATE whitelist SET cp_count = cp_count - 1 WHERE id = old.whitelist_id;
+END;
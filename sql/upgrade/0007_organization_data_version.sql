@@ -0,0 +1,16 @@
+-- version of the data of an organization, derived into ETags of list and info endpoints
+-- api writes bump it once per transaction (see common/db_model/data_version.py),
+-- charge points are written by imports outside the api so their changes bump it by triggers
+ALTER TABLE organization ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_data_version_insert AFTER INSERT ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id = new.organization_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_data_version_delete AFTER DELETE ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id = old.organization_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_data_version_update AFTER UPDATE ON charge_point BEGIN
+UPDATE organization SET data_version = data_version + 1 WHERE id IN (old.organization_id, new.organization_id);
+END;
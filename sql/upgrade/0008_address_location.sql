@@ -0,0 +1,29 @@
+-- spatial index of address coordinates, looked up by the nearby charge points list
+-- r*tree of points (min = max) kept in sync with address by triggers, id is address.id.
+-- r*tree coordinates are 32 bits floats rounded outwards, so a box query never misses a point inside the box
+CREATE VIRTUAL TABLE IF NOT EXISTS address_location USING rtree(
+id, min_latitude, max_latitude, min_longitude, max_longitude
+);
+
+CREATE TRIGGER IF NOT EXISTS address_location_insert AFTER INSERT ON address BEGIN
+INSERT INTO address_location(id, min_latitude, max_latitude, min_longitude, max_longitude)
+VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+
+CREATE TRIGGER IF NOT EXISTS address_location_delete AFTER DELETE ON address BEGIN
+DELETE FROM address_location WHERE id = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS address_location_update AFTER UPDATE OF latitude, longitude ON address BEGIN
+UPDATE address_location
+SET min_latitude = new.latitude, max_latitude = new.latitude,
+min_longitude = new.longitude, max_longitude = new.longitude
+WHERE id = new.id;
+END;
+
+INSERT INTO address_location(id, min_latitude, max_latitude, min_longitude, max_longitude)
+SELECT id, latitude, latitude, longitude, longitude FROM address
+WHERE id NOT IN (SELECT id FROM address_location);
+
+-- charge points located at the addresses found by the spatial index
+CREATE INDEX IF NOT EXISTS charge_point_address_idx ON charge_point(address_id);
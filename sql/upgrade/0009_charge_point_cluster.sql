@@ -0,0 +1,109 @@
+-- map clusters of charge points, kept current by triggers on charge_point and address
+-- a zoom level splits the world in cells of 360 / 2^zoom degrees of longitude and latitude, cell_x and cell_y
+-- being the indexes of the cell holding a point from longitude -180 and latitude -90.
+-- a row counts the charge points of an organization with one status in one cell, latitude and longitude sums
+-- give the centroid of the cell. Rows are never deleted, cells whose counter went back to 0 are ignored
+CREATE TABLE IF NOT EXISTS charge_point_cluster_zoom(
+zoom INTEGER PRIMARY KEY,
+cells INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO charge_point_cluster_zoom(zoom, cells) VALUES
+(0, 1), (1, 2), (2, 4), (3, 8), (4, 16), (5, 32), (6, 64), (7, 128), (8, 256),
+(9, 512), (10, 1024), (11, 2048), (12, 4096), (13, 8192), (14, 16384), (15, 32768), (16, 65536);
+
+CREATE TABLE IF NOT EXISTS charge_point_cluster(
+organization_id INTEGER NOT NULL,
+zoom INTEGER NOT NULL,
+cell_y INTEGER NOT NULL,
+cell_x INTEGER NOT NULL,
+status_id INTEGER NOT NULL,
+cp_count INTEGER NOT NULL,
+latitude_sum REAL NOT NULL,
+longitude_sum REAL NOT NULL,
+PRIMARY KEY(organization_id, zoom, cell_y, cell_x, status_id),
+FOREIGN KEY(organization_id) REFERENCES organization(id),
+FOREIGN KEY(status_id) REFERENCES charge_point_status(id)
+) WITHOUT ROWID;
+
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT charge_point.organization_id, z.zoom,
+CAST((address.latitude + 90) * z.cells / 360 AS INTEGER), CAST((address.longitude + 180) * z.cells / 360 AS INTEGER),
+charge_point.status_id, count(*), sum(address.latitude), sum(address.longitude)
+FROM charge_point JOIN address ON address.id = charge_point.address_id, charge_point_cluster_zoom z
+WHERE true GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = excluded.cp_count, latitude_sum = excluded.latitude_sum, longitude_sum = excluded.longitude_sum;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_cluster_insert AFTER INSERT ON charge_point BEGIN
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT new.organization_id, z.zoom,
+CAST((address.latitude + 90) * z.cells / 360 AS INTEGER), CAST((address.longitude + 180) * z.cells / 360 AS INTEGER),
+new.status_id, 1, address.latitude, address.longitude
+FROM address, charge_point_cluster_zoom z WHERE address.id = new.address_id
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + 1, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_cluster_delete AFTER DELETE ON charge_point BEGIN
+UPDATE charge_point_cluster SET cp_count = cp_count - 1,
+latitude_sum = latitude_sum - (SELECT latitude FROM address WHERE id = old.address_id),
+longitude_sum = longitude_sum - (SELECT longitude FROM address WHERE id = old.address_id)
+WHERE organization_id = old.organization_id AND status_id = old.status_id AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((address.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((address.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM address, charge_point_cluster_zoom z WHERE address.id = old.address_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS charge_point_cluster_update AFTER UPDATE OF organization_id, status_id, address_id
+ON charge_point WHEN old.organization_id != new.organization_id OR old.status_id != new.status_id
+OR old.address_id != new.address_id BEGIN
+UPDATE charge_point_cluster SET cp_count = cp_count - 1,
+latitude_sum = latitude_sum - (SELECT latitude FROM address WHERE id = old.address_id),
+longitude_sum = longitude_sum - (SELECT longitude FROM address WHERE id = old.address_id)
+WHERE organization_id = old.organization_id AND status_id = old.status_id AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((address.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((address.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM address, charge_point_cluster_zoom z WHERE address.id = old.address_id);
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT new.organization_id, z.zoom,
+CAST((address.latitude + 90) * z.cells / 360 AS INTEGER), CAST((address.longitude + 180) * z.cells / 360 AS INTEGER),
+new.status_id, 1, address.latitude, address.longitude
+FROM address, charge_point_cluster_zoom z WHERE address.id = new.address_id
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + 1, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
+
+-- moving an address moves all its charge points, old and new cells are updated by organization and status
+CREATE TRIGGER IF NOT EXISTS charge_point_cluster_address_update AFTER UPDATE OF latitude, longitude ON address
+WHEN old.latitude != new.latitude OR old.longitude != new.longitude BEGIN
+UPDATE charge_point_cluster SET
+cp_count = cp_count - (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id),
+latitude_sum = latitude_sum - old.latitude * (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id),
+longitude_sum = longitude_sum - old.longitude * (SELECT count(*) FROM charge_point cp WHERE cp.address_id = old.id
+                       AND cp.organization_id = charge_point_cluster.organization_id
+                       AND cp.status_id = charge_point_cluster.status_id)
+WHERE (organization_id, status_id) IN (SELECT organization_id, status_id FROM charge_point WHERE address_id = old.id)
+AND (zoom, cell_y, cell_x) IN (
+SELECT z.zoom, CAST((old.latitude + 90) * z.cells / 360 AS INTEGER),
+CAST((old.longitude + 180) * z.cells / 360 AS INTEGER)
+FROM charge_point_cluster_zoom z);
+INSERT INTO charge_point_cluster(organization_id, zoom, cell_y, cell_x, status_id, cp_count, latitude_sum,
+                                 longitude_sum)
+SELECT charge_point.organization_id, z.zoom,
+CAST((new.latitude + 90) * z.cells / 360 AS INTEGER), CAST((new.longitude + 180) * z.cells / 360 AS INTEGER),
+charge_point.status_id, count(*), new.latitude * count(*), new.longitude * count(*)
+FROM charge_point, charge_point_cluster_zoom z WHERE charge_point.address_id = new.id GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT(organization_id, zoom, cell_y, cell_x, status_id) DO UPDATE SET
+cp_count = cp_count + excluded.cp_count, latitude_sum = latitude_sum + excluded.latitude_sum,
+longitude_sum = longitude_sum + excluded.longitude_sum;
+END;
@@ -0,0 +1,3 @@
+-- time of the last progress of the thread running an asynchronous whitelist deletion, a pending deletion is only
+-- resumed by another thread (of any worker) once its heartbeat is older than a stall delay
+ALTER TABLE whitelist_deletion ADD COLUMN heartbeat_at TEXT;